@@ -1,6 +1,10 @@
 from django.contrib import admin
+from django.db.models import Q
+
+from .busqueda import rangos
 from .models import (
-    Integrante, Sprint, Epica, Tarea, Evidencia, Daily, Proyecto, PermisoProyecto
+    Integrante, Sprint, SprintSnapshot, Epica, Tarea, Evidencia, Daily, Proyecto, PermisoProyecto,
+    EstadoEvento, Festivo,
 )
 
 # ==========================
@@ -49,6 +53,27 @@ class SprintAdmin(admin.ModelAdmin):
     search_fields = ("nombre",)
     ordering = ("-inicio",)
 
+
+@admin.register(SprintSnapshot)
+class SprintSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("sprint", "congelado_en", "sp_planificados", "sp_completados", "hu_terminadas", "hu_total")
+    ordering = ("-sprint__inicio",)
+
+    # Solo lectura: se escriben con snapshots.congelar_sprint / manage.py congelar_sprints
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Festivo)
+class FestivoAdmin(admin.ModelAdmin):
+    list_display = ("fecha", "nombre")
+    list_filter = ("fecha",)
+    search_fields = ("nombre",)
+    ordering = ("-fecha",)
+
 # ==========================
 # Proyecto y Épica
 # ==========================
@@ -102,6 +127,34 @@ class TareaAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        obj._actor = request.user  # autor del EstadoEvento si cambia el estado
+        super().save_model(request, obj, form, change)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Texto por el índice de búsqueda (TareaBusqueda) en vez de icontains sobre cada columna;
+        # el usuario asignado se sigue buscando por username
+        if not search_term.strip():
+            return queryset, False
+        ids = list(rangos(search_term, queryset, limite=500))
+        return queryset.filter(Q(pk__in=ids) | Q(asignado_a__user__username__icontains=search_term.strip())), False
+
+
+@admin.register(EstadoEvento)
+class EstadoEventoAdmin(admin.ModelAdmin):
+    list_display = ("ocurrido_en", "entidad", "tarea", "subtarea", "estado_anterior", "estado_nuevo", "esfuerzo_sp", "actor", "inferido")
+    list_filter = ("entidad", "estado_nuevo", "inferido", "sprint")
+    list_select_related = ("tarea", "subtarea__bloque", "actor")
+    date_hierarchy = "ocurrido_en"
+    ordering = ("-ocurrido_en",)
+
+    # Bitácora append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # ==========================
 # Evidencia
 # ==========================
@@ -123,7 +176,11 @@ class EvidenciaAdmin(admin.ModelAdmin):
 # ==========================
 @admin.register(Daily)
 class DailyAdmin(admin.ModelAdmin):
-    list_display = ("id", "integrante", "fecha", "hora", "fuera_horario")
+    list_display = ("id", "integrante", "fecha", "hora", "registrado", "fuera_horario", "alineacion")
     search_fields = ("integrante__user__username", "integrante__user__first_name")
-    list_filter = ("fuera_horario", "fecha")
+    list_filter = ("registrado", "fuera_horario", "fecha")
     ordering = ("-fecha", "-hora")
+
+    @admin.display(description="Alineación", ordering="porcentaje_alineacion")
+    def alineacion(self, obj):
+        return f"{obj.porcentaje_alineacion}% ({obj.items_alineados}/{obj.items_total})"
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Contexto de autorización por petición.
+
+ContextoAutorizacionMiddleware deja en `request.autorizacion` (y en
+`request.user.integrante._autorizacion`) un ContextoAutorizacion con:
+- el Integrante del usuario (auto-creado como Miembro si falta),
+- los flags de rol (es_admin, es_visualizador, puede_ver_todo),
+- los ids de proyectos autorizados (Visualizador / Product Owner),
+- bajo demanda, los ids de tareas de las que es responsable.
+
+Los datos salen de la caché compartida con versión por usuario ("auth:u<id>")
+más una global ("auth"); las señales las incrementan al cambiar PermisoProyecto,
+Integrante, Proyecto o las asignaciones (ver signals.py). Así los helpers de
+permisos de las vistas no repiten consultas contra PermisoProyecto ni contra
+la tabla puente en cada llamada.
+"""
+from django.core.cache import cache
+from django.db import router
+from django.utils.functional import cached_property
+
+from .cache_datos import PREFIJO, versiones
+from .models import Integrante, PermisoProyecto, Proyecto, Tarea, TareaAsignacion
+
+TTL = 60 * 60
+
+
+def alcance_usuario(user_id):
+    return f"auth:u{user_id}"
+
+
+def _clave(user_id, sufijo):
+    v = versiones(["auth", alcance_usuario(user_id)])
+    return f"{PREFIJO}:auth:{user_id}:{v['auth']}:{v[alcance_usuario(user_id)]}:{sufijo}"
+
+
+class ContextoAutorizacion:
+    def __init__(self, integrante, proyectos_ids=()):
+        self.integrante = integrante
+        self.es_admin = bool(integrante and integrante.es_admin())
+        self.es_visualizador = bool(integrante and integrante.es_visualizador())
+        self.puede_ver_todo = self.es_admin or self.es_visualizador
+        self.proyectos_ids = frozenset(proyectos_ids)
+
+    def proyectos_qs(self):
+        """Proyectos que puede ver: todos (admin), los autorizados (visualizador) o ninguno."""
+        if self.es_admin:
+            return Proyecto.objects.all()
+        if self.es_visualizador:
+            return Proyecto.objects.filter(id__in=self.proyectos_ids)
+        return Proyecto.objects.none()
+
+    def ve_proyecto(self, proyecto_id):
+        return self.es_admin or (self.es_visualizador and proyecto_id in self.proyectos_ids)
+
+    @cached_property
+    def tareas_responsable(self):
+        """Ids de tareas donde el integrante figura en `asignados` o en `asignado_a` (caché por usuario)."""
+        if not self.integrante:
+            return frozenset()
+        clave = _clave(self.integrante.user_id, "tareas")
+        ids = cache.get(clave)
+        if ids is None:
+            ids = set(
+                TareaAsignacion.objects.filter(integrante_id=self.integrante.pk).values_list("tarea_id", flat=True)
+            )
+            ids.update(Tarea.objects.filter(asignado_a_id=self.integrante.pk).values_list("id", flat=True))
+            cache.set(clave, ids, TTL)
+        return frozenset(ids)
+
+    def es_responsable(self, tarea):
+        if not self.integrante:
+            return False
+        return tarea.asignado_a_id == self.integrante.pk or tarea.pk in self.tareas_responsable
+
+
+ANONIMO = ContextoAutorizacion(None)
+
+
+def _datos(user):
+    """{integrante_id, rol, proyectos} del usuario (de la caché o de la BD)."""
+    clave = _clave(user.pk, "datos")
+    datos = cache.get(clave)
+    if datos is None:
+        integrante, _ = Integrante.objects.get_or_create(user=user, defaults={"rol": Integrante.ROL_MIEMBRO})
+        proyectos = []
+        if integrante.es_visualizador():
+            proyectos = list(
+                PermisoProyecto.objects
+                .filter(integrante=integrante, activo=True, proyecto__activo=True)
+                .values_list("proyecto_id", flat=True)
+            )
+        datos = {"integrante_id": integrante.pk, "rol": integrante.rol, "proyectos": proyectos}
+        cache.set(clave, datos, TTL)
+    return datos
+
+
+def contexto_usuario(user):
+    """ContextoAutorizacion de `user`; deja el Integrante en user.integrante sin otra consulta."""
+    if not getattr(user, "is_authenticated", False):
+        return ANONIMO
+    datos = _datos(user)
+    integrante = Integrante.from_db(
+        router.db_for_read(Integrante), ["id", "user_id", "rol"], [datos["integrante_id"], user.pk, datos["rol"]],
+    )
+    user.integrante = integrante  # también fija integrante.user = user
+    ctx = ContextoAutorizacion(integrante, datos["proyectos"])
+    integrante._autorizacion = ctx
+    return ctx
+
+
+def contexto_de(request):
+    """El contexto de la petición (lo crea el middleware; si no pasó por él, se calcula aquí)."""
+    ctx = getattr(request, "autorizacion", None)
+    if ctx is None:
+        ctx = request.autorizacion = contexto_usuario(request.user)
+    return ctx
+
+
+def contexto_integrante(integrante):
+    """Contexto de un Integrante cualquiera (el de la petición ya lo trae puesto)."""
+    if integrante is None:
+        return ANONIMO
+    ctx = getattr(integrante, "_autorizacion", None)
+    if ctx is None:
+        ctx = ContextoAutorizacion(integrante, _datos(integrante.user)["proyectos"])
+        integrante._autorizacion = ctx
+    return ctx
+
+
+class ContextoAutorizacionMiddleware:
+    """Calcula el contexto una vez por petición (va después de AuthenticationMiddleware)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.autorizacion = contexto_usuario(request.user)
+        return self.get_response(request)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Búsqueda de texto sobre el backlog.
+
+Cada Tarea tiene un documento en TareaBusqueda (título + épica, y descripción,
+criterios, bloques, subtareas y evidencias). Las señales llaman a
+`reindexar_al_confirmar` cuando cambia cualquiera de esas piezas y el documento
+se reescribe una sola vez por transacción, al confirmar.
+
+La consulta usa el índice del motor (ver migración 0033):
+- PostgreSQL: tsvector 'spanish' (raíces, sin tildes) con índice GIN y ts_rank.
+- SQLite: FTS5 (sin tildes, por prefijo) con bm25.
+- Otros motores: sin índice, la búsqueda no devuelve resultados.
+Siempre se cruza con el queryset de tareas visibles del usuario, así que el
+ranking y el límite se aplican solo sobre lo que puede ver.
+"""
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connection, transaction
+
+from .models import BloqueTarea, Evidencia, EvidenciaSubtarea, Subtarea, Tarea, TareaBusqueda
+
+LIMITE = 20
+TERMINOS_MAX = 8
+
+_pendientes = threading.local()
+
+
+# ==============================
+# Documentos
+# ==============================
+def _unir(*partes):
+    return " ".join(p or "" for p in partes)
+
+
+def documentos(tarea_ids):
+    """{tarea_id: (titulo, documento)} con 5 consultas sin importar cuántas tareas sean."""
+    tarea_ids = list(tarea_ids)
+    extra = defaultdict(lambda: {"bloques": [], "subtareas": [], "evidencias": [], "evidencias_st": []})
+
+    for tid, nombre in BloqueTarea.objects.filter(tarea_id__in=tarea_ids).values_list("tarea_id", "nombre"):
+        extra[tid]["bloques"].append(nombre)
+    for tid, titulo, descripcion in (
+        Subtarea.objects.filter(bloque__tarea_id__in=tarea_ids)
+        .values_list("bloque__tarea_id", "titulo", "descripcion")
+    ):
+        extra[tid]["subtareas"].append(_unir(titulo, descripcion))
+    for tid, comentario in Evidencia.objects.filter(tarea_id__in=tarea_ids).values_list("tarea_id", "comentario"):
+        extra[tid]["evidencias"].append(comentario)
+    for tid, comentario in (
+        EvidenciaSubtarea.objects.filter(subtarea__bloque__tarea_id__in=tarea_ids)
+        .values_list("subtarea__bloque__tarea_id", "comentario")
+    ):
+        extra[tid]["evidencias_st"].append(comentario)
+
+    res = {}
+    for tid, titulo, descripcion, criterios, epica in (
+        Tarea.objects.filter(pk__in=tarea_ids)
+        .values_list("id", "titulo", "descripcion", "criterios_aceptacion", "epica__titulo")
+    ):
+        e = extra[tid]
+        res[tid] = (
+            _unir(titulo, epica),
+            _unir(
+                descripcion, criterios,
+                *(_unir(*e[k]) for k in ("bloques", "subtareas", "evidencias", "evidencias_st")),
+            ),
+        )
+    return res
+
+
+def reindexar(tarea_ids):
+    """Reescribe (upsert) los documentos de esas tareas; las que ya no existen se van por CASCADE."""
+    docs = documentos(set(tarea_ids))
+    if docs:
+        TareaBusqueda.objects.bulk_create(
+            [TareaBusqueda(tarea_id=tid, titulo=t, documento=d) for tid, (t, d) in docs.items()],
+            update_conflicts=True,
+            unique_fields=["tarea"],
+            update_fields=["titulo", "documento", "actualizado_en"],
+        )
+
+
+def _vaciar_pendientes():
+    ids = getattr(_pendientes, "ids", None)
+    if ids:
+        _pendientes.ids = set()
+        reindexar(ids)
+
+
+def reindexar_al_confirmar(*tarea_ids):
+    """
+    Acumula las tareas a reindexar y las procesa cuando la transacción confirma:
+    varios guardados de la misma tarea en una petición generan una sola escritura.
+    """
+    ids = {i for i in tarea_ids if i}
+    if not ids:
+        return
+    if not hasattr(_pendientes, "ids"):
+        _pendientes.ids = set()
+    _pendientes.ids |= ids
+    transaction.on_commit(_vaciar_pendientes)
+
+
+# ==============================
+# Consulta
+# ==============================
+def _terminos(texto):
+    """Palabras de la consulta sin tildes ni signos (nada de sintaxis del motor llega a la BD)."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    return re.findall(r"\w+", texto)[:TERMINOS_MAX]
+
+
+def _consulta_motor(terminos):
+    """
+    (sql con placeholders para la consulta y el subselect de ids visibles, texto de la consulta),
+    o None si el motor no tiene índice de texto (la búsqueda no encuentra nada).
+    """
+    if connection.vendor == "postgresql":
+        # Cada término por prefijo ("migra" encuentra "migración") y todos obligatorios
+        sql = (
+            "SELECT b.tarea_id, ts_rank(b.vector, q) AS rango "
+            "FROM backlog_tareabusqueda b, to_tsquery('spanish', %s) q "
+            "WHERE b.vector @@ q AND b.tarea_id IN ({visibles}) "
+            "ORDER BY rango DESC, b.tarea_id DESC LIMIT %s"
+        )
+        return sql, " & ".join(f"{t}:*" for t in terminos)
+    if connection.vendor == "sqlite":
+        # bm25 es "menor = mejor"; el título pesa 10 veces más que el resto
+        sql = (
+            "SELECT rowid, -bm25(backlog_tareabusqueda_fts, 10.0, 1.0) AS rango "
+            "FROM backlog_tareabusqueda_fts "
+            "WHERE backlog_tareabusqueda_fts MATCH %s AND rowid IN ({visibles}) "
+            "ORDER BY rango DESC, rowid DESC LIMIT %s"
+        )
+        return sql, " ".join(f'"{t}"*' for t in terminos)
+    return None
+
+
+def rangos(texto, tareas, limite=LIMITE):
+    """{tarea_id: puntaje} de las tareas de `tareas` que coinciden con `texto` (mejores primero)."""
+    terminos = _terminos(texto)
+    motor = _consulta_motor(terminos) if terminos else None
+    if motor is None:
+        return {}
+
+    try:
+        visibles_sql, visibles_params = tareas.order_by().values("pk").query.sql_with_params()
+    except EmptyResultSet:  # tareas.none(): usuario sin integrante
+        return {}
+    sql, consulta = motor
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(visibles=visibles_sql), [consulta, *visibles_params, limite])
+        return dict(cursor.fetchall())
+
+
+def buscar(texto, tareas, limite=LIMITE):
+    """
+    Tareas de `tareas` (queryset ya filtrado por permisos) que coinciden con
+    `texto`, ordenadas por relevancia, con el puntaje en `tarea.rango`.
+    Dos consultas: ids + puntaje en el índice, y las tareas con sus relaciones.
+    """
+    puntajes = rangos(texto, tareas, limite)
+    encontradas = tareas.in_bulk(list(puntajes)) if puntajes else {}
+    res = []
+    for tid, rango in puntajes.items():
+        tarea = encontradas.get(tid)
+        if tarea is not None:
+            tarea.rango = rango
+            res.append(tarea)
+    return res
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Caché versionada por datos para dashboard y KPIs.
+
+- Contadores de versión por alcance ("global", "sprint:<id>", "proyecto:<id>",
+  "daily", "catalogo", "disponibilidad:<lunes>") guardados en la misma caché compartida. Las señales
+  (backlog/signals.py, disponibilidad/signals.py) los incrementan al confirmar cada escritura, así que una
+  clave vieja simplemente deja de consultarse (no hay que borrar nada).
+- La clave de cada respuesta incluye: vista, alcance de visibilidad del usuario,
+  querystring y versiones de las que depende.
+- Single-flight: solo un worker recalcula una clave ausente (lock con cache.add);
+  los demás esperan unos instantes a que aparezca.
+- Contadores de aciertos/fallos por vista (ver estadisticas()).
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+PREFIJO = "neusi"
+LOCK_TTL = 30          # seg. máximos que se reserva el cálculo de una clave
+ESPERA_MAX = 5.0       # seg. que un worker espera a que otro termine
+ESPERA_PASO = 0.05
+
+
+def _clave_version(alcance):
+    return f"{PREFIJO}:v:{alcance}"
+
+
+def _semilla():
+    # Si un contador se pierde (evicción/reinicio) no debe volver a un valor ya usado
+    return time.time_ns() // 1000
+
+
+# ==============================
+# Versiones
+# ==============================
+def versiones(alcances):
+    """{alcance: versión} leyendo todos los contadores en un solo viaje a la caché."""
+    claves = {_clave_version(a): a for a in alcances}
+    encontrados = cache.get_many(list(claves))
+    res = {}
+    for clave, alcance in claves.items():
+        v = encontrados.get(clave)
+        if v is None:
+            cache.add(clave, _semilla(), timeout=None)
+            v = cache.get(clave)
+        res[alcance] = v
+    return res
+
+
+def _incrementar(alcances):
+    for alcance in set(alcances):
+        clave = _clave_version(alcance)
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.add(clave, _semilla(), timeout=None)
+
+
+def invalidar(*alcances):
+    """
+    Incrementa las versiones indicadas cuando la transacción actual confirma
+    (antes de eso otro worker podría recalcular con datos viejos bajo la versión nueva).
+    """
+    alcances = [a for a in alcances if a]
+    if alcances:
+        transaction.on_commit(lambda: _incrementar(alcances))
+
+
+def alcances_tarea(sprint_id=None, proyecto_id=None):
+    """Versiones afectadas por un cambio en una tarea (o en sus bloques/subtareas)."""
+    res = ["global"]
+    if sprint_id:
+        res.append(f"sprint:{sprint_id}")
+    if proyecto_id:
+        res.append(f"proyecto:{proyecto_id}")
+    return res
+
+
+# ==============================
+# Alcance de visibilidad del usuario
+# ==============================
+def alcance_visibilidad(user, ctx=None):
+    """
+    Identificador estable de "qué puede ver" este usuario: usuarios con el mismo
+    alcance comparten entradas de caché, usuarios distintos nunca se mezclan.
+    """
+    from .autorizacion import contexto_usuario
+
+    if not getattr(user, "is_authenticated", False):
+        return "anon"
+    ctx = ctx or contexto_usuario(user)  # request.autorizacion cuando viene de una vista
+    if user.is_superuser or ctx.es_admin:
+        return "admin"
+    if ctx.es_visualizador:
+        return "vis:" + ",".join(map(str, sorted(ctx.proyectos_ids)))
+    if ctx.integrante:
+        return f"int:{ctx.integrante.pk}"
+    return f"user:{user.pk}"
+
+
+# ==============================
+# Estadísticas
+# ==============================
+def _contar(nombre, evento):
+    clave = f"{PREFIJO}:stats:{nombre}:{evento}"
+    try:
+        cache.incr(clave)
+    except ValueError:
+        if not cache.add(clave, 1, timeout=None):
+            cache.incr(clave)
+
+
+def estadisticas(nombres):
+    """{vista: {hits, misses, esperas, ratio}} (acumulado desde que existe la caché)."""
+    eventos = ("hit", "miss", "espera")
+    claves = [f"{PREFIJO}:stats:{n}:{e}" for n in nombres for e in eventos]
+    valores = cache.get_many(claves)
+    res = {}
+    for n in nombres:
+        hits = valores.get(f"{PREFIJO}:stats:{n}:hit", 0)
+        misses = valores.get(f"{PREFIJO}:stats:{n}:miss", 0)
+        res[n] = {
+            "hits": hits,
+            "misses": misses,
+            "esperas": valores.get(f"{PREFIJO}:stats:{n}:espera", 0),
+            "ratio": round(hits / (hits + misses), 3) if (hits + misses) else None,
+        }
+    return res
+
+
+# ==============================
+# Single-flight
+# ==============================
+def obtener_o_calcular(nombre, clave, calcular, timeout):
+    """
+    Devuelve (valor, origen) con origen "hit" | "miss" | "espera".
+    `calcular` debe devolver None si el resultado no se debe guardar.
+    """
+    valor = cache.get(clave)
+    if valor is not None:
+        _contar(nombre, "hit")
+        return valor, "hit"
+
+    lock = clave + ":lock"
+    if not cache.add(lock, 1, timeout=LOCK_TTL):
+        # Otro worker lo está calculando: esperar su resultado en vez de repetir el trabajo
+        limite = time.monotonic() + ESPERA_MAX
+        while time.monotonic() < limite:
+            time.sleep(ESPERA_PASO)
+            valor = cache.get(clave)
+            if valor is not None:
+                _contar(nombre, "espera")
+                return valor, "espera"
+        # No terminó a tiempo: calcular sin lock
+
+    try:
+        _contar(nombre, "miss")
+        valor = calcular()
+        if valor is not None:
+            cache.set(clave, valor, timeout)
+        return valor, "miss"
+    finally:
+        cache.delete(lock)
+
+
+def cache_por_version(nombre, timeout, dependencias):
+    """
+    Decorador para vistas GET que devuelven HTML sin datos del usuario
+    (reemplaza @cache_page). `dependencias(request)` -> lista de alcances.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method != "GET":
+                return vista(request, *args, **kwargs)
+
+            alcances = ["catalogo", *dependencias(request)]
+            vers = versiones(alcances)
+            firma = "|".join(f"{a}={vers[a]}" for a in sorted(vers))
+            consulta = hashlib.md5(
+                request.GET.urlencode().encode() + b"#" + repr(sorted(kwargs.items())).encode()
+            ).hexdigest()
+            ctx = getattr(request, "autorizacion", None)
+            alcance = hashlib.md5(alcance_visibilidad(request.user, ctx).encode()).hexdigest()[:12]
+            clave = f"{PREFIJO}:vista:{nombre}:{alcance}:{consulta}:{hashlib.md5(firma.encode()).hexdigest()}"
+
+            no_cacheable = []  # respuesta no-200 calculada en este request
+
+            def calcular():
+                resp = vista(request, *args, **kwargs)
+                if resp.status_code != 200 or getattr(resp, "streaming", False):
+                    no_cacheable.append(resp)
+                    return None
+                return {"content": resp.content, "content_type": resp["Content-Type"]}
+
+            valor, origen = obtener_o_calcular(nombre, clave, calcular, timeout)
+            if valor is None:
+                return no_cacheable[0] if no_cacheable else vista(request, *args, **kwargs)
+            resp = HttpResponse(valor["content"], content_type=valor["content_type"])
+            resp["X-Neusi-Cache"] = origen
+            return resp
+        return envoltura
+    return decorador
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Calendario laboral: lunes a viernes menos los festivos de la tabla Festivo.
+
+- dias_habiles(ini, fin) es aritmético: días lunes–viernes por semanas completas
+  y un bisect sobre la lista ordenada de festivos que caen entre semana, sin
+  recorrer el rango día por día.
+- La lista de festivos se carga una vez por proceso y se recarga cuando cambia
+  la versión "festivos" de la caché compartida (señal de Festivo, cache_datos).
+- festivos_colombia(anio) calcula los festivos de ley (fijos, Ley Emiliani y los
+  que dependen de la Pascua) para el comando sembrar_festivos.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+from .cache_datos import versiones
+
+# (versión de "festivos", fechas ordenadas, fechas lunes–viernes ordenadas)
+_cargado = (None, (), ())
+
+
+def _festivos():
+    global _cargado
+    version = versiones(["festivos"])["festivos"]
+    if _cargado[0] != version:
+        from .models import Festivo
+
+        fechas = tuple(Festivo.objects.order_by("fecha").values_list("fecha", flat=True))
+        _cargado = (version, fechas, tuple(f for f in fechas if f.weekday() < 5))
+    return _cargado
+
+
+def _lv_antes(d: date) -> int:
+    """Días lunes–viernes desde 0001-01-01 (lunes) hasta el día anterior a `d`."""
+    semanas, resto = divmod(d.toordinal() - 1, 7)
+    return semanas * 5 + min(resto, 5)
+
+
+# ==============================
+# Consultas
+# ==============================
+def festivos_entre(ini, fin):
+    """Festivos (date) entre ini y fin, inclusive."""
+    _, fechas, _ = _festivos()
+    return list(fechas[bisect_left(fechas, ini):bisect_right(fechas, fin)])
+
+
+def es_habil(fecha) -> bool:
+    if fecha.weekday() >= 5:
+        return False
+    _, _, entre_semana = _festivos()
+    i = bisect_left(entre_semana, fecha)
+    return not (i < len(entre_semana) and entre_semana[i] == fecha)
+
+
+def dias_habiles(ini, fin) -> int:
+    """Días hábiles entre ini y fin (inclusive)."""
+    if not ini or not fin or fin < ini:
+        return 0
+    _, _, entre_semana = _festivos()
+    festivos = bisect_right(entre_semana, fin) - bisect_left(entre_semana, ini)
+    return _lv_antes(fin + timedelta(days=1)) - _lv_antes(ini) - festivos
+
+
+def dias(ini, fin):
+    """Todas las fechas entre ini y fin (inclusive)."""
+    if not ini or not fin or fin < ini:
+        return []
+    return [ini + timedelta(days=i) for i in range((fin - ini).days + 1)]
+
+
+def lista_habiles(ini, fin):
+    """Fechas hábiles entre ini y fin (inclusive), p. ej. para el eje de un gráfico."""
+    if not ini or not fin or fin < ini:
+        return []
+    festivos = set(festivos_entre(ini, fin))
+    return [d for d in dias(ini, fin) if d.weekday() < 5 and d not in festivos]
+
+
+# ==============================
+# Festivos de Colombia
+# ==============================
+FIJOS = [
+    (1, 1, "Año Nuevo"),
+    (5, 1, "Día del Trabajo"),
+    (7, 20, "Día de la Independencia"),
+    (8, 7, "Batalla de Boyacá"),
+    (12, 8, "Inmaculada Concepción"),
+    (12, 25, "Navidad"),
+]
+# Ley Emiliani: se trasladan al lunes siguiente
+TRASLADABLES = [
+    (1, 6, "Día de los Reyes Magos"),
+    (3, 19, "Día de San José"),
+    (6, 29, "San Pedro y San Pablo"),
+    (8, 15, "La Asunción de la Virgen"),
+    (10, 12, "Día de la Raza"),
+    (11, 1, "Todos los Santos"),
+    (11, 11, "Independencia de Cartagena"),
+]
+# Días desde el domingo de Pascua; los de `True` se trasladan al lunes siguiente
+PASCUA = [
+    (-3, False, "Jueves Santo"),
+    (-2, False, "Viernes Santo"),
+    (39, True, "Ascensión del Señor"),
+    (60, True, "Corpus Christi"),
+    (68, True, "Sagrado Corazón"),
+]
+
+
+def domingo_de_pascua(anio) -> date:
+    """Algoritmo anónimo gregoriano (Meeus/Jones/Butcher)."""
+    a, b, c = anio % 19, anio // 100, anio % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(anio, mes, dia + 1)
+
+
+def _lunes_siguiente(d: date) -> date:
+    return d + timedelta(days=(7 - d.weekday()) % 7)
+
+
+def festivos_colombia(anio):
+    """[(fecha, nombre)] de los festivos de ley del año, ordenados."""
+    res = [(date(anio, m, d), nombre) for m, d, nombre in FIJOS]
+    res += [(_lunes_siguiente(date(anio, m, d)), nombre) for m, d, nombre in TRASLADABLES]
+    pascua = domingo_de_pascua(anio)
+    for delta, trasladable, nombre in PASCUA:
+        f = pascua + timedelta(days=delta)
+        res.append((_lunes_siguiente(f) if trasladable else f, nombre))
+    return sorted(res)
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Capacidad del sprint: horas disponibles (app disponibilidad) contra SP comprometidos.
+
+- Horas: una consulta agrupada por (usuario, franjas) sobre los DisponibilidadDia
+  que caen dentro del sprint, sin festivos (calendario.py); cada mapa de franjas
+  distinto se convierte a horas una sola vez (franjas dentro del horario laboral,
+  tope de una jornada por día).
+- SP: una consulta agrupada por integrante para las HU del sprint (los SP de una HU
+  se reparten entre sus asignados) y otra para las subtareas (todo al responsable).
+- Capacidad en SP = horas / NEUSI_HORAS_POR_SP. Sobrecargado = SP comprometidos
+  por encima de esa capacidad.
+- El resultado se guarda por sprint en la caché versionada (cache_datos): la clave
+  depende de "sprint:<id>" (tareas, subtareas y asignaciones), "catalogo"
+  (fechas del sprint, integrantes, festivos) y "disponibilidad:<lunes>" de cada
+  semana del sprint, así que cualquier cambio en esas fuentes la deja de usar.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce
+
+from disponibilidad.franjas import HORARIO_DESDE, HORARIO_HASTA, MINUTOS_FRANJA, mascara_rango
+from disponibilidad.models import DisponibilidadDia, lunes_de
+
+from .cache_datos import PREFIJO, obtener_o_calcular, versiones
+from .calendario import festivos_entre
+from .models import Integrante, Subtarea, TareaAsignacion
+
+CACHE_TTL = 600
+# % de la capacidad desde el que un integrante se marca "al límite"
+UMBRAL_LIMITE = 85
+
+
+def horas_por_sp() -> float:
+    return float(getattr(settings, "NEUSI_HORAS_POR_SP", 4))
+
+
+def horas_jornada() -> float:
+    return float(getattr(settings, "NEUSI_HORAS_JORNADA", 8))
+
+
+def semanas_de(inicio, fin):
+    """Lunes de cada semana que toca el rango inicio..fin."""
+    lunes, ultimo, res = lunes_de(inicio), lunes_de(fin), []
+    while lunes <= ultimo:
+        res.append(lunes)
+        lunes += timedelta(days=7)
+    return res
+
+
+# ==============================
+# Horas disponibles
+# ==============================
+def _q_dias_en_rango(inicio, fin):
+    """DisponibilidadDia cuya fecha (lunes + dia_semana) cae en inicio..fin."""
+    lunes_ini, lunes_fin = lunes_de(inicio), lunes_de(fin)
+    return (
+        Q(disponibilidad__semana_inicio__gte=lunes_ini, disponibilidad__semana_inicio__lte=lunes_fin)
+        & ~Q(disponibilidad__semana_inicio=lunes_ini, dia_semana__lt=inicio.weekday())
+        & ~Q(disponibilidad__semana_inicio=lunes_fin, dia_semana__gt=fin.weekday())
+    )
+
+
+def _q_fechas(fechas):
+    """DisponibilidadDia de esas fechas exactas (vacío = ninguno)."""
+    q = Q(pk__in=[])
+    for f in fechas:
+        q |= Q(disponibilidad__semana_inicio=lunes_de(f), dia_semana=f.weekday())
+    return q
+
+
+def horas_disponibles(usuario_ids, inicio, fin):
+    """
+    {usuario_id: {"horas", "dias"}} entre inicio y fin (inclusive), sin contar
+    festivos. "dias" son los días con alguna hora disponible. Usuarios sin
+    registro quedan en 0.
+    """
+    usuario_ids = list(usuario_ids)
+    res = {u: {"horas": 0.0, "dias": 0} for u in usuario_ids}
+    if not usuario_ids:
+        return res
+
+    horario = mascara_rango(HORARIO_DESDE, HORARIO_HASTA)
+    tope = horas_jornada()
+    por_mapa = {}  # franjas -> horas (pocos valores distintos)
+
+    filas = (
+        DisponibilidadDia.objects
+        .filter(_q_dias_en_rango(inicio, fin), disponibilidad__usuario_id__in=usuario_ids)
+        .exclude(franjas=0)
+        .exclude(_q_fechas(festivos_entre(inicio, fin)))
+        .values("disponibilidad__usuario_id", "franjas")
+        .annotate(n=Count("id"))
+        .order_by()
+        .values_list("disponibilidad__usuario_id", "franjas", "n")
+    )
+    for usuario_id, bits, n in filas:
+        if bits not in por_mapa:
+            por_mapa[bits] = min((bits & horario).bit_count() * MINUTOS_FRANJA / 60, tope)
+        horas = por_mapa[bits]
+        if horas:
+            res[usuario_id]["horas"] += horas * n
+            res[usuario_id]["dias"] += n
+    return res
+
+
+# ==============================
+# SP comprometidos
+# ==============================
+def sp_comprometidos(sprint_id):
+    """
+    {integrante_id: {"sp", "sp_pendiente"}} del sprint. Los SP de una HU se reparten
+    en partes iguales entre sus asignados; los de una subtarea van a su responsable.
+    Pendiente = HU/subtareas no terminadas.
+    """
+    n_asignados = (
+        TareaAsignacion.objects.filter(tarea_id=OuterRef("tarea_id"))
+        .values("tarea_id").annotate(c=Count("*")).values("c")
+    )
+    parte = Cast("tarea__esfuerzo_sp", FloatField()) / F("n")
+    hu = (
+        TareaAsignacion.objects
+        .filter(tarea__sprint_id=sprint_id, tarea__esfuerzo_sp__isnull=False)
+        .annotate(n=Subquery(n_asignados))
+        .values("integrante_id")
+        .annotate(
+            sp=Coalesce(Sum(parte), 0.0),
+            sp_pendiente=Coalesce(Sum(parte, filter=Q(tarea__terminada=False)), 0.0),
+        )
+        .order_by()
+        .values_list("integrante_id", "sp", "sp_pendiente")
+    )
+    subtareas = (
+        Subtarea.objects
+        .filter(bloque__tarea__sprint_id=sprint_id, responsable__isnull=False, esfuerzo_sp__isnull=False)
+        .values("responsable_id")
+        .annotate(
+            sp=Coalesce(Sum("esfuerzo_sp"), 0),
+            sp_pendiente=Coalesce(Sum("esfuerzo_sp", filter=Q(terminada=False)), 0),
+        )
+        .order_by()
+        .values_list("responsable_id", "sp", "sp_pendiente")
+    )
+
+    res = {}
+    for integrante_id, sp, pendiente in [*hu, *subtareas]:
+        r = res.setdefault(integrante_id, {"sp": 0.0, "sp_pendiente": 0.0})
+        r["sp"] += sp
+        r["sp_pendiente"] += pendiente
+    return res
+
+
+# ==============================
+# Capacidad del sprint
+# ==============================
+def _estado(sp, capacidad_sp):
+    if sp > capacidad_sp:
+        return "sobrecargado"
+    if capacidad_sp and 100 * sp / capacidad_sp >= UMBRAL_LIMITE:
+        return "al_limite"
+    return "ok"
+
+
+def calcular_capacidad(sprint):
+    """
+    {"sprint", "horas_por_sp", "filas": [...], "totales": {...}}. Una fila por
+    integrante (sin visualizadores, salvo que tengan SP en el sprint), ordenadas
+    por carga descendente.
+    """
+    sp_por_integrante = sp_comprometidos(sprint.id)
+    integrantes = list(
+        Integrante.objects
+        .filter(~Q(rol__in=Integrante.ROLES_VISUALIZADOR) | Q(id__in=list(sp_por_integrante)))
+        .values_list("id", "user_id", "user__username", "user__first_name", "user__last_name")
+    )
+    horas = horas_disponibles([i[1] for i in integrantes], sprint.inicio, sprint.fin)
+    h_sp = horas_por_sp()
+
+    filas = []
+    for integrante_id, user_id, username, nombre, apellido in integrantes:
+        disp = horas[user_id]
+        sp = sp_por_integrante.get(integrante_id, {"sp": 0.0, "sp_pendiente": 0.0})
+        capacidad_sp = round(disp["horas"] / h_sp, 1)
+        comprometidos = round(sp["sp"], 1)
+        filas.append({
+            "integrante_id": integrante_id,
+            "nombre": f"{nombre} {apellido}".strip() or username,
+            "horas": round(disp["horas"], 1),
+            "dias": disp["dias"],
+            "capacidad_sp": capacidad_sp,
+            "sp": comprometidos,
+            "sp_pendiente": round(sp["sp_pendiente"], 1),
+            "carga_pct": round(100 * comprometidos / capacidad_sp) if capacidad_sp else None,
+            "estado": _estado(comprometidos, capacidad_sp),
+        })
+    filas.sort(key=lambda f: (f["estado"] != "sobrecargado", -(f["sp"] - f["capacidad_sp"]), f["nombre"]))
+
+    return {
+        "sprint": {"id": sprint.id, "nombre": sprint.nombre, "inicio": sprint.inicio, "fin": sprint.fin},
+        "horas_por_sp": h_sp,
+        "filas": filas,
+        "totales": {
+            "horas": round(sum(f["horas"] for f in filas), 1),
+            "capacidad_sp": round(sum(f["capacidad_sp"] for f in filas), 1),
+            "sp": round(sum(f["sp"] for f in filas), 1),
+            "sp_pendiente": round(sum(f["sp_pendiente"] for f in filas), 1),
+            "sobrecargados": sum(f["estado"] == "sobrecargado" for f in filas),
+        },
+    }
+
+
+def alcances_capacidad(sprint):
+    """Versiones de caché de las que depende la capacidad de `sprint`."""
+    return [
+        "catalogo",
+        f"sprint:{sprint.id}",
+        *(f"disponibilidad:{lunes.isoformat()}" for lunes in semanas_de(sprint.inicio, sprint.fin)),
+    ]
+
+
+def capacidad_sprint(sprint):
+    """calcular_capacidad(sprint) a través de la caché versionada. Devuelve (datos, origen)."""
+    vers = versiones(alcances_capacidad(sprint))
+    firma = "|".join(f"{a}={vers[a]}" for a in sorted(vers))
+    clave = f"{PREFIJO}:capacidad:{sprint.id}:{horas_por_sp()}:{hashlib.md5(firma.encode()).hexdigest()}"
+    return obtener_o_calcular("capacidad_sprint", clave, lambda: calcular_capacidad(sprint), CACHE_TTL)
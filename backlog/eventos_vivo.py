@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Avisos en vivo del tablero (Server-Sent Events).
+
+Cada cambio confirmado de Tarea, Subtarea o Daily publica un aviso compacto
+({"tipo", "id", estado/categoría..., "v"}) en un broker; la vista
+`eventos_stream` lo reenvía a los navegadores con Kanban, Matriz o Resumen de
+Daily abiertos, que parchean la tarjeta en vez de recargar la página.
+Los avisos solo llevan ids y estados (nada de títulos) y cada conexión recibe
+solo los de lo que su usuario puede ver (filtro_visibilidad): tareas del índice
+TareaVisibilidad y dailies propios o de su equipo; los admin reciben todo.
+
+Brokers (settings.NEUSI_BROKER_VIVO):
+- BrokerLocal: en memoria, para un solo proceso ASGI
+  (uvicorn neusi_tasks.asgi:application).
+- BrokerRedis: pub/sub de Redis (NEUSI_REDIS_URL), reparte entre varios workers.
+Sirve cualquier clase con publicar(aviso) y suscribir() -> objeto con
+`async siguiente(timeout)` (aviso o None) y `async cerrar()`.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+COLA_MAX = 200        # avisos pendientes por conexión antes de pedirle recargar
+LATIDO = 15           # seg. entre comentarios "ping" (mantiene vivos proxies y conexión)
+DURACION_MAX = 300    # seg. por conexión; EventSource se reconecta solo
+
+
+# ==============================
+# Brokers
+# ==============================
+class _SuscripcionLocal:
+    def __init__(self, broker):
+        self._broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(COLA_MAX)
+
+    def entregar(self, aviso):
+        # Corre en el loop de la conexión (call_soon_threadsafe)
+        if self.cola.full():
+            # Cliente lento: se descartan los pendientes y se le pide recargar
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            aviso = {"tipo": "resync", "v": aviso.get("v")}
+        self.cola.put_nowait(aviso)
+
+    async def siguiente(self, timeout):
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def cerrar(self):
+        self._broker._quitar(self)
+
+
+class BrokerLocal:
+    """Reparte los avisos a las conexiones abiertas de este proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscripciones = set()
+
+    def publicar(self, aviso):
+        # Se llama desde hilos de vistas síncronas: se entrega en el loop de cada conexión
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+        for s in suscripciones:
+            try:
+                s.loop.call_soon_threadsafe(s.entregar, aviso)
+            except RuntimeError:  # loop ya cerrado
+                self._quitar(s)
+
+    def suscribir(self):
+        s = _SuscripcionLocal(self)
+        with self._lock:
+            self._suscripciones.add(s)
+        return s
+
+    def _quitar(self, s):
+        with self._lock:
+            self._suscripciones.discard(s)
+
+
+class _SuscripcionRedis:
+    def __init__(self, url, canal):
+        import redis.asyncio as aredis
+
+        self._cliente = aredis.Redis.from_url(url)
+        self._pubsub = self._cliente.pubsub(ignore_subscribe_messages=True)
+        self._canal = canal
+        self._suscrita = False
+
+    async def siguiente(self, timeout):
+        if not self._suscrita:
+            await self._pubsub.subscribe(self._canal)
+            self._suscrita = True
+        msg = await self._pubsub.get_message(timeout=timeout)
+        return json.loads(msg["data"]) if msg else None
+
+    async def cerrar(self):
+        await self._pubsub.aclose()
+        await self._cliente.aclose()
+
+
+class BrokerRedis:
+    """Pub/sub de Redis: cada worker publica y todos reenvían (requiere el paquete `redis`)."""
+    CANAL = "neusi:vivo"
+
+    def __init__(self, url=None):
+        import redis
+
+        self._url = url or os.environ["NEUSI_REDIS_URL"]
+        self._redis = redis.Redis.from_url(self._url)
+
+    def publicar(self, aviso):
+        self._redis.publish(self.CANAL, json.dumps(aviso))
+
+    def suscribir(self):
+        return _SuscripcionRedis(self._url, self.CANAL)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def broker():
+    """Instancia única (por proceso) del broker configurado."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                ruta = getattr(settings, "NEUSI_BROKER_VIVO", "backlog.eventos_vivo.BrokerLocal")
+                _broker = import_string(ruta)()
+    return _broker
+
+
+# ==============================
+# Publicación
+# ==============================
+def aviso_tarea(tarea, borrada=False):
+    if borrada:
+        return {"tipo": "tarea", "id": tarea.pk, "borrada": True}
+    return {"tipo": "tarea", "id": tarea.pk, "estado": tarea.estado,
+            "categoria": tarea.categoria, "sprint": tarea.sprint_id}
+
+
+def aviso_subtarea(subtarea, borrada=False):
+    if borrada:
+        return {"tipo": "subtarea", "id": subtarea.pk, "bloque": subtarea.bloque_id, "borrada": True}
+    return {"tipo": "subtarea", "id": subtarea.pk, "bloque": subtarea.bloque_id, "estado": subtarea.estado}
+
+
+def aviso_daily(daily, borrada=False):
+    aviso = {"tipo": "daily", "id": daily.pk, "integrante": daily.integrante_id,
+             "fecha": daily.fecha.isoformat() if daily.fecha else None}
+    if borrada:
+        aviso["borrada"] = True
+    return aviso
+
+
+def avisar(*avisos):
+    """Publica los avisos cuando la transacción confirma (nunca se avisa algo que se deshizo)."""
+    avisos = [a for a in avisos if a]
+    if not avisos:
+        return
+
+    def enviar():
+        v = time.time_ns() // 1000  # orden aproximado entre workers
+        for aviso in avisos:
+            try:
+                broker().publicar({**aviso, "v": v})
+            except Exception:
+                # El aviso en vivo nunca debe romper una escritura
+                logger.warning("No se pudo publicar el aviso en vivo %s", aviso, exc_info=True)
+
+    transaction.on_commit(enviar)
+
+
+# ==============================
+# Visibilidad por conexión
+# ==============================
+async def filtro_visibilidad(contexto):
+    """
+    Función async aviso -> bool con lo que puede ver el usuario del `contexto`
+    (autorizacion.ContextoAutorizacion), o None si ve todo (admin).
+    - tarea / subtarea: tareas del índice TareaVisibilidad. Las visibles al abrir
+      la conexión se cargan de una vez; una tarea (o bloque) desconocido se
+      consulta con su primer aviso y se recuerda. Si pierde la visibilidad a
+      mitad de conexión la deja de recibir al reconectar (DURACION_MAX).
+    - daily: los suyos; Visualizador / Product Owner, los de integrantes
+      asignados a tareas de sus proyectos (como el Resumen de Daily).
+    """
+    from .models import Tarea, TareaVisibilidad
+
+    if contexto.es_admin:
+        return None
+    integrante_id = contexto.integrante.pk if contexto.integrante else None
+    visibles = TareaVisibilidad.objects.filter(integrante_id=integrante_id)
+    tareas = {t async for t in visibles.values_list("tarea_id", flat=True)}
+    bloques = {}  # bloque_id -> visible
+    equipo = {integrante_id}
+    if contexto.es_visualizador and contexto.proyectos_ids:
+        equipo |= await sync_to_async(
+            Tarea.objects.filter(epica__proyecto_id__in=contexto.proyectos_ids).ids_asignados
+        )()
+
+    async def ve(aviso):
+        tipo = aviso.get("tipo")
+        if tipo == "resync":
+            return True
+        if tipo == "daily":
+            return aviso.get("integrante") in equipo
+        if tipo == "tarea":
+            if aviso["id"] not in tareas and not aviso.get("borrada"):
+                if await visibles.filter(tarea_id=aviso["id"]).aexists():
+                    tareas.add(aviso["id"])
+            return aviso["id"] in tareas
+        if tipo == "subtarea":
+            bloque = aviso.get("bloque")
+            if bloque not in bloques:
+                bloques[bloque] = await visibles.filter(tarea__bloques__id=bloque).aexists()
+            return bloques[bloque]
+        return False
+
+    return ve
+
+
+# ==============================
+# Flujo SSE
+# ==============================
+def _evento_sse(aviso):
+    return f"id: {aviso.get('v', '')}\nevent: cambio\ndata: {json.dumps(aviso)}\n\n"
+
+
+async def flujo_sse(tipos=None, duracion=DURACION_MAX, filtro=None):
+    """
+    Iterador asíncrono con el texto SSE para StreamingHttpResponse. `filtro`:
+    función async aviso -> bool (filtro_visibilidad); None = todos los avisos.
+    """
+    suscripcion = broker().suscribir()
+    limite = time.monotonic() + duracion
+    try:
+        yield "retry: 3000\n\n"
+        while (restante := limite - time.monotonic()) > 0:
+            aviso = await suscripcion.siguiente(min(LATIDO, restante))
+            if aviso is None:
+                yield ": ping\n\n"
+            elif not tipos or aviso.get("tipo") in tipos or aviso.get("tipo") == "resync":
+                if filtro is None or await filtro(aviso):
+                    yield _evento_sse(aviso)
+    finally:
+        await suscripcion.cerrar()
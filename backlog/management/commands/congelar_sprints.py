@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+
+from backlog.models import Sprint
+from backlog.snapshots import congelar_sprint
+
+
+class Command(BaseCommand):
+    help = (
+        "Congela (SprintSnapshot) los sprints cerrados que aún no tienen foto. "
+        "Con --sprint ID --forzar vuelve a congelar un sprint ya congelado. "
+        "Programar a diario justo después de medianoche (las vistas no congelan: "
+        "hasta entonces calculan en vivo), p. ej. cron: 10 0 * * * python manage.py congelar_sprints"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sprint", type=int, action="append", help="Id de sprint (repetible). Por defecto: todos los cerrados")
+        parser.add_argument("--forzar", action="store_true", help="Recalcula aunque ya exista el snapshot")
+
+    def handle(self, *args, **opts):
+        sprints = Sprint.objects.order_by("inicio")
+        if opts["sprint"]:
+            sprints = sprints.filter(id__in=opts["sprint"])
+            faltan = set(opts["sprint"]) - set(sprints.values_list("id", flat=True))
+            if faltan:
+                raise CommandError(f"Sprints inexistentes: {sorted(faltan)}")
+
+        congelados = omitidos = 0
+        for sp in sprints:
+            if not sp.cerrado:
+                if opts["sprint"]:
+                    self.stdout.write(self.style.WARNING(f"{sp}: aún no termina, se omite."))
+                omitidos += 1
+                continue
+            ya = hasattr(sp, "snapshot")
+            congelar_sprint(sp, forzar=opts["forzar"])
+            if opts["forzar"] or not ya:
+                congelados += 1
+                self.stdout.write(f"{sp}: congelado.")
+
+        self.stdout.write(self.style.SUCCESS(f"{congelados} sprints congelados, {omitidos} abiertos omitidos."))
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+# Vistas principales (nombre de URL, querystring)
+RUTAS = [
+    ("home", ""),
+    ("backlog_lista", ""),
+    ("backlog_lista", "group=epica"),
+    ("backlog_matriz", ""),
+    ("kanban_board", ""),
+    ("daily_resumen", ""),
+    ("epica_list", ""),
+    ("dashboard_neusi", ""),
+]
+
+# SQLite: "SCAN backlog_tarea" es recorrido completo; "SCAN t USING INDEX x" no
+_SCAN_SQLITE = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+class Command(BaseCommand):
+    help = (
+        "Abre las vistas principales como un usuario, corre EXPLAIN sobre cada SELECT "
+        "que ejecutan e informa las que recorren tablas completas (Seq Scan)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuario", help="username con el que se abren las vistas. Por defecto: el primer superusuario")
+        parser.add_argument("--ruta", action="append", help="Ruta a revisar en vez de las principales (repetible), ej. /lista/?group=epica")
+        parser.add_argument(
+            "--min-filas", type=int, default=1000,
+            help="PostgreSQL: ignora Seq Scan sobre tablas con menos filas estimadas (por defecto 1000)",
+        )
+
+    def handle(self, *args, **opts):
+        User = get_user_model()
+        if opts["usuario"]:
+            user = User.objects.filter(username=opts["usuario"]).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by("id").first()
+        if user is None:
+            raise CommandError("No hay usuario para abrir las vistas (use --usuario).")
+
+        rutas = opts["ruta"] or [reverse(nombre) + (f"?{qs}" if qs else "") for nombre, qs in RUTAS]
+        host = next((h for h in settings.ALLOWED_HOSTS if h and h != "*" and not h.startswith(".")), "localhost")
+        cliente = Client(SERVER_NAME=host)
+        cliente.force_login(user)
+
+        con_scan = 0
+        for ruta in rutas:
+            consultas = self._capturar(cliente, ruta)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{ruta} — {len(consultas)} SELECT distintos"))
+            for sql, params in consultas:
+                tablas = self._seq_scans(sql, params, opts["min_filas"])
+                if tablas:
+                    con_scan += 1
+                    self.stdout.write(self.style.WARNING(f"  Seq Scan en {', '.join(tablas)}"))
+                    self.stdout.write(f"    {sql[:300]}{'…' if len(sql) > 300 else ''}")
+
+        estilo = self.style.SUCCESS if not con_scan else self.style.WARNING
+        self.stdout.write(estilo(f"{con_scan} consultas con recorrido completo de tabla."))
+
+    # ==============================
+    # Captura y EXPLAIN
+    # ==============================
+    def _capturar(self, cliente, ruta):
+        """SELECT únicos (sql, params) que ejecuta la vista al abrir `ruta`."""
+        vistas = {}
+
+        def capturar(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith("SELECT") and not many:
+                vistas.setdefault(sql, params)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capturar):
+            respuesta = cliente.get(ruta)
+        if respuesta.status_code != 200:
+            self.stdout.write(self.style.ERROR(f"  {ruta} respondió {respuesta.status_code}"))
+        return list(vistas.items())
+
+    def _seq_scans(self, sql, params, min_filas):
+        with connection.cursor() as c:
+            if connection.vendor == "postgresql":
+                c.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                plan = c.fetchone()[0]
+                tablas = sorted(set(self._nodos_seq_scan(plan[0]["Plan"])))
+                if tablas and min_filas:
+                    c.execute(
+                        "SELECT relname FROM pg_class WHERE relname = ANY(%s) AND reltuples >= %s",
+                        [tablas, min_filas],
+                    )
+                    tablas = sorted(r[0] for r in c.fetchall())
+                return tablas
+            if connection.vendor == "sqlite":
+                c.execute("EXPLAIN QUERY PLAN " + sql, params)
+                return sorted({m.group(1) for *_, detalle in c.fetchall() if (m := _SCAN_SQLITE.match(detalle))})
+        raise CommandError(f"EXPLAIN no soportado en {connection.vendor}")
+
+    def _nodos_seq_scan(self, nodo):
+        if nodo.get("Node Type") == "Seq Scan":
+            yield nodo["Relation Name"]
+        for hijo in nodo.get("Plans", ()):
+            yield from self._nodos_seq_scan(hijo)
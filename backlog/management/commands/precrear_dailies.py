@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from backlog.calendario import es_habil
+from backlog.models import precrear_dailies
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea en bloque las cabeceras vacías del Daily del día para los integrantes activos "
+        "(con su sprint), para que los envíos de la ventana 5:00–9:00 sean un UPDATE. "
+        "Programar poco antes de las 5:00, p. ej. cron: 50 4 * * 1-5 python manage.py precrear_dailies"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fecha", help="YYYY-MM-DD. Por defecto: hoy (hora local)")
+        parser.add_argument("--forzar", action="store_true", help="Precrea aunque la fecha no sea día hábil")
+
+    def handle(self, *args, **opts):
+        if opts["fecha"]:
+            try:
+                fecha = date.fromisoformat(opts["fecha"])
+            except ValueError:
+                raise CommandError("--fecha debe tener formato YYYY-MM-DD.")
+        else:
+            fecha = timezone.localdate()
+
+        if not opts["forzar"] and not es_habil(fecha):
+            self.stdout.write(self.style.WARNING(f"{fecha} no es día hábil: no se precrea nada (use --forzar)."))
+            return
+
+        creados = precrear_dailies(fecha)
+        self.stdout.write(self.style.SUCCESS(f"{creados} dailies precreados para {fecha}."))
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backlog.models import Daily, compute_alineacion_bulk, recalcular_alineacion
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los contadores de alineación guardados en Daily "
+        "(items_total, items_alineados, porcentaje_alineacion). "
+        "Con --verificar solo reporta diferencias sin escribir."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="Fecha inicial YYYY-MM-DD (opcional)")
+        parser.add_argument("--hasta", help="Fecha final YYYY-MM-DD (opcional)")
+        parser.add_argument("--verificar", action="store_true", help="No escribe; lista dailies desfasados")
+        parser.add_argument("--lote", type=int, default=1000, help="Dailies por lote (default 1000)")
+
+    def _fecha(self, valor, nombre):
+        if not valor:
+            return None
+        try:
+            return datetime.strptime(valor, "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError(f"--{nombre} debe tener formato YYYY-MM-DD")
+
+    def handle(self, *args, **opts):
+        qs = Daily.objects.order_by("id")
+        desde = self._fecha(opts["desde"], "desde")
+        hasta = self._fecha(opts["hasta"], "hasta")
+        if desde:
+            qs = qs.filter(fecha__gte=desde)
+        if hasta:
+            qs = qs.filter(fecha__lte=hasta)
+
+        lote = max(opts["lote"], 1)
+        filas = list(qs.values_list("id", "items_total", "items_alineados", "porcentaje_alineacion"))
+        revisados = desfasados = 0
+
+        for i in range(0, len(filas), lote):
+            bloque = filas[i:i + lote]
+            metricas = compute_alineacion_bulk([f[0] for f in bloque])
+            malos = []
+            for daily_id, total, alineados, pct in bloque:
+                m = metricas[daily_id]
+                if (total, alineados, pct) != (m["total"], m["alineados"], m["porcentaje"]):
+                    malos.append(daily_id)
+                    if opts["verificar"]:
+                        self.stdout.write(
+                            f"Daily #{daily_id}: guardado {alineados}/{total} ({pct}%) "
+                            f"≠ real {m['alineados']}/{m['total']} ({m['porcentaje']}%)"
+                        )
+            if malos and not opts["verificar"]:
+                recalcular_alineacion(malos)
+            revisados += len(bloque)
+            desfasados += len(malos)
+
+        accion = "desfasados" if opts["verificar"] else "corregidos"
+        estilo = self.style.WARNING if (opts["verificar"] and desfasados) else self.style.SUCCESS
+        self.stdout.write(estilo(f"{revisados} dailies revisados, {desfasados} {accion}."))
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from backlog.visibilidad import filas, reconstruir, sincronizar
+from backlog.models import TareaVisibilidad
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el índice de visibilidad (TareaVisibilidad) y corrige las filas que sobren o falten. "
+        "Normalmente no hace falta: las señales lo mantienen al día; sirve tras cargas masivas o .update()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--integrante", type=int, action="append", help="Id de integrante (repetible). Por defecto: todos")
+        parser.add_argument("--verificar", action="store_true", help="Solo informa el desvío, sin escribir")
+
+    def handle(self, *args, **opts):
+        ids = opts["integrante"]
+        if opts["verificar"]:
+            actuales = TareaVisibilidad.objects.all()
+            if ids:
+                actuales = actuales.filter(integrante_id__in=ids)
+            actuales = set(actuales.values_list("integrante_id", "tarea_id"))
+            deseadas = filas(ids)
+            faltan, sobran = len(deseadas - actuales), len(actuales - deseadas)
+            estilo = self.style.SUCCESS if not (faltan or sobran) else self.style.WARNING
+            self.stdout.write(estilo(f"Faltan {faltan} filas, sobran {sobran}."))
+            return
+
+        if ids:
+            with transaction.atomic():
+                agregadas, quitadas = sincronizar(integrante_ids=ids)
+        else:
+            agregadas, quitadas = reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Visibilidad al día: {agregadas} filas agregadas, {quitadas} quitadas."))
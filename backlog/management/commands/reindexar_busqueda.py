@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+
+from backlog.busqueda import reindexar
+from backlog.models import Tarea
+
+LOTE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Reescribe los documentos de búsqueda (TareaBusqueda) de todas las tareas. "
+        "Normalmente no hace falta: las señales los mantienen al día al guardar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tarea", type=int, action="append", help="Id de tarea (repetible). Por defecto: todas")
+
+    def handle(self, *args, **opts):
+        ids = opts["tarea"] or list(Tarea.objects.order_by("id").values_list("id", flat=True))
+        for i in range(0, len(ids), LOTE):
+            reindexar(ids[i:i + LOTE])
+        self.stdout.write(self.style.SUCCESS(f"{len(ids)} tareas reindexadas."))
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from backlog.cache_datos import invalidar
+from backlog.calendario import festivos_colombia
+from backlog.models import Festivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Siembra la tabla Festivo con los festivos de ley de Colombia (fijos, Ley Emiliani "
+        "y los que dependen de la Pascua). No toca fechas ya cargadas salvo con --reemplazar."
+    )
+
+    def add_arguments(self, parser):
+        anio = timezone.localdate().year
+        parser.add_argument("--desde", type=int, default=anio - 1, help=f"Primer año (por defecto {anio - 1})")
+        parser.add_argument("--hasta", type=int, default=anio + 2, help=f"Último año (por defecto {anio + 2})")
+        parser.add_argument("--reemplazar", action="store_true", help="Borra los festivos de esos años antes de sembrar")
+
+    def handle(self, *args, **opts):
+        desde, hasta = opts["desde"], opts["hasta"]
+        if hasta < desde:
+            raise CommandError("--hasta debe ser mayor o igual que --desde.")
+
+        # Dos festivos pueden caer el mismo lunes: una fila con ambos nombres
+        nombres = {}
+        for anio in range(desde, hasta + 1):
+            for fecha, nombre in festivos_colombia(anio):
+                nombres.setdefault(fecha, []).append(nombre)
+
+        with transaction.atomic():
+            borrados = 0
+            if opts["reemplazar"]:
+                borrados, _ = Festivo.objects.filter(fecha__year__gte=desde, fecha__year__lte=hasta).delete()
+            existentes = set(Festivo.objects.filter(fecha__in=list(nombres)).values_list("fecha", flat=True))
+            nuevos = [
+                Festivo(fecha=fecha, nombre=" / ".join(n)[:100])
+                for fecha, n in sorted(nombres.items()) if fecha not in existentes
+            ]
+            Festivo.objects.bulk_create(nuevos, ignore_conflicts=True)
+            # bulk_create no dispara señales
+            invalidar("festivos", "catalogo")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(nuevos)} festivos agregados ({desde}–{hasta}), {len(existentes)} ya existían"
+            + (f", {borrados} borrados." if opts["reemplazar"] else ".")
+        ))
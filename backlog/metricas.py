@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Motores de métricas calculadas en la BD.
+
+- Daily por integrante: una consulta agrupada por integrante (la alineación se
+  suma desde los contadores de Daily), costo constante sin importar el tamaño
+  del equipo o del rango.
+- Burndown: SP planificados y SP hechos por día en una sola consulta agrupada
+  (UNION de HU y subtareas); el calendario del sprint se completa aparte, así
+  que el costo no depende de cuántas tareas se cerraron. Los días hábiles salen
+  de calendario.py (festivos incluidos).
+- Bitácora de estados: historial de una HU y su tiempo de ciclo leídos de
+  EstadoEvento (una consulta por el índice (tarea, ocurrido_en)).
+"""
+from datetime import date
+
+from django.db.models import Case, Count, DateField, F, Q, Sum, When
+from django.db.models.functions import Coalesce, TruncDate
+
+from . import calendario
+from .models import Daily, EstadoEvento
+
+
+def _pct(valor, total) -> float:
+    return (100.0 * valor / total) if total else 0.0
+
+
+def metricas_daily_por_integrante(ini=None, fin=None, integrante_ids=None, dias_habiles=0, sprint=None):
+    """
+    Devuelve {integrante_id: dict} con:
+      - presentes, a_tiempo, con_retraso, faltantes (conteos de dailies)
+      - items_total, items_alineados (líneas de daily)
+      - participacion, cumplimiento, retrasos, no_completado, efectividad (%)
+    Si se pasa `integrante_ids`, todos aparecen en el resultado (con ceros si no
+    registraron dailies). Con `sprint` se usa su rango inicio..fin;
+    `ini`/`fin` None = sin límite de fechas.
+    """
+    if sprint is not None and not (ini and fin):
+        ini, fin = sprint.inicio, sprint.fin
+
+    dailies = Daily.objects.filter(registrado=True)  # sin las filas precreadas aún no enviadas
+    if ini and fin:
+        dailies = dailies.filter(fecha__range=(ini, fin))
+    if integrante_ids is not None:
+        integrante_ids = list(integrante_ids)
+        dailies = dailies.filter(integrante_id__in=integrante_ids)
+
+    # Presencia, horario y alineación (contadores desnormalizados en Daily): una fila por integrante
+    conteos = (
+        dailies.values("integrante_id")
+        .annotate(
+            presentes=Count("id"),
+            a_tiempo=Count("id", filter=Q(fuera_horario=False)),
+            con_retraso=Count("id", filter=Q(fuera_horario=True)),
+            items_total=Coalesce(Sum("items_total"), 0),
+            items_alineados=Coalesce(Sum("items_alineados"), 0),
+        )
+        .order_by()
+    )
+
+    campos = ("presentes", "a_tiempo", "con_retraso", "items_total", "items_alineados")
+    res = {iid: dict.fromkeys(campos, 0) for iid in (integrante_ids or [])}
+    for r in conteos:
+        res[r["integrante_id"]] = {c: r[c] for c in campos}
+
+    for m in res.values():
+        m["faltantes"] = max(dias_habiles - m["presentes"], 0)
+        m["participacion"] = _pct(m["presentes"], dias_habiles)
+        m["cumplimiento"] = _pct(m["a_tiempo"], dias_habiles)
+        m["retrasos"] = _pct(m["con_retraso"], dias_habiles)
+        m["no_completado"] = _pct(m["faltantes"], dias_habiles)
+        m["efectividad"] = _pct(m["items_alineados"], m["items_total"])
+    return res
+
+
+# ==============================
+# Burndown
+# ==============================
+def serie_burndown(inicio, fin, tareas, subtareas):
+    """
+    {"dias": [iso...], "planificado": SP, "hecho": [SP acumulados por día]}.
+
+    Hecho = HU terminadas por la fecha local de `fecha_cierre` + subtareas
+    terminadas por `fecha_fin`, dentro de inicio..fin. Planificado = SP de las
+    HU + SP de sus subtareas. `tareas` / `subtareas` son los querysets ya filtrados.
+    """
+    def por_dia(qs, dia):
+        return (
+            qs.order_by()
+            .annotate(dia=Case(When(terminada=True, then=dia), output_field=DateField()))
+            .values("dia")
+            .annotate(plan=Coalesce(Sum("esfuerzo_sp"), 0), hecho=Coalesce(Sum("esfuerzo_sp", filter=Q(terminada=True)), 0))
+            .values_list("dia", "plan", "hecho")
+        )
+
+    planificado, hecho_por_dia = 0, {}
+    for dia, plan, hecho in por_dia(tareas, TruncDate("fecha_cierre")).union(
+        por_dia(subtareas, F("fecha_fin")), all=True
+    ):
+        planificado += plan
+        if isinstance(dia, str):  # SQLite no tipa las columnas de un UNION
+            dia = date.fromisoformat(dia)
+        if dia and inicio <= dia <= fin:
+            hecho_por_dia[dia] = hecho_por_dia.get(dia, 0) + hecho
+
+    # Calendario del sprint (días corridos) con el acumulado
+    dias, hecho, acumulado = [], [], 0
+    for d in calendario.dias(inicio, fin):
+        acumulado += hecho_por_dia.get(d, 0)
+        dias.append(d.isoformat())
+        hecho.append(acumulado)
+    return {"dias": dias, "planificado": planificado, "hecho": hecho}
+
+
+def completar_burndown(serie):
+    """
+    Agrega a una serie (de serie_burndown o de un SprintSnapshot) los SP
+    restantes por día, la línea ideal, que solo baja en días hábiles (sin
+    festivos), y "habiles" (fechas iso) para un eje de solo días laborales.
+    """
+    planificado = serie["planificado"]
+    fechas = [date.fromisoformat(d) for d in serie["dias"]]
+    lista = {d.isoformat() for d in calendario.lista_habiles(fechas[0], fechas[-1])} if fechas else set()
+    habiles = [d in lista for d in serie["dias"]]
+    total_habiles = sum(habiles)
+    ideal, transcurridos = [], 0
+    for es_habil in habiles:
+        transcurridos += es_habil
+        falta = 1 - transcurridos / total_habiles if total_habiles else 0
+        ideal.append(round(planificado * falta, 2))
+    return {
+        **serie,
+        "restante": [max(planificado - h, 0) for h in serie["hecho"]],
+        "ideal": ideal,
+        "habiles": [d for d in serie["dias"] if d in lista],
+    }
+
+
+# ==============================
+# Bitácora de estados (EstadoEvento)
+# ==============================
+def historial_estados(tarea_id):
+    """Eventos de la HU y de sus subtareas en orden de ocurrencia, con actor y subtarea."""
+    return list(EstadoEvento.objects.filter(tarea_id=tarea_id).select_related("actor", "subtarea"))
+
+
+def tiempo_ciclo(eventos):
+    """
+    timedelta desde que la HU pasó a EN_PROGRESO por primera vez hasta que quedó
+    terminada (inicio de su último tramo terminada). None si no está terminada,
+    nunca pasó por EN_PROGRESO o alguno de los dos extremos es un evento inferido
+    (fecha reconstruida por la migración, no observada).
+    """
+    de_hu = [e for e in eventos if e.entidad == "tarea"]
+    if not de_hu or not de_hu[-1].terminada:
+        return None
+    fin = de_hu[-1]
+    for e in reversed(de_hu):
+        if not e.terminada:
+            break
+        fin = e
+    inicio = next((e for e in de_hu if e.estado_nuevo == "EN_PROGRESO"), None)
+    if inicio is None or inicio.inferido or fin.inferido or fin.ocurrido_en < inicio.ocurrido_en:
+        return None
+    return fin.ocurrido_en - inicio.ocurrido_en
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.6 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+from backlog.migrations._ddl import agregar_columna, quitar_columna
+
+CAMPOS = ("items_total", "items_alineados", "porcentaje_alineacion")
+
+
+def agregar_contadores(apps, schema_editor):
+    Daily = apps.get_model("backlog", "Daily")
+    agregar_columna(schema_editor, Daily, "items_total", models.PositiveIntegerField(default=0))
+    agregar_columna(schema_editor, Daily, "items_alineados", models.PositiveIntegerField(default=0))
+    agregar_columna(schema_editor, Daily, "porcentaje_alineacion", models.PositiveSmallIntegerField(default=0))
+    backfill(apps, schema_editor)
+
+
+def backfill(apps, schema_editor):
+    """
+    Contadores de todos los dailies con la regla de Daily.alineacion en un UPDATE
+    agrupado (SQL portable). La ventana de la tarea es el min/max de sus bloques,
+    igual que la columna ventana_inicio/fin de 0028. El porcentaje se redondea en
+    Python (round) por cada par (total, alineados) distinto, como en la propiedad.
+    """
+    qn = schema_editor.quote_name
+    tablas = {
+        clave: qn(apps.get_model("backlog", modelo)._meta.db_table)
+        for clave, modelo in (
+            ("d", "Daily"), ("i", "DailyItem"), ("t", "Tarea"), ("s", "Subtarea"), ("b", "BloqueTarea"),
+        )
+    }
+    schema_editor.execute(
+        "UPDATE {d} SET "
+        "items_total = (SELECT COUNT(*) FROM {i} i WHERE i.daily_id = {d}.id), "
+        "items_alineados = ("
+        " SELECT COUNT(*) FROM {i} i"
+        " LEFT JOIN {s} s ON s.id = i.subtarea_id"
+        " LEFT JOIN {b} b ON b.id = s.bloque_id"
+        " LEFT JOIN {t} t ON t.id = i.tarea_id"
+        " WHERE i.daily_id = {d}.id AND ("
+        "  (s.id IS NOT NULL AND s.responsable_id = {d}.integrante_id"
+        "   AND COALESCE(s.fecha_inicio, b.fecha_inicio) <= {d}.fecha"
+        "   AND COALESCE(s.fecha_fin, b.fecha_fin) >= {d}.fecha)"
+        "  OR (i.subtarea_id IS NULL AND t.id IS NOT NULL AND t.asignado_a_id = {d}.integrante_id AND ("
+        "   ((SELECT MIN(bt.fecha_inicio) FROM {b} bt WHERE bt.tarea_id = t.id) <= {d}.fecha"
+        "    AND (SELECT MAX(bt.fecha_fin) FROM {b} bt WHERE bt.tarea_id = t.id) >= {d}.fecha)"
+        "   OR ({d}.sprint_id IS NOT NULL AND t.sprint_id = {d}.sprint_id)))))".format(**tablas)
+    )
+    with schema_editor.connection.cursor() as c:
+        c.execute(
+            "SELECT DISTINCT items_total, items_alineados FROM {d} WHERE items_total > 0".format(**tablas)
+        )
+        pares = c.fetchall()
+    for total, alineados in pares:
+        schema_editor.execute(
+            "UPDATE {d} SET porcentaje_alineacion = %s WHERE items_total = %s AND items_alineados = %s".format(**tablas),
+            [round(100 * alineados / total), total, alineados],
+        )
+
+
+def quitar_contadores(apps, schema_editor):
+    Daily = apps.get_model("backlog", "Daily")
+    for columna in CAMPOS:
+        quitar_columna(schema_editor, Daily, columna)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backlog', '0026_perf_indices'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='daily',
+            options={'managed': False},
+        ),
+        migrations.AlterModelOptions(
+            name='dailyitem',
+            options={'managed': False},
+        ),
+        # Tabla no gestionada: las columnas se crean a mano (con backfill).
+        migrations.RunPython(agregar_contadores, reverse_code=quitar_contadores),
+    ]
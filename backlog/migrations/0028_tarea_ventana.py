@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-17 15:05
+
+from django.db import migrations, models
+
+from backlog.migrations._ddl import agregar_columna, borrar_indice, crear_indice, quitar_columna
+
+INDICE = "idx_tarea_ventana"
+
+
+def agregar_ventana(apps, schema_editor):
+    Tarea = apps.get_model("backlog", "Tarea")
+    agregar_columna(schema_editor, Tarea, "ventana_inicio", models.DateField(null=True))
+    agregar_columna(schema_editor, Tarea, "ventana_fin", models.DateField(null=True))
+    crear_indice(schema_editor, Tarea, INDICE, ["ventana_inicio", "ventana_fin"])
+
+    # Backfill: min/max de los bloques de cada tarea (SQL portable)
+    qn = schema_editor.quote_name
+    tarea = qn(Tarea._meta.db_table)
+    bloque = qn(apps.get_model("backlog", "BloqueTarea")._meta.db_table)
+    schema_editor.execute(
+        "UPDATE {t} SET "
+        "ventana_inicio = (SELECT MIN(b.fecha_inicio) FROM {b} b WHERE b.tarea_id = {t}.id), "
+        "ventana_fin = (SELECT MAX(b.fecha_fin) FROM {b} b WHERE b.tarea_id = {t}.id)".format(t=tarea, b=bloque)
+    )
+
+
+def quitar_ventana(apps, schema_editor):
+    Tarea = apps.get_model("backlog", "Tarea")
+    borrar_indice(schema_editor, INDICE)
+    quitar_columna(schema_editor, Tarea, "ventana_fin")
+    quitar_columna(schema_editor, Tarea, "ventana_inicio")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backlog', '0027_daily_contadores_alineacion'),
+    ]
+
+    operations = [
+        # Tabla no gestionada: columnas e índice se crean a mano (con backfill).
+        # Los contadores de 0027 ya usan el min/max de los bloques: no cambian.
+        migrations.RunPython(agregar_ventana, reverse_code=quitar_ventana),
+    ]
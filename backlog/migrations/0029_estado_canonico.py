@@ -0,0 +1,132 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:10
+
+from django.db import migrations, models
+
+from backlog.migrations._ddl import (
+    agregar_check, agregar_columna, borrar_indice, crear_indice, quitar_check, quitar_columna,
+)
+
+# Grafía heredada (ya en mayúsculas/minúsculas según el modelo) → valor canónico
+MAPEO_TAREA = {
+    "NUEVO": "NUEVO",
+    "PENDIENTE": "NUEVO",
+    "EN_PROGRESO": "EN_PROGRESO",
+    "EN PROGRESO": "EN_PROGRESO",
+    "BLOQUEADO": "BLOQUEADO",
+    "BLOQUEADA": "BLOQUEADO",
+    "COMPLETADO": "COMPLETADO",
+    "COMPLETADA": "COMPLETADO",
+    # Grafías encontradas en los respaldos y en los reportes de subtareas
+    "": "NUEVO",  # NULL o vacío: estado inicial (como normalizar_estado_tarea)
+    "TODO": "NUEVO",
+    "APROBADO": "COMPLETADO",
+    "APROBADA": "COMPLETADO",
+    "CERRADO": "COMPLETADO",
+    "CERRADA": "COMPLETADO",
+    "ENTREGADO": "COMPLETADO",
+    "ENTREGADA": "COMPLETADO",
+}
+MAPEO_SUBTAREA = {
+    "pendiente": "pendiente",
+    "nuevo": "pendiente",
+    "nueva": "pendiente",
+    "en_progreso": "en_progreso",
+    "en progreso": "en_progreso",
+    "bloqueada": "bloqueada",
+    "bloqueado": "bloqueada",
+    "entregada": "entregada",
+    "cerrada": "cerrada",
+    "completado": "cerrada",
+    "completada": "cerrada",
+    "": "pendiente",
+    "todo": "pendiente",
+    "aprobado": "cerrada",
+    "aprobada": "cerrada",
+}
+TERMINADA_TAREA = ("COMPLETADO",)
+TERMINADA_SUBTAREA = ("entregada", "cerrada")
+
+
+def _lista(valores):
+    return ", ".join("'%s'" % v for v in valores)
+
+
+def _desconocidos(schema_editor, tabla, funcion, mapeo):
+    """Valores de estado (distintos) que no están en el mapeo."""
+    claves = ", ".join(["%s"] * len(mapeo))
+    with schema_editor.connection.cursor() as c:
+        c.execute(
+            "SELECT DISTINCT estado FROM %s WHERE %s(TRIM(COALESCE(estado, ''))) NOT IN (%s)"
+            % (schema_editor.quote_name(tabla), funcion, claves),
+            list(mapeo),
+        )
+        return sorted(repr(r[0]) for r in c.fetchall())
+
+
+def _normalizar(schema_editor, tabla, funcion, mapeo, terminados):
+    # Sin valor por defecto: un estado desconocido aborta la migración en vez de
+    # reescribirse en silencio (agregarlo al mapeo y volver a migrar)
+    desconocidos = _desconocidos(schema_editor, tabla, funcion, mapeo)
+    if desconocidos:
+        raise RuntimeError(
+            "%s tiene estados sin mapeo canónico: %s. Agréguelos a MAPEO_* en %s."
+            % (tabla, ", ".join(desconocidos), __name__)
+        )
+    qn = schema_editor.quote_name
+    casos = " ".join("WHEN %s THEN %s" for _ in mapeo)
+    params = [x for par in mapeo.items() for x in par]
+    schema_editor.execute(
+        "UPDATE %s SET estado = CASE %s(TRIM(COALESCE(estado, ''))) %s ELSE estado END" % (qn(tabla), funcion, casos),
+        params,
+    )
+    schema_editor.execute(
+        "UPDATE %s SET terminada = (estado IN (%s))" % (qn(tabla), _lista(terminados))
+    )
+
+
+def estado_canonico(apps, schema_editor):
+    Tarea = apps.get_model("backlog", "Tarea")
+    Subtarea = apps.get_model("backlog", "Subtarea")
+
+    agregar_columna(schema_editor, Tarea, "terminada", models.BooleanField(default=False))
+    agregar_columna(schema_editor, Subtarea, "terminada", models.BooleanField(default=False))
+
+    _normalizar(schema_editor, Tarea._meta.db_table, "UPPER", MAPEO_TAREA, TERMINADA_TAREA)
+    _normalizar(schema_editor, Subtarea._meta.db_table, "LOWER", MAPEO_SUBTAREA, TERMINADA_SUBTAREA)
+
+    crear_indice(schema_editor, Tarea, "idx_tarea_sprint_terminada", ["sprint_id", "terminada"])
+    crear_indice(schema_editor, Subtarea, "idx_subtarea_resp_terminada", ["responsable_id", "terminada"])
+
+    agregar_check(schema_editor, Tarea, "tarea_estado_valido",
+                  "estado IN (%s)" % _lista(sorted(set(MAPEO_TAREA.values()))))
+    agregar_check(schema_editor, Tarea, "tarea_terminada_coherente",
+                  "terminada = (estado IN (%s))" % _lista(TERMINADA_TAREA))
+    agregar_check(schema_editor, Subtarea, "subtarea_estado_valido",
+                  "estado IN (%s)" % _lista(sorted(set(MAPEO_SUBTAREA.values()))))
+    agregar_check(schema_editor, Subtarea, "subtarea_terminada_coherente",
+                  "terminada = (estado IN (%s))" % _lista(TERMINADA_SUBTAREA))
+
+
+def revertir_estado_canonico(apps, schema_editor):
+    # La reescritura de valores heredados no se deshace (los canónicos son válidos antes y después)
+    Tarea = apps.get_model("backlog", "Tarea")
+    Subtarea = apps.get_model("backlog", "Subtarea")
+    for modelo, prefijo in ((Tarea, "tarea"), (Subtarea, "subtarea")):
+        quitar_check(schema_editor, modelo, "%s_terminada_coherente" % prefijo)
+        quitar_check(schema_editor, modelo, "%s_estado_valido" % prefijo)
+    borrar_indice(schema_editor, "idx_tarea_sprint_terminada")
+    borrar_indice(schema_editor, "idx_subtarea_resp_terminada")
+    quitar_columna(schema_editor, Tarea, "terminada")
+    quitar_columna(schema_editor, Subtarea, "terminada")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backlog', '0028_tarea_ventana'),
+    ]
+
+    operations = [
+        # Tablas no gestionadas: columnas, índices y CHECK se crean a mano.
+        migrations.RunPython(estado_canonico, reverse_code=revertir_estado_canonico),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-17 17:20
+
+from django.db import migrations
+
+from backlog.migrations._ddl import borrar_indice, crear_indice
+
+INDICE = "idx_tarea_asignados_integrante_tarea"
+
+
+def migrar_asignado_legado(apps, schema_editor):
+    """Copia Tarea.asignado_a a la tabla puente de `asignados` donde falte."""
+    Tarea = apps.get_model("backlog", "Tarea")
+    Puente = Tarea._meta.get_field("asignados").remote_field.through
+    qn = schema_editor.quote_name
+    tarea, puente = qn(Tarea._meta.db_table), qn(Puente._meta.db_table)
+    schema_editor.execute(
+        "INSERT INTO {p} (tarea_id, integrante_id) "
+        "SELECT t.id, t.asignado_a_id FROM {t} t "
+        "WHERE t.asignado_a_id IS NOT NULL AND NOT EXISTS ("
+        "SELECT 1 FROM {p} a WHERE a.tarea_id = t.id AND a.integrante_id = t.asignado_a_id)".format(t=tarea, p=puente)
+    )
+    # "Tareas de X": el único (tarea_id, integrante_id) no sirve cuando se filtra por integrante
+    crear_indice(schema_editor, Puente, INDICE, ["integrante_id", "tarea_id"])
+
+
+def quitar_indice(apps, schema_editor):
+    # Las filas copiadas se conservan: siguen siendo asignaciones válidas
+    borrar_indice(schema_editor, INDICE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backlog', '0029_estado_canonico'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrar_asignado_legado, reverse_code=quitar_indice),
+    ]
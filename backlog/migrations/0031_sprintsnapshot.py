@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-17 14:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backlog', '0030_tarea_asignacion_unica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SprintSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('congelado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sp_planificados', models.PositiveIntegerField(default=0)),
+                ('sp_completados', models.PositiveIntegerField(default=0)),
+                ('hu_total', models.PositiveIntegerField(default=0)),
+                ('hu_terminadas', models.PositiveIntegerField(default=0)),
+                ('st_total', models.PositiveIntegerField(default=0)),
+                ('st_terminadas', models.PositiveIntegerField(default=0)),
+                ('sp_subtareas_terminadas', models.PositiveIntegerField(default=0)),
+                ('hu_por_estado', models.JSONField(default=dict)),
+                ('st_por_estado', models.JSONField(default=dict)),
+                ('por_proyecto', models.JSONField(default=dict)),
+                ('por_integrante', models.JSONField(default=dict)),
+                ('daily', models.JSONField(default=dict)),
+                ('burndown', models.JSONField(default=dict)),
+                ('sprint', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='backlog.sprint')),
+            ],
+            options={
+                'db_table': 'backlog_sprintsnapshot',
+                'ordering': ['-sprint__inicio'],
+            },
+        ),
+    ]
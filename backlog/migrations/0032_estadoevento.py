@@ -0,0 +1,101 @@
+# Generated by Django 5.2.6 on 2026-10-17 14:37
+
+from datetime import datetime, time, timezone as dt_timezone
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+LOTE = 2000
+
+
+def _momento(valor):
+    """datetime aware para una fecha (medianoche local) o fecha-hora de la BD (None -> ahora)."""
+    if valor is None:
+        return timezone.now()
+    if isinstance(valor, str):  # SQLite devuelve texto en consultas crudas
+        valor = datetime.fromisoformat(valor) if len(valor) > 10 else datetime.fromisoformat(valor).date()
+    if not isinstance(valor, datetime):
+        return timezone.make_aware(datetime.combine(valor, time.min))
+    # Con USE_TZ las fecha-hora se guardan en UTC
+    return valor if timezone.is_aware(valor) else timezone.make_aware(valor, dt_timezone.utc)
+
+
+def reconstruir_eventos(apps, schema_editor):
+    """
+    Un evento inferido por Tarea/Subtarea con su estado actual ("" -> estado):
+    fechado en fecha_cierre (HU terminada) / fecha_fin (subtarea terminada),
+    o en el inicio de su ventana / fecha_inicio si sigue abierta.
+    """
+    Evento = apps.get_model("backlog", "EstadoEvento")
+    qn = schema_editor.quote_name
+    tarea = qn(apps.get_model("backlog", "Tarea")._meta.db_table)
+    subtarea = qn(apps.get_model("backlog", "Subtarea")._meta.db_table)
+    bloque = qn(apps.get_model("backlog", "BloqueTarea")._meta.db_table)
+
+    consultas = [
+        (
+            "tarea",
+            "SELECT t.id, NULL, t.sprint_id, t.estado, t.terminada, t.esfuerzo_sp, "
+            "CASE WHEN t.terminada THEN t.fecha_cierre END, t.ventana_inicio "
+            "FROM {t} t ORDER BY t.id".format(t=tarea),
+        ),
+        (
+            "subtarea",
+            "SELECT b.tarea_id, s.id, t.sprint_id, s.estado, s.terminada, s.esfuerzo_sp, "
+            "CASE WHEN s.terminada THEN s.fecha_fin END, s.fecha_inicio "
+            "FROM {s} s JOIN {b} b ON b.id = s.bloque_id JOIN {t} t ON t.id = b.tarea_id "
+            "ORDER BY s.id".format(s=subtarea, b=bloque, t=tarea),
+        ),
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        for entidad, sql in consultas:
+            cursor.execute(sql)
+            while True:
+                filas = cursor.fetchmany(LOTE)
+                if not filas:
+                    break
+                Evento.objects.bulk_create([
+                    Evento(
+                        entidad=entidad, tarea_id=tarea_id, subtarea_id=subtarea_id, sprint_id=sprint_id,
+                        estado_anterior="", estado_nuevo=estado, terminada=bool(terminada), esfuerzo_sp=sp,
+                        ocurrido_en=_momento(cierre if cierre is not None else inicio), inferido=True,
+                    )
+                    for tarea_id, subtarea_id, sprint_id, estado, terminada, sp, cierre, inicio in filas
+                ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backlog', '0031_sprintsnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoEvento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entidad', models.CharField(choices=[('tarea', 'Tarea'), ('subtarea', 'Subtarea')], max_length=8)),
+                ('estado_anterior', models.CharField(blank=True, max_length=20)),
+                ('estado_nuevo', models.CharField(max_length=20)),
+                ('terminada', models.BooleanField(default=False)),
+                ('esfuerzo_sp', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('ocurrido_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('inferido', models.BooleanField(default=False)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('sprint', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='eventos_estado', to='backlog.sprint')),
+                ('subtarea', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='eventos_estado', to='backlog.subtarea')),
+                ('tarea', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos_estado', to='backlog.tarea')),
+            ],
+            options={
+                'db_table': 'backlog_estadoevento',
+                'ordering': ['ocurrido_en', 'id'],
+                'indexes': [models.Index(fields=['sprint', 'ocurrido_en'], name='idx_evento_sprint_fecha'), models.Index(fields=['tarea', 'ocurrido_en'], name='idx_evento_tarea_fecha'), models.Index(fields=['subtarea', 'ocurrido_en'], name='idx_evento_subtarea_fecha')],
+            },
+        ),
+        migrations.RunPython(reconstruir_eventos, reverse_code=migrations.RunPython.noop),
+    ]
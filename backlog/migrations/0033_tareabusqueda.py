@@ -0,0 +1,112 @@
+# Generated by Django 5.2.6 on 2026-10-17 14:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# PostgreSQL: sin tildes antes de la raíz en español (translate es IMMUTABLE, sirve en una columna generada)
+_SIN_TILDES = "translate(%s, 'ÁÉÍÓÚÜáéíóúü', 'AEIOUUaeiouu')"
+
+
+def crear_indice_texto(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        titulo, documento = _SIN_TILDES % "titulo", _SIN_TILDES % "documento"
+        schema_editor.execute(
+            "ALTER TABLE backlog_tareabusqueda ADD COLUMN vector tsvector GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('spanish'::regconfig, {titulo}), 'A') || "
+            f"setweight(to_tsvector('spanish'::regconfig, {documento}), 'B')) STORED"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tareabusqueda_vector ON backlog_tareabusqueda USING GIN (vector)"
+        )
+    elif schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE backlog_tareabusqueda_fts USING fts5("
+            "titulo, documento, content='backlog_tareabusqueda', content_rowid='tarea_id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        nuevo = "INSERT INTO backlog_tareabusqueda_fts(rowid, titulo, documento) VALUES (new.tarea_id, new.titulo, new.documento);"
+        viejo = ("INSERT INTO backlog_tareabusqueda_fts(backlog_tareabusqueda_fts, rowid, titulo, documento) "
+                 "VALUES ('delete', old.tarea_id, old.titulo, old.documento);")
+        for nombre, evento, cuerpo in (
+            ("ai", "INSERT", nuevo),
+            ("ad", "DELETE", viejo),
+            ("au", "UPDATE", viejo + " " + nuevo),
+        ):
+            schema_editor.execute(
+                f"CREATE TRIGGER backlog_tareabusqueda_{nombre} AFTER {evento} ON backlog_tareabusqueda "
+                f"BEGIN {cuerpo} END"
+            )
+
+
+def borrar_indice_texto(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS idx_tareabusqueda_vector")
+        schema_editor.execute("ALTER TABLE backlog_tareabusqueda DROP COLUMN IF EXISTS vector")
+    elif schema_editor.connection.vendor == "sqlite":
+        for nombre in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS backlog_tareabusqueda_{nombre}")
+        schema_editor.execute("DROP TABLE IF EXISTS backlog_tareabusqueda_fts")
+
+
+def poblar_documentos(apps, schema_editor):
+    """Un documento por Tarea existente (mismo contenido que busqueda.documentos)."""
+    qn = schema_editor.quote_name
+    t = {m: qn(apps.get_model("backlog", m)._meta.db_table)
+         for m in ("Tarea", "Epica", "BloqueTarea", "Subtarea", "Evidencia", "EvidenciaSubtarea", "TareaBusqueda")}
+    if schema_editor.connection.vendor == "postgresql":
+        agg = "string_agg({}, ' ')"
+    else:
+        agg = "group_concat({}, ' ')"
+
+    def texto(sql):
+        return f"COALESCE({sql}, '')"
+
+    def unir(*partes):
+        return " || ' ' || ".join(partes)
+
+    bloques = f"SELECT {agg.format('b.nombre')} FROM {t['BloqueTarea']} b WHERE b.tarea_id = ta.id"
+    subtareas = (
+        f"SELECT {agg.format(unir(texto('s.titulo'), texto('s.descripcion')))} "
+        f"FROM {t['Subtarea']} s JOIN {t['BloqueTarea']} b ON b.id = s.bloque_id WHERE b.tarea_id = ta.id"
+    )
+    evidencias = f"SELECT {agg.format('v.comentario')} FROM {t['Evidencia']} v WHERE v.tarea_id = ta.id"
+    evidencias_st = (
+        f"SELECT {agg.format('v.comentario')} FROM {t['EvidenciaSubtarea']} v "
+        f"JOIN {t['Subtarea']} s ON s.id = v.subtarea_id "
+        f"JOIN {t['BloqueTarea']} b ON b.id = s.bloque_id WHERE b.tarea_id = ta.id"
+    )
+    titulo = unir(texto("ta.titulo"), texto("e.titulo"))
+    documento = unir(
+        texto("ta.descripcion"), texto("ta.criterios_aceptacion"),
+        *(texto(f"({q})") for q in (bloques, subtareas, evidencias, evidencias_st)),
+    )
+    schema_editor.execute(
+        f"INSERT INTO {t['TareaBusqueda']} (tarea_id, titulo, documento, actualizado_en) "
+        f"SELECT ta.id, {titulo}, {documento}, CURRENT_TIMESTAMP "
+        f"FROM {t['Tarea']} ta LEFT JOIN {t['Epica']} e ON e.id = ta.epica_id",
+        None,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backlog', '0032_estadoevento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TareaBusqueda',
+            fields=[
+                ('tarea', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='busqueda', serialize=False, to='backlog.tarea')),
+                ('titulo', models.TextField(blank=True, default='')),
+                ('documento', models.TextField(blank=True, default='')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'backlog_tareabusqueda',
+            },
+        ),
+        migrations.RunPython(crear_indice_texto, reverse_code=borrar_indice_texto),
+        migrations.RunPython(poblar_documentos, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-17 14:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Integrante.ROLES_VISUALIZADOR al momento de esta migración
+_ROLES_VISUALIZADOR = ("Visualizador", "Product Owner", "Product Owner Coofisam360")
+
+
+def poblar_visibilidad(apps, schema_editor):
+    """Mismas filas que visibilidad.filas() para todo el backlog, con dos INSERT ... SELECT."""
+    qn = schema_editor.quote_name
+    Tarea = apps.get_model("backlog", "Tarea")
+    t = {m: qn(apps.get_model("backlog", m)._meta.db_table)
+         for m in ("Integrante", "PermisoProyecto", "Proyecto", "Epica", "TareaVisibilidad")}
+    t["TareaAsignacion"] = qn(Tarea._meta.get_field("asignados").remote_field.through._meta.db_table)
+    t["Tarea"] = qn(Tarea._meta.db_table)
+    roles = ", ".join(["%s"] * len(_ROLES_VISUALIZADOR))
+
+    # Por asignación (todos menos visualizadores)
+    schema_editor.execute(
+        f"INSERT INTO {t['TareaVisibilidad']} (integrante_id, tarea_id) "
+        f"SELECT a.integrante_id, a.tarea_id FROM {t['TareaAsignacion']} a "
+        f"JOIN {t['Integrante']} i ON i.id = a.integrante_id WHERE i.rol NOT IN ({roles})",
+        _ROLES_VISUALIZADOR,
+    )
+    # Por proyecto autorizado (visualizadores)
+    schema_editor.execute(
+        f"INSERT INTO {t['TareaVisibilidad']} (integrante_id, tarea_id) "
+        f"SELECT DISTINCT pp.integrante_id, ta.id FROM {t['PermisoProyecto']} pp "
+        f"JOIN {t['Integrante']} i ON i.id = pp.integrante_id "
+        f"JOIN {t['Proyecto']} p ON p.id = pp.proyecto_id "
+        f"JOIN {t['Epica']} e ON e.proyecto_id = p.id "
+        f"JOIN {t['Tarea']} ta ON ta.epica_id = e.id "
+        f"WHERE pp.activo AND p.activo AND i.rol IN ({roles})",
+        _ROLES_VISUALIZADOR,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backlog', '0033_tareabusqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TareaVisibilidad',
+            fields=[
+                ('pk', models.CompositePrimaryKey('integrante', 'tarea', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('integrante', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='backlog.integrante')),
+                ('tarea', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='backlog.tarea')),
+            ],
+            options={
+                'db_table': 'backlog_tareavisibilidad',
+            },
+        ),
+        migrations.RunPython(poblar_visibilidad, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:10
+
+from django.db import migrations
+
+from backlog.migrations._ddl import borrar_indice, crear_indice
+
+# Mismos índices que declaran los Meta.indexes de los modelos (tablas managed=False:
+# Django no los crea). Las condiciones se escriben como las genera el ORM para los
+# filtros calientes, así el planificador reconoce el índice parcial.
+INDICES = [
+    # (modelo, nombre, columnas, condición)
+    ("Tarea", "idx_tarea_abiertas_sprint", ["sprint_id"], "NOT completada AND NOT terminada"),
+    ("Subtarea", "idx_subtarea_resp_abiertas", ["responsable_id"], "NOT (estado = 'cerrada')"),
+    ("DailyItem", "idx_ditem_daily_tipo", ["daily_id", "tipo"], None),
+    ("Sprint", "idx_sprint_fin", ["fin"], None),
+]
+
+# Prefijos de idx_ditem_daily_tipo: sobran
+REDUNDANTES = ["idx_backlog_dailyitem_daily_id", "idx_ditem_daily"]
+
+
+def crear_indices(apps, schema_editor):
+    for modelo, nombre, columnas, condicion in INDICES:
+        crear_indice(
+            schema_editor, apps.get_model("backlog", modelo), nombre, columnas,
+            condicion_sql=condicion, concurrente=True,
+        )
+    for nombre in REDUNDANTES:
+        borrar_indice(schema_editor, nombre, concurrente=True)
+
+
+def borrar_indices(apps, schema_editor):
+    for _, nombre, _, _ in INDICES:
+        borrar_indice(schema_editor, nombre, concurrente=True)
+
+
+class Migration(migrations.Migration):
+    # CREATE/DROP INDEX CONCURRENTLY no puede ir dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('backlog', '0034_tareavisibilidad'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, reverse_code=borrar_indices),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+from backlog.migrations._ddl import agregar_columna, quitar_columna
+
+
+def agregar_registrado(apps, schema_editor):
+    # Tabla no gestionada: la columna se crea a mano. Los dailies existentes
+    # fueron enviados por su integrante (DEFAULT true).
+    Daily = apps.get_model("backlog", "Daily")
+    agregar_columna(schema_editor, Daily, "registrado", models.BooleanField(default=True))
+
+
+def quitar_registrado(apps, schema_editor):
+    Daily = apps.get_model("backlog", "Daily")
+    # Sin la columna las filas precreadas sin enviar contarían como presencia
+    schema_editor.execute(
+        f"DELETE FROM {schema_editor.quote_name(Daily._meta.db_table)} WHERE registrado = %s", [False]
+    )
+    quitar_columna(schema_editor, Daily, "registrado")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backlog', '0036_festivo'),
+    ]
+
+    operations = [
+        migrations.RunPython(agregar_registrado, reverse_code=quitar_registrado),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:30
+
+from django.db import migrations
+
+from backlog.migrations._ddl import crear_indice
+
+# Los índices de 0026_perf_indices, con crear_indice (IF NOT EXISTS, portable).
+# 0026 los crea solo si su consulta a information_schema encuentra las columnas
+# (y la de Subtarea busca una FK a Tarea que no existe): donde se saltó alguno,
+# este lo crea; donde ya existe, no hace nada. Se omiten los que otro índice
+# ya cubre: idx_backlog_dailyitem_daily_id (0035 lo borra por redundante) y
+# idx_backlog_proyecto_codigo (codigo es UNIQUE).
+INDICES = [
+    # (modelo, nombre, columnas)
+    ("Daily", "idx_backlog_daily_integrante_fecha", ["integrante_id", "fecha"]),
+    ("Daily", "idx_backlog_daily_fecha", ["fecha"]),
+    ("DailyItem", "idx_backlog_dailyitem_tarea", ["tarea_id"]),
+    ("DailyItem", "idx_backlog_dailyitem_subtarea", ["subtarea_id"]),
+    ("Tarea", "idx_backlog_tarea_sprint_estado", ["sprint_id", "estado"]),
+    ("Tarea", "idx_backlog_tarea_asignado_estado", ["asignado_a_id", "estado"]),
+    ("Tarea", "idx_backlog_tarea_epica", ["epica_id"]),
+    # La subtarea llega a su tarea por el bloque
+    ("Subtarea", "idx_backlog_subtarea_tarea_estado", ["bloque_id", "estado"]),
+    ("Subtarea", "idx_backlog_subtarea_responsable_estado", ["responsable_id", "estado"]),
+    ("Sprint", "idx_backlog_sprint_inicio_fin", ["inicio", "fin"]),
+]
+
+
+def crear_indices(apps, schema_editor):
+    for modelo, nombre, columnas in INDICES:
+        crear_indice(schema_editor, apps.get_model("backlog", modelo), nombre, columnas, concurrente=True)
+
+
+def sin_cambios(apps, schema_editor):
+    # Al revertir no se borran: pueden venir de 0026 (que los borra al revertirse)
+    pass
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY no puede ir dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('backlog', '0037_daily_registrado'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, reverse_code=sin_cambios),
+    ]
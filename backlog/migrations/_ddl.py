@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers de DDL para tablas con managed=False.
+
+Django no emite ALTER TABLE para modelos no gestionados, así que las
+migraciones que agregan columnas o restricciones a esas tablas las crean
+aquí con el schema_editor (funciona igual en PostgreSQL y SQLite).
+El módulo empieza con "_" para que el cargador de migraciones lo ignore.
+"""
+
+
+def agregar_columna(schema_editor, model, nombre, campo):
+    """ALTER TABLE ... ADD COLUMN usando la definición de `campo` (con su DEFAULT)."""
+    campo.set_attributes_from_name(nombre)
+    campo.model = model
+    definicion, params = schema_editor.column_sql(model, campo, include_default=True)
+    schema_editor.execute(
+        "ALTER TABLE %s ADD COLUMN %s %s" % (
+            schema_editor.quote_name(model._meta.db_table),
+            schema_editor.quote_name(campo.column),
+            definicion,
+        ),
+        params,
+    )
+
+
+def quitar_columna(schema_editor, model, columna):
+    schema_editor.execute(
+        "ALTER TABLE %s DROP COLUMN %s" % (
+            schema_editor.quote_name(model._meta.db_table),
+            schema_editor.quote_name(columna),
+        )
+    )
+
+
+def _indice_invalido(schema_editor, nombre):
+    """PostgreSQL: True si quedó un índice INVALID (CONCURRENTLY interrumpido) con ese nombre."""
+    with schema_editor.connection.cursor() as c:
+        c.execute(
+            "SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = %s",
+            [nombre],
+        )
+        fila = c.fetchone()
+    return bool(fila and fila[0])
+
+
+def crear_indice(schema_editor, model, nombre, columnas, condicion_sql=None, concurrente=False):
+    """
+    CREATE INDEX IF NOT EXISTS, opcionalmente parcial (WHERE `condicion_sql`).
+    `concurrente`: en PostgreSQL usa CREATE INDEX CONCURRENTLY para no bloquear
+    escrituras (la migración debe declarar `atomic = False`); si una construcción
+    anterior quedó INVALID, la borra y la repite.
+    """
+    concurrente = concurrente and schema_editor.connection.vendor == "postgresql"
+    if concurrente and _indice_invalido(schema_editor, nombre):
+        borrar_indice(schema_editor, nombre, concurrente=True)
+    schema_editor.execute(
+        "CREATE INDEX %sIF NOT EXISTS %s ON %s (%s)%s" % (
+            "CONCURRENTLY " if concurrente else "",
+            schema_editor.quote_name(nombre),
+            schema_editor.quote_name(model._meta.db_table),
+            ", ".join(schema_editor.quote_name(c) for c in columnas),
+            " WHERE %s" % condicion_sql if condicion_sql else "",
+        )
+    )
+
+
+def borrar_indice(schema_editor, nombre, concurrente=False):
+    # DROP INDEX CONCURRENTLY solo en PostgreSQL y fuera de transacción (migración atomic = False)
+    concurrente = concurrente and schema_editor.connection.vendor == "postgresql"
+    schema_editor.execute(
+        "DROP INDEX %sIF EXISTS %s" % ("CONCURRENTLY " if concurrente else "", schema_editor.quote_name(nombre))
+    )
+
+
+def agregar_check(schema_editor, model, nombre, condicion_sql):
+    """
+    ALTER TABLE ... ADD CONSTRAINT ... CHECK. SQLite no permite agregar
+    restricciones a una tabla existente: ahí se omite (la app ya normaliza).
+    """
+    if schema_editor.connection.vendor == "sqlite":
+        return
+    schema_editor.execute(
+        "ALTER TABLE %s ADD CONSTRAINT %s CHECK (%s)" % (
+            schema_editor.quote_name(model._meta.db_table),
+            schema_editor.quote_name(nombre),
+            condicion_sql,
+        )
+    )
+
+
+def quitar_check(schema_editor, model, nombre):
+    if schema_editor.connection.vendor == "sqlite":
+        return
+    schema_editor.execute(
+        "ALTER TABLE %s DROP CONSTRAINT IF EXISTS %s" % (
+            schema_editor.quote_name(model._meta.db_table),
+            schema_editor.quote_name(nombre),
+        )
+    )
+
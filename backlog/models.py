@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+import threading
 from datetime import time as dtime
 
 def now_local_time():
@@ -93,6 +94,9 @@ class Integrante(models.Model):
         ROL_MIEMBRO: set(),
     }
 
+    # Roles que ven por proyecto autorizado (PermisoProyecto) y no por asignación
+    ROLES_VISUALIZADOR = (ROL_VISUALIZADOR, ROL_PO, ROL_PO_COOFISAM)
+
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="integrante")
     rol = models.CharField(max_length=100, choices=ROL_CHOICES, default=ROL_MIEMBRO, blank=False)
 
@@ -107,7 +111,7 @@ class Integrante(models.Model):
         return self.ROL_PERMISOS.get(self.rol, set())
 
     def es_visualizador(self) -> bool:
-        return self.rol in {self.ROL_VISUALIZADOR, self.ROL_PO, self.ROL_PO_COOFISAM}
+        return self.rol in self.ROLES_VISUALIZADOR
 
     def es_admin(self) -> bool:
         # Admin operativo: Scrum/PO, Arq/Director, Gestión Humana, o superuser
@@ -181,10 +185,76 @@ class Sprint(models.Model):
 
     class Meta:
         managed = False
+        indexes = [
+            # "Ocultar sprints viejos": sprint__fin__gte
+            models.Index(fields=["fin"], name="idx_sprint_fin"),
+        ]
 
     def __str__(self):
         return f"{self.nombre} ({self.inicio} - {self.fin})"
 
+    @property
+    def cerrado(self) -> bool:
+        return self.fin < timezone.localdate()
+
+
+class Festivo(models.Model):
+    """
+    Día festivo (Colombia). Los días hábiles de dashboard, burndown y capacidad
+    descuentan estas fechas (backlog/calendario.py). Se siembra con:
+    python manage.py sembrar_festivos
+    """
+    fecha = models.DateField(unique=True)
+    nombre = models.CharField(max_length=100)
+
+    class Meta:
+        db_table = "backlog_festivo"
+        ordering = ["fecha"]
+
+    def __str__(self):
+        return f"{self.fecha} {self.nombre}"
+
+
+class SprintSnapshot(models.Model):
+    """
+    Foto congelada de un Sprint cerrado (fin < hoy). Se escribe una sola vez
+    (snapshots.congelar_sprint) y alimenta los gráficos históricos sin volver a
+    recorrer Tarea/Subtarea. Las claves de los JSON por id se guardan como texto.
+    """
+    sprint = models.OneToOneField("Sprint", on_delete=models.CASCADE, related_name="snapshot")
+    congelado_en = models.DateTimeField(default=timezone.now)
+
+    # Totales del sprint (HU macro)
+    sp_planificados = models.PositiveIntegerField(default=0)
+    sp_completados = models.PositiveIntegerField(default=0)
+    hu_total = models.PositiveIntegerField(default=0)
+    hu_terminadas = models.PositiveIntegerField(default=0)
+    # Subtareas
+    st_total = models.PositiveIntegerField(default=0)
+    st_terminadas = models.PositiveIntegerField(default=0)
+    sp_subtareas_terminadas = models.PositiveIntegerField(default=0)
+
+    hu_por_estado = models.JSONField(default=dict)   # {estado: {"n", "sp"}}
+    st_por_estado = models.JSONField(default=dict)   # {estado: {"n", "sp"}}
+    por_proyecto = models.JSONField(default=dict)    # {proyecto_id: {"sp_planificados", "sp_completados"}}
+    por_integrante = models.JSONField(default=dict)  # {integrante_id: {"hu", "hu_terminadas", "sp", "sp_completados", "st", "st_terminadas", "sp_st_terminadas"}}
+    daily = models.JSONField(default=dict)           # {integrante_id: métricas de metricas_daily_por_integrante}
+    burndown = models.JSONField(default=dict)        # {"dias": [iso...], "hecho": [acumulado...]}
+
+    class Meta:
+        db_table = "backlog_sprintsnapshot"
+        ordering = ["-sprint__inicio"]
+
+    def __str__(self):
+        return f"Snapshot {self.sprint}"
+
+    def velocidad(self, proyecto_id=None):
+        """(sp_planificados, sp_completados), global o de un proyecto."""
+        if proyecto_id:
+            p = self.por_proyecto.get(str(proyecto_id), {})
+            return p.get("sp_planificados", 0), p.get("sp_completados", 0)
+        return self.sp_planificados, self.sp_completados
+
 # ==============================
 # Épica
 # ==============================
@@ -304,6 +374,46 @@ class Epica(models.Model):
 # ==============================
 # Tarea (tratada como Macro por proceso, sin campos nuevos)
 # ==============================
+class TareaQuerySet(models.QuerySet):
+    def asignadas_a(self, integrante):
+        """
+        Tareas donde `integrante` (objeto o id) figura en `asignados`.
+        Semi-join EXISTS sobre la tabla puente (índice tarea/integrante): sin OR
+        contra `asignado_a` ni DISTINCT, porque el legado siempre está contenido
+        en la relación M2M (ver TareaAsignacion).
+        """
+        from django.db.models import Exists, OuterRef
+
+        iid = getattr(integrante, "pk", integrante)
+        if iid is None:
+            return self.none()
+        return self.filter(
+            Exists(TareaAsignacion.objects.filter(tarea_id=OuterRef("pk"), integrante_id=iid))
+        )
+
+    def visibles_para(self, integrante):
+        """
+        Tareas que `integrante` (objeto o id, no admin) puede ver según el índice
+        TareaVisibilidad: un semi-join EXISTS por su clave (integrante, tarea).
+        """
+        from django.db.models import Exists, OuterRef
+
+        iid = getattr(integrante, "pk", integrante)
+        if iid is None:
+            return self.none()
+        return self.filter(
+            Exists(TareaVisibilidad.objects.filter(integrante_id=iid, tarea_id=OuterRef("pk")))
+        )
+
+    def ids_asignados(self):
+        """Set de ids de integrantes asignados a alguna tarea de este queryset."""
+        return set(
+            TareaAsignacion.objects
+            .filter(tarea_id__in=self.order_by().values("pk"))
+            .values_list("integrante_id", flat=True)
+        )
+
+
 class Tarea(models.Model):
     MATRIZ_CHOICES = [
         ("UI", "Urgente e Importante"),
@@ -318,6 +428,7 @@ class Tarea(models.Model):
         ("COMPLETADO", "Completado"),
         ("BLOQUEADO", "Bloqueado"),
     ]
+    ESTADOS_TERMINADA = ("COMPLETADO",)
 
     titulo = models.CharField(max_length=200)
     descripcion = models.TextField(blank=True)
@@ -370,6 +481,8 @@ class Tarea(models.Model):
     sprint = models.ForeignKey("Sprint", on_delete=models.CASCADE)
 
     completada = models.BooleanField(default=False)
+    # Derivado de `estado` en save(): estado in ESTADOS_TERMINADA (filtros por igualdad e índice)
+    terminada = models.BooleanField(default=False, editable=False)
     fecha_cierre = models.DateTimeField(null=True, blank=True)
     informe_cierre = models.FileField(
         upload_to="informes_cierre/",
@@ -378,12 +491,49 @@ class Tarea(models.Model):
         help_text="Archivo requerido para cerrar la tarea"
     )
 
+    # Ventana temporal materializada: min(inicio)/max(fin) de sus bloques (ver actualizar_ventanas)
+    ventana_inicio = models.DateField(null=True, blank=True, editable=False)
+    ventana_fin = models.DateField(null=True, blank=True, editable=False)
+
+    objects = TareaQuerySet.as_manager()
+
     class Meta:
         managed = False
+        indexes = [
+            models.Index(fields=["ventana_inicio", "ventana_fin"], name="idx_tarea_ventana"),
+            models.Index(fields=["sprint", "terminada"], name="idx_tarea_sprint_terminada"),
+            # Tareas abiertas (completada=False y estado <> COMPLETADO, es decir terminada=False)
+            models.Index(
+                fields=["sprint"], condition=models.Q(completada=False, terminada=False),
+                name="idx_tarea_abiertas_sprint",
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(estado__in=["NUEVO", "EN_PROGRESO", "COMPLETADO", "BLOQUEADO"]),
+                name="tarea_estado_valido",
+            ),
+            models.CheckConstraint(
+                condition=(
+                    models.Q(terminada=True, estado__in=["COMPLETADO"])
+                    | (models.Q(terminada=False) & ~models.Q(estado__in=["COMPLETADO"]))
+                ),
+                name="tarea_terminada_coherente",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.titulo} ({self.get_categoria_display()})"
 
+    def save(self, *args, **kwargs):
+        # Estado siempre en su forma canónica y `terminada` derivado de él
+        self.estado = normalizar_estado_tarea(self.estado)
+        self.terminada = self.estado in self.ESTADOS_TERMINADA
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "estado" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "terminada"}
+        super().save(*args, **kwargs)
+
     @property
     def esfuerzo_display(self):
         return self.esfuerzo_sp if self.esfuerzo_sp is not None else "-"
@@ -414,6 +564,58 @@ class Tarea(models.Model):
         cerrados, total = self.bloques_cerrados()
         return total > 0 and cerrados == total
 
+
+# Relación de asignación Tarea↔Integrante (tabla puente de `asignados`).
+# Es la única ruta de pertenencia: `asignado_a` (legado) siempre se replica aquí
+# y se limpia si el integrante sale de `asignados` (ver signals).
+TareaAsignacion = Tarea.asignados.through
+
+
+def actualizar_ventanas(tarea_ids) -> int:
+    """
+    Recalcula Tarea.ventana_inicio / ventana_fin (min/max de sus bloques)
+    con un solo UPDATE. Llamar tras guardar/eliminar bloques.
+    """
+    from django.db.models import Max, Min, OuterRef, Subquery
+
+    ids = [i for i in tarea_ids if i]
+    if not ids:
+        return 0
+    por_tarea = BloqueTarea.objects.filter(tarea_id=OuterRef("pk")).order_by().values("tarea_id")
+    return Tarea.objects.filter(id__in=ids).update(
+        ventana_inicio=Subquery(por_tarea.annotate(v=Min("fecha_inicio")).values("v")[:1]),
+        ventana_fin=Subquery(por_tarea.annotate(v=Max("fecha_fin")).values("v")[:1]),
+    )
+
+
+_ventanas_pendientes = threading.local()
+
+
+def _vaciar_ventanas():
+    ids = getattr(_ventanas_pendientes, "ids", None)
+    if ids:
+        _ventanas_pendientes.ids = set()
+        actualizar_ventanas(ids)
+        recalcular_alineacion(dailies_con_enlaces(tarea_ids=ids))
+
+
+def actualizar_ventanas_al_confirmar(*tarea_ids):
+    """
+    Acumula las tareas cuyos bloques cambiaron y, cuando la transacción confirma,
+    recalcula su ventana y la alineación de los dailies enlazados (una sola pasada
+    por petición, después de que la vista sincronice las fechas de las subtareas).
+    Lo llaman las señales de BloqueTarea: vale también para admin y shell.
+    """
+    from django.db import transaction
+
+    ids = {i for i in tarea_ids if i}
+    if not ids:
+        return
+    if not hasattr(_ventanas_pendientes, "ids"):
+        _ventanas_pendientes.ids = set()
+    _ventanas_pendientes.ids |= ids
+    transaction.on_commit(_vaciar_ventanas)
+
 # ==============================
 # Evidencia
 # ==============================
@@ -458,6 +660,15 @@ class Daily(models.Model):
     # Contexto opcional para filtros/reporte
     sprint = models.ForeignKey("Sprint", on_delete=models.SET_NULL, null=True, blank=True, related_name="dailies")
 
+    # False en las filas vacías precreadas al abrir la ventana (precrear_dailies)
+    # hasta que el integrante envía su daily; esas filas no cuentan como presencia
+    registrado = models.BooleanField(default=True)
+
+    # Alineación desnormalizada (se recalcula al escribir líneas o cambiar tareas/subtareas)
+    items_total = models.PositiveIntegerField(default=0, editable=False)
+    items_alineados = models.PositiveIntegerField(default=0, editable=False)
+    porcentaje_alineacion = models.PositiveSmallIntegerField(default=0, editable=False)
+
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
@@ -509,44 +720,125 @@ class Daily(models.Model):
           c) y (fecha del daily está dentro de [inicio..fin] del bloque/subtarea/tarea
              o sprint del item == sprint del daily si ambos existen)
         """
-        total = self.total_items
-        if total == 0:
-            return dict(porcentaje=0, total=0, alineados=0, no_alineados=0, ids_no_alineados=[])
-
-        no_ok = []
-        f = self.fecha
-        s_daily = self.sprint_id
-
-        qs = self.items.select_related("tarea", "subtarea", "subtarea__bloque", "subtarea__responsable", "tarea__asignado_a", "tarea__sprint")
-        for it in qs:
-            objetivo = it.subtarea or it.tarea
-            if not objetivo:
-                no_ok.append(it.id); continue
-
-            # Dueño esperado
-            responsable = getattr(objetivo, "responsable", None) or getattr(objetivo, "asignado_a", None)
-            ok_user = (responsable_id(objetivo) == self.integrante_id)
-
-            # Ventana temporal
-            ini, fin = fechas_objetivo(objetivo)
-            ok_fecha = (ini is not None and fin is not None and ini <= f <= fin)
-
-            # Sprint
-            s_item = getattr(objetivo, "sprint_id", None)
-            ok_sprint = (s_daily is not None and s_item is not None and s_daily == s_item)
-
-            if not (ok_user and (ok_fecha or ok_sprint)):
-                no_ok.append(it.id)
-
-        alineados = total - len(no_ok)
-        pct = round(100 * alineados / total)
-        return dict(
-            porcentaje=pct,
-            total=total,
-            alineados=alineados,
-            no_alineados=len(no_ok),
-            ids_no_alineados=no_ok,
+        if self.pk is None:
+            return _alineacion_vacia()
+        return compute_alineacion_bulk([self.pk])[self.pk]
+
+
+def sprint_de(fecha):
+    """Id del sprint que contiene `fecha` (el más reciente si se solapan) o None."""
+    return (
+        Sprint.objects.filter(inicio__lte=fecha, fin__gte=fecha)
+        .order_by("-inicio").values_list("id", flat=True).first()
+    )
+
+
+def precrear_dailies(fecha, integrante_ids=None) -> int:
+    """
+    Crea en bloque las cabeceras vacías (registrado=False) de `fecha` para los
+    integrantes activos que pueden registrar daily y aún no tienen fila, con el
+    sprint ya resuelto. Así el envío en la ventana 5:00–9:00 es un UPDATE de una
+    fila existente. `integrante_ids` limita la precreación a esos integrantes.
+    Devuelve cuántas filas creó.
+    """
+    qs = Integrante.objects.filter(user__is_active=True).exclude(rol__in=Integrante.ROLES_VISUALIZADOR)
+    if integrante_ids is not None:
+        qs = qs.filter(id__in=integrante_ids)
+    ids = set(qs.values_list("id", flat=True))
+    ids -= set(Daily.objects.filter(fecha=fecha, integrante_id__in=ids).values_list("integrante_id", flat=True))
+    if not ids:
+        return 0
+    sprint_id = sprint_de(fecha)
+    Daily.objects.bulk_create(
+        [
+            Daily(integrante_id=i, fecha=fecha, hora=dtime(0, 0), sprint_id=sprint_id, registrado=False)
+            for i in sorted(ids)
+        ],
+        ignore_conflicts=True,
+    )
+    return len(ids)
+
+
+CAMPOS_DAILY = ("que_hizo_ayer", "que_hara_hoy", "impedimentos")
+
+
+def registrar_daily(integrante_id, fecha, hora, campos):
+    """
+    Guarda el daily de (integrante, fecha) con un solo UPDATE ... RETURNING sobre
+    la fila existente (precreada o ya enviada). En el primer envío fija `hora` y
+    `fuera_horario`; los reenvíos solo cambian el texto. Devuelve el id, o None si
+    no había fila (el llamador la crea). No dispara señales de Daily.
+    """
+    from django.db import connection
+
+    meta = Daily._meta
+
+    def prep(nombre, valor):
+        return meta.get_field(nombre).get_db_prep_save(valor, connection)
+
+    qn = connection.ops.quote_name
+    sets = [f"{qn(c)} = %s" for c in CAMPOS_DAILY]
+    params = [prep(c, campos.get(c, meta.get_field(c).get_default())) for c in CAMPOS_DAILY]
+    sets += [
+        f"{qn('hora')} = CASE WHEN {qn('registrado')} THEN {qn('hora')} ELSE %s END",
+        f"{qn('fuera_horario')} = CASE WHEN {qn('registrado')} THEN {qn('fuera_horario')} ELSE %s END",
+        f"{qn('registrado')} = %s",
+        f"{qn('actualizado_en')} = %s",
+    ]
+    params += [
+        prep("hora", hora),
+        prep("fuera_horario", not Daily._en_ventana(hora)),
+        prep("registrado", True),
+        prep("actualizado_en", timezone.now()),
+        integrante_id,
+        prep("fecha", fecha),
+    ]
+    with connection.cursor() as c:
+        c.execute(
+            f"UPDATE {qn(meta.db_table)} SET {', '.join(sets)} "
+            f"WHERE {qn('integrante_id')} = %s AND {qn('fecha')} = %s RETURNING {qn('id')}",
+            params,
         )
+        fila = c.fetchone()
+    return fila[0] if fila else None
+
+
+def recalcular_alineacion(daily_ids) -> int:
+    """
+    Recalcula y guarda items_total / items_alineados / porcentaje_alineacion
+    de los dailies indicados. Bloquea las filas para que dos escrituras
+    simultáneas sobre el mismo daily no dejen contadores desfasados.
+    Devuelve cuántos dailies se actualizaron.
+    """
+    from django.db import transaction
+
+    ids = {i for i in daily_ids if i}
+    if not ids:
+        return 0
+    with transaction.atomic():
+        ids = list(Daily.objects.select_for_update().filter(id__in=ids).values_list("id", flat=True))
+        metricas = compute_alineacion_bulk(ids)
+        dailies = [
+            Daily(
+                pk=i,
+                items_total=metricas[i]["total"],
+                items_alineados=metricas[i]["alineados"],
+                porcentaje_alineacion=metricas[i]["porcentaje"],
+            )
+            for i in ids
+        ]
+        Daily.objects.bulk_update(dailies, ["items_total", "items_alineados", "porcentaje_alineacion"])
+    return len(dailies)
+
+
+def dailies_con_enlaces(tarea_ids=(), subtarea_ids=()):
+    """Ids de Daily con líneas enlazadas a esas tareas (directo o vía sus subtareas) o subtareas."""
+    from django.db.models import Q
+
+    q = Q(subtarea_id__in=list(subtarea_ids))
+    if tarea_ids:
+        q |= Q(tarea_id__in=list(tarea_ids)) | Q(subtarea__bloque__tarea_id__in=list(tarea_ids))
+    return set(DailyItem.objects.filter(q).values_list("daily_id", flat=True).distinct())
 
 
 def responsable_id(obj) -> int | None:
@@ -575,19 +867,89 @@ def fechas_objetivo(obj):
         if fin is None and hasattr(bloque, "fecha_fin"):
             fin = bloque.fecha_fin
 
-    # Si es Tarea y no hay fechas, intentar obtener el min/max de sus bloques
-    if getattr(obj, "bloques", None) is not None and (ini is None or fin is None):
-        qs = obj.bloques.all()
-        if qs.exists():
-            min_ini = min((b.fecha_inicio for b in qs if b.fecha_inicio), default=None)
-            max_fin = max((b.fecha_fin for b in qs if b.fecha_fin), default=None)
-            ini = ini or min_ini
-            fin = fin or max_fin
+    # Si es Tarea, usar la ventana materializada (min/max de sus bloques)
+    if isinstance(obj, Tarea):
+        ini = ini or obj.ventana_inicio
+        fin = fin or obj.ventana_fin
 
     # Fallback: sin información temporal
     return ini, fin
 
 
+def q_item_alineado():
+    """
+    Misma regla de Daily.alineacion expresada en SQL sobre DailyItem.
+    Sirve para contar ítems alineados con Count(filter=...) sin cargar objetos.
+    - Subtarea: responsable == integrante del daily y fecha dentro de sus fechas
+      (o las del bloque si no tiene propias).
+    - Tarea (solo si no hay subtarea): asignado_a == integrante y
+      (fecha dentro de su ventana_inicio..ventana_fin o mismo sprint que el daily).
+    """
+    from django.db.models import F, Q
+
+    fecha = F("daily__fecha")
+    integrante = F("daily__integrante_id")
+
+    sub_ok = (
+        Q(subtarea__isnull=False, subtarea__responsable_id=integrante)
+        & (Q(subtarea__fecha_inicio__lte=fecha)
+           | Q(subtarea__fecha_inicio__isnull=True, subtarea__bloque__fecha_inicio__lte=fecha))
+        & (Q(subtarea__fecha_fin__gte=fecha)
+           | Q(subtarea__fecha_fin__isnull=True, subtarea__bloque__fecha_fin__gte=fecha))
+    )
+
+    tarea_en_ventana = Q(tarea__ventana_inicio__lte=fecha, tarea__ventana_fin__gte=fecha)
+    tarea_ok = (
+        Q(subtarea__isnull=True, tarea__isnull=False, tarea__asignado_a_id=integrante)
+        & (tarea_en_ventana | Q(daily__sprint__isnull=False, tarea__sprint_id=F("daily__sprint_id")))
+    )
+    return sub_ok | tarea_ok
+
+
+def _alineacion_vacia() -> dict:
+    return dict(porcentaje=0, total=0, alineados=0, no_alineados=0, ids_no_alineados=[])
+
+
+def compute_alineacion_bulk(dailies) -> dict:
+    """
+    Evalúa la alineación de muchos dailies a la vez.
+    `dailies` puede ser un queryset de Daily, una lista de Daily o de ids.
+    Retorna {daily_id: dict} con la misma forma que Daily.alineacion.
+    Una sola consulta: la regla (q_item_alineado) se resuelve en SQL por línea,
+    con subtarea, bloque y ventana de la tarea (columnas) unidos en la misma sentencia.
+    """
+    from django.db.models import BooleanField, ExpressionWrapper
+
+    if isinstance(dailies, models.QuerySet):
+        ids = None
+        items = DailyItem.objects.filter(daily_id__in=dailies.values("id"))
+    else:
+        ids = [getattr(d, "pk", d) for d in dailies]
+        items = DailyItem.objects.filter(daily_id__in=ids)
+
+    filas = (
+        items
+        .annotate(alineado=ExpressionWrapper(q_item_alineado(), output_field=BooleanField()))
+        .order_by("daily_id", "id")
+        .values_list("daily_id", "id", "alineado")
+    )
+
+    res = {i: _alineacion_vacia() for i in (ids or [])}
+    for daily_id, item_id, alineado in filas:
+        m = res.setdefault(daily_id, _alineacion_vacia())
+        m["total"] += 1
+        if alineado:
+            m["alineados"] += 1
+        else:
+            m["no_alineados"] += 1
+            m["ids_no_alineados"].append(item_id)
+
+    for m in res.values():
+        if m["total"]:
+            m["porcentaje"] = round(100 * m["alineados"] / m["total"])
+    return res
+
+
 TIPO_ITEM = [
     ("AYER", "Ayer"),
     ("HOY", "Hoy"),
@@ -617,7 +979,7 @@ class DailyItem(models.Model):
         db_table = "backlog_dailyitem"     # nueva tabla
         managed = False
         indexes = [
-            models.Index(fields=["daily_id"], name="idx_ditem_daily"),
+            models.Index(fields=["daily", "tipo"], name="idx_ditem_daily_tipo"),
             models.Index(fields=["tipo"], name="idx_ditem_tipo"),
             models.Index(fields=["tarea_id"], name="idx_ditem_tarea"),
             models.Index(fields=["subtarea_id"], name="idx_ditem_subtarea"),
@@ -642,9 +1004,63 @@ class DailyItem(models.Model):
 ESTADO_SUBTAREA = [
     ('pendiente', 'Pendiente'),
     ('en_progreso', 'En progreso'),
+    ('bloqueada', 'Bloqueada'),
     ('entregada', 'Entregada'),
     ('cerrada', 'Cerrada'),
 ]
+ESTADOS_SUBTAREA_TERMINADA = ('entregada', 'cerrada')
+
+
+# ==============================
+# Normalización de estados (grafías heredadas → valor canónico)
+# ==============================
+# Mismo mapeo que la migración 0029_estado_canonico
+_ESTADO_TAREA_LEGADO = {
+    "COMPLETADA": "COMPLETADO",
+    "PENDIENTE": "NUEVO",
+    "BLOQUEADA": "BLOQUEADO",
+    "EN PROGRESO": "EN_PROGRESO",
+    "TODO": "NUEVO",
+    "APROBADO": "COMPLETADO",
+    "APROBADA": "COMPLETADO",
+    "CERRADO": "COMPLETADO",
+    "CERRADA": "COMPLETADO",
+    "ENTREGADO": "COMPLETADO",
+    "ENTREGADA": "COMPLETADO",
+}
+_ESTADO_SUBTAREA_LEGADO = {
+    "nuevo": "pendiente",
+    "nueva": "pendiente",
+    "en progreso": "en_progreso",
+    "bloqueado": "bloqueada",
+    "completado": "cerrada",
+    "completada": "cerrada",
+    "todo": "pendiente",
+    "aprobado": "cerrada",
+    "aprobada": "cerrada",
+}
+
+
+def _normalizar_estado(valor, mayusculas, legado, validos, por_defecto):
+    if valor is None or not str(valor).strip():
+        return por_defecto  # sin estado: el inicial
+    v = str(valor).strip()
+    v = v.upper() if mayusculas else v.lower()
+    v = legado.get(v, v)
+    if v not in validos:
+        raise ValidationError({"estado": f"Estado desconocido: {valor!r}."})
+    return v
+
+
+def normalizar_estado_tarea(valor) -> str:
+    """'completada', 'Aprobado'... → 'COMPLETADO'. Vacío → 'NUEVO'; desconocido → ValidationError."""
+    return _normalizar_estado(valor, True, _ESTADO_TAREA_LEGADO, dict(Tarea.ESTADO_CHOICES), "NUEVO")
+
+
+def normalizar_estado_subtarea(valor) -> str:
+    """'COMPLETADO', 'NUEVO', 'Entregada'... → 'cerrada', 'pendiente', 'entregada'. Vacío → 'pendiente'; desconocido → ValidationError."""
+    return _normalizar_estado(valor, False, _ESTADO_SUBTAREA_LEGADO, dict(ESTADO_SUBTAREA), "pendiente")
+
 
 class BloqueTarea(models.Model):
     """
@@ -713,12 +1129,8 @@ class Subtarea(models.Model):
     """
     Subtareas (HUs chicas) dentro de un bloque.
     """
-    ESTADOS = [
-        ("NUEVO", "Nuevo"),
-        ("EN_PROGRESO", "En progreso"),
-        ("BLOQUEADO", "Bloqueado"),
-        ("COMPLETADO", "Completado"),
-    ]
+    ESTADO_CHOICES = ESTADO_SUBTAREA
+    ESTADOS_TERMINADA = ESTADOS_SUBTAREA_TERMINADA
 
     ESFUERZO_CORTO = [
         (1, "1"),
@@ -732,6 +1144,8 @@ class Subtarea(models.Model):
     responsable = models.ForeignKey("Integrante", on_delete=models.SET_NULL, null=True, blank=True,
                                     related_name='subtareas_responsable')
     estado = models.CharField(max_length=20, choices=ESTADO_SUBTAREA, default='pendiente')
+    # Derivado de `estado` en save(): entregada o cerrada
+    terminada = models.BooleanField(default=False, editable=False)
     descripcion = models.TextField(blank=True)
     esfuerzo_sp = models.PositiveSmallIntegerField(choices=ESFUERZO_CORTO, null=True, blank=True)
     fecha_inicio = models.DateField(null=True, blank=True)
@@ -741,10 +1155,39 @@ class Subtarea(models.Model):
         ordering = ['bloque__indice', 'id']
         managed = False
         db_table = "backlog_subtarea"
+        indexes = [
+            models.Index(fields=["responsable", "terminada"], name="idx_subtarea_resp_terminada"),
+            # Subtareas abiertas de un responsable (exclude(estado="cerrada"))
+            models.Index(
+                fields=["responsable"], condition=~models.Q(estado="cerrada"),
+                name="idx_subtarea_resp_abiertas",
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(estado__in=["pendiente", "en_progreso", "bloqueada", "entregada", "cerrada"]),
+                name="subtarea_estado_valido",
+            ),
+            models.CheckConstraint(
+                condition=(
+                    models.Q(terminada=True, estado__in=["entregada", "cerrada"])
+                    | (models.Q(terminada=False) & ~models.Q(estado__in=["entregada", "cerrada"]))
+                ),
+                name="subtarea_terminada_coherente",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.titulo} ({self.bloque.etiqueta()})"
 
+    def save(self, *args, **kwargs):
+        self.estado = normalizar_estado_subtarea(self.estado)
+        self.terminada = self.estado in self.ESTADOS_TERMINADA
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "estado" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "terminada"}
+        super().save(*args, **kwargs)
+
     @property
     def tarea(self):
         return self.bloque.tarea
@@ -774,3 +1217,121 @@ class EvidenciaSubtarea(models.Model):
 
     def __str__(self):
         return f"Evidencia ST#{self.subtarea_id} {self.creado_en:%Y-%m-%d %H:%M}"
+
+
+# ==============================
+# Bitácora de estados (append-only)
+# ==============================
+class EstadoEvento(models.Model):
+    """
+    Una fila por transición de estado de una Tarea o Subtarea (y una al crearla).
+    Se escribe desde signals.py en la misma transacción que el cambio; nunca se
+    actualiza. Burndown, flujo acumulado y cycle time se calculan recorriendo
+    esta tabla por (sprint, ocurrido_en) en vez de inferir desde fecha_cierre/fecha_fin.
+    """
+    ENTIDAD_CHOICES = [
+        ("tarea", "Tarea"),
+        ("subtarea", "Subtarea"),
+    ]
+
+    entidad = models.CharField(max_length=8, choices=ENTIDAD_CHOICES)
+    # En eventos de subtarea, `tarea` es su HU macro
+    tarea = models.ForeignKey("Tarea", on_delete=models.CASCADE, related_name="eventos_estado")
+    subtarea = models.ForeignKey("Subtarea", on_delete=models.CASCADE, null=True, blank=True,
+                                 related_name="eventos_estado")
+    # Sprint de la HU al momento del evento
+    sprint = models.ForeignKey("Sprint", on_delete=models.SET_NULL, null=True, blank=True,
+                               related_name="eventos_estado")
+
+    estado_anterior = models.CharField(max_length=20, blank=True)  # "" = creación
+    estado_nuevo = models.CharField(max_length=20)
+    terminada = models.BooleanField(default=False)  # `terminada` después del evento
+    esfuerzo_sp = models.PositiveSmallIntegerField(null=True, blank=True)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    ocurrido_en = models.DateTimeField(default=timezone.now)
+    # True en las filas reconstruidas por la migración a partir del estado de ese momento
+    inferido = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = "backlog_estadoevento"
+        ordering = ["ocurrido_en", "id"]
+        indexes = [
+            models.Index(fields=["sprint", "ocurrido_en"], name="idx_evento_sprint_fecha"),
+            models.Index(fields=["tarea", "ocurrido_en"], name="idx_evento_tarea_fecha"),
+            models.Index(fields=["subtarea", "ocurrido_en"], name="idx_evento_subtarea_fecha"),
+        ]
+
+    @classmethod
+    def de_tarea(cls, tarea, estado_anterior, actor=None):
+        """Evento (sin guardar) del estado actual de `tarea`; estado_anterior None = creación."""
+        return cls(
+            entidad="tarea", tarea_id=tarea.pk, sprint_id=tarea.sprint_id,
+            estado_anterior=estado_anterior or "", estado_nuevo=tarea.estado, terminada=tarea.terminada,
+            esfuerzo_sp=tarea.esfuerzo_sp, actor=actor,
+        )
+
+    @classmethod
+    def de_subtarea(cls, subtarea, estado_anterior, tarea_id, sprint_id, actor=None):
+        return cls(
+            entidad="subtarea", tarea_id=tarea_id, subtarea_id=subtarea.pk, sprint_id=sprint_id,
+            estado_anterior=estado_anterior or "", estado_nuevo=subtarea.estado, terminada=subtarea.terminada,
+            esfuerzo_sp=subtarea.esfuerzo_sp, actor=actor,
+        )
+
+    def __str__(self):
+        objetivo = f"ST#{self.subtarea_id}" if self.subtarea_id else f"HU#{self.tarea_id}"
+        return f"{objetivo}: {self.estado_anterior or '∅'} → {self.estado_nuevo} ({self.ocurrido_en:%Y-%m-%d %H:%M})"
+
+
+# ==============================
+# Búsqueda de texto (documento por Tarea)
+# ==============================
+class TareaBusqueda(models.Model):
+    """
+    Documento de búsqueda de una Tarea, mantenido por backlog/busqueda.py al
+    guardar la tarea o sus épica, bloques, subtareas y evidencias.
+    `titulo` = título de la HU + título de la épica (pesa más en el ranking);
+    `documento` = descripción, criterios, bloques, subtareas y evidencias.
+
+    El índice depende del motor y lo crea la migración 0033 (no es un campo del modelo):
+    - PostgreSQL: columna generada `vector` (tsvector 'spanish', sin tildes) con índice GIN.
+    - SQLite: tabla FTS5 `backlog_tareabusqueda_fts` sincronizada por triggers.
+    """
+    tarea = models.OneToOneField(
+        "Tarea", on_delete=models.CASCADE, primary_key=True, related_name="busqueda",
+    )
+    titulo = models.TextField(blank=True, default="")
+    documento = models.TextField(blank=True, default="")
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "backlog_tareabusqueda"
+
+    def __str__(self):
+        return f"Búsqueda HU#{self.tarea_id}"
+
+
+# ==============================
+# Índice de visibilidad (integrante → tareas que puede ver)
+# ==============================
+class TareaVisibilidad(models.Model):
+    """
+    Par (integrante, tarea) por cada tarea que un no-admin puede ver, mantenido
+    por backlog/visibilidad.py:
+    - Visualizador / Product Owner: tareas de épicas de sus proyectos autorizados
+      (PermisoProyecto activo sobre un proyecto activo).
+    - Resto de roles: tareas donde figura en `asignados`.
+    Los admins ven todo y no lo consultan (sus filas de asignación no estorban).
+    Se reconstruye con `python manage.py reconstruir_visibilidad`.
+    """
+    pk = models.CompositePrimaryKey("integrante", "tarea")
+    integrante = models.ForeignKey(
+        "Integrante", on_delete=models.CASCADE, related_name="+", db_index=False,
+    )
+    tarea = models.ForeignKey("Tarea", on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        db_table = "backlog_tareavisibilidad"
+
+    def __str__(self):
+        return f"{self.integrante_id} ve HU#{self.tarea_id}"
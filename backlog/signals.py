@@ -0,0 +1,486 @@
+# -*- coding: utf-8 -*-
+"""
+Señales del backlog.
+
+- Mantienen los contadores de alineación de Daily (items_total, items_alineados,
+  porcentaje_alineacion) al día cuando cambian sus líneas o las tareas/subtareas
+  a las que apuntan, y la ventana de la Tarea cuando cambian sus bloques.
+- Mantienen `Tarea.asignado_a` (legado) contenido en `asignados` (TareaAsignacion).
+- Incrementan las versiones de la caché de dashboard/KPIs (cache_datos.invalidar).
+- Escriben la bitácora EstadoEvento en cada cambio de estado de Tarea/Subtarea
+  (la vista que guarda puede dejar el usuario en `instance._actor`).
+- Publican avisos en vivo (eventos_vivo.avisar) para los tableros abiertos.
+- Marcan para reindexar el documento de búsqueda de la Tarea (busqueda.reindexar_al_confirmar).
+- Invalidan el contexto de autorización cacheado por usuario (autorizacion.py).
+- Marcan para sincronizar el índice de visibilidad TareaVisibilidad (visibilidad.py).
+Corren dentro de la misma transacción que la escritura.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .autorizacion import alcance_usuario
+from .busqueda import reindexar_al_confirmar
+from .cache_datos import alcances_tarea, invalidar
+from .eventos_vivo import aviso_daily, aviso_subtarea, aviso_tarea, avisar
+from .models import (
+    BloqueTarea, Daily, DailyItem, Epica, EstadoEvento, Evidencia, EvidenciaSubtarea, Festivo, Integrante,
+    PermisoProyecto, Proyecto, Sprint, Subtarea, Tarea, TareaAsignacion,
+    actualizar_ventanas_al_confirmar, dailies_con_enlaces, recalcular_alineacion,
+)
+from .visibilidad import sincronizar_al_confirmar
+
+# Campos que intervienen en la regla de alineación
+CAMPOS_ALINEACION_TAREA = ("asignado_a_id", "sprint_id")
+CAMPOS_ALINEACION_SUBTAREA = ("responsable_id", "fecha_inicio", "fecha_fin", "bloque_id")
+CAMPOS_ALINEACION_DAILY = ("sprint_id", "integrante_id", "fecha")
+# Campos que forman el documento de búsqueda
+CAMPOS_BUSQUEDA_TAREA = ("titulo", "descripcion", "criterios_aceptacion", "epica_id")
+# Foto previa de cada guardado: una sola consulta en pre_save que leen todos los receptores
+CAMPOS_PREVIOS_TAREA = ("estado", *CAMPOS_ALINEACION_TAREA, *CAMPOS_BUSQUEDA_TAREA, "epica__proyecto_id")
+CAMPOS_PREVIOS_SUBTAREA = ("estado", *CAMPOS_ALINEACION_SUBTAREA)
+CAMPOS_PREVIOS_EPICA = ("titulo", "proyecto_id")
+
+
+def _foto_previa(sender, instance, campos):
+    """{campo: valor} de la fila antes de guardar, o None si aún no existe."""
+    if instance.pk is None:
+        return None
+    return sender.objects.filter(pk=instance.pk).values(*campos).first()
+
+
+def _previo(instance, campo):
+    previa = getattr(instance, "_previa", None)
+    return previa[campo] if previa else None
+
+
+def _cambio(instance, campos):
+    """True si no hay foto previa o alguno de `campos` cambió respecto a ella."""
+    previa = getattr(instance, "_previa", None)
+    return previa is None or any(previa[c] != getattr(instance, c) for c in campos)
+
+
+# ==============================
+# Daily / DailyItem
+# ==============================
+@receiver(post_save, sender=DailyItem)
+def _dailyitem_guardado(sender, instance, **kwargs):
+    recalcular_alineacion([instance.daily_id])
+
+
+@receiver(post_delete, sender=DailyItem)
+def _dailyitem_borrado(sender, instance, origin=None, **kwargs):
+    # Si se está borrando el Daily completo no hay nada que recalcular
+    if isinstance(origin, Daily):
+        return
+    recalcular_alineacion([instance.daily_id])
+
+
+@receiver(pre_save, sender=Daily)
+def _daily_pre_save(sender, instance, **kwargs):
+    # La regla compara el sprint de la tarea con el del daily
+    instance._previa = _foto_previa(sender, instance, CAMPOS_ALINEACION_DAILY)
+
+
+@receiver(post_save, sender=Daily)
+def _daily_post_save(sender, instance, created, **kwargs):
+    # Sin foto previa (fila nueva) no hay líneas que recalcular
+    if created or getattr(instance, "_previa", None) is None or not _cambio(instance, CAMPOS_ALINEACION_DAILY):
+        return
+    recalcular_alineacion([instance.pk])
+
+
+# ==============================
+# Tarea / Subtarea
+# ==============================
+@receiver(pre_save, sender=Tarea)
+def _tarea_pre_save(sender, instance, **kwargs):
+    instance._previa = _foto_previa(sender, instance, CAMPOS_PREVIOS_TAREA)
+
+
+@receiver(post_save, sender=Tarea)
+def _tarea_post_save(sender, instance, created, **kwargs):
+    if created or not _cambio(instance, CAMPOS_ALINEACION_TAREA):
+        return
+    recalcular_alineacion(dailies_con_enlaces(tarea_ids=[instance.pk]))
+
+
+@receiver(pre_save, sender=Subtarea)
+def _subtarea_pre_save(sender, instance, **kwargs):
+    instance._previa = _foto_previa(sender, instance, CAMPOS_PREVIOS_SUBTAREA)
+
+
+@receiver(post_save, sender=Subtarea)
+def _subtarea_post_save(sender, instance, created, **kwargs):
+    if created or not _cambio(instance, CAMPOS_ALINEACION_SUBTAREA):
+        return
+    recalcular_alineacion(dailies_con_enlaces(subtarea_ids=[instance.pk]))
+
+
+@receiver(post_save, sender=BloqueTarea)
+@receiver(post_delete, sender=BloqueTarea)
+def _bloque_ventana(sender, instance, origin=None, **kwargs):
+    # Ventana de la tarea (min/max de sus bloques) y, con ella, la alineación
+    if _borrado_en_cascada(instance, origin):
+        return
+    actualizar_ventanas_al_confirmar(instance.tarea_id)
+
+
+@receiver(pre_delete, sender=Tarea)
+@receiver(pre_delete, sender=Subtarea)
+def _objetivo_pre_delete(sender, instance, **kwargs):
+    # Las líneas quedan con FK en NULL (SET_NULL): recordar sus dailies para después
+    if sender is Tarea:
+        instance._dailies_afectados = dailies_con_enlaces(tarea_ids=[instance.pk])
+    else:
+        instance._dailies_afectados = dailies_con_enlaces(subtarea_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Tarea)
+@receiver(post_delete, sender=Subtarea)
+def _objetivo_post_delete(sender, instance, **kwargs):
+    recalcular_alineacion(getattr(instance, "_dailies_afectados", ()))
+
+
+# ==============================
+# Bitácora de estados (EstadoEvento)
+# ==============================
+def _actor(instance):
+    user = getattr(instance, "_actor", None)
+    return user if getattr(user, "is_authenticated", False) else None
+
+
+@receiver(post_save, sender=Tarea)
+def _tarea_evento_estado(sender, instance, created, **kwargs):
+    previo = _previo(instance, "estado")
+    if not created and previo == instance.estado:
+        return
+    EstadoEvento.de_tarea(instance, previo, actor=_actor(instance)).save()
+
+
+@receiver(post_save, sender=Subtarea)
+def _subtarea_evento_estado(sender, instance, created, **kwargs):
+    previo = _previo(instance, "estado")
+    if not created and previo == instance.estado:
+        return
+    tarea_id, sprint_id = (
+        BloqueTarea.objects.filter(pk=instance.bloque_id).values_list("tarea_id", "tarea__sprint_id").first()
+    )
+    EstadoEvento.de_subtarea(instance, previo, tarea_id, sprint_id, actor=_actor(instance)).save()
+
+
+# ==============================
+# Asignación: asignado_a ⊆ asignados
+# ==============================
+@receiver(post_save, sender=Tarea)
+def _tarea_replicar_asignado(sender, instance, created, **kwargs):
+    if instance.asignado_a_id and (created or _cambio(instance, ("asignado_a_id",))):
+        TareaAsignacion.objects.get_or_create(tarea_id=instance.pk, integrante_id=instance.asignado_a_id)
+
+
+@receiver(m2m_changed, sender=TareaAsignacion)
+def _asignados_quitados(sender, instance, action, reverse, pk_set, **kwargs):
+    # Si el responsable legado sale de `asignados`, deja de serlo también en asignado_a
+    if action not in ("post_remove", "post_clear"):
+        return
+    if reverse:  # integrante.tareas_asignadas.remove(...) / clear()
+        qs = Tarea.objects.filter(asignado_a_id=instance.pk)
+        if pk_set is not None:
+            qs = qs.filter(pk__in=pk_set)
+    else:
+        qs = Tarea.objects.filter(pk=instance.pk, asignado_a__isnull=False)
+        if pk_set is not None:
+            qs = qs.filter(asignado_a_id__in=pk_set)
+    ids = list(qs.values_list("id", flat=True))
+    if ids:
+        Tarea.objects.filter(id__in=ids).update(asignado_a=None)
+        recalcular_alineacion(dailies_con_enlaces(tarea_ids=ids))
+
+
+# ==============================
+# Caché versionada (dashboard / KPIs)
+# ==============================
+def _alcances_de_tareas(tarea_ids):
+    res = set()
+    for sprint_id, proyecto_id in (
+        Tarea.objects.filter(pk__in=[i for i in tarea_ids if i])
+        .values_list("sprint_id", "epica__proyecto_id")
+    ):
+        res.update(alcances_tarea(sprint_id, proyecto_id))
+    return res or {"global"}
+
+
+def _borrado_en_cascada(instance, origin):
+    # Al borrar una Tarea/Bloque, sus hijos no invalidan por separado (lo hace el origen)
+    return origin is not None and origin is not instance
+
+
+@receiver(pre_delete, sender=Tarea)
+def _tarea_alcances_previos(sender, instance, **kwargs):
+    instance._alcances_previos = _alcances_de_tareas([instance.pk])
+
+
+@receiver(post_save, sender=Tarea)
+def _tarea_invalidar(sender, instance, **kwargs):
+    # Sprint/proyecto de antes (foto previa) y de ahora; sin consulta si la épica no cambió
+    previa = getattr(instance, "_previa", None)
+    if previa is None:
+        invalidar(*_alcances_de_tareas([instance.pk]))
+        return
+    anteriores = alcances_tarea(previa["sprint_id"], previa["epica__proyecto_id"])
+    if previa["epica_id"] == instance.epica_id:
+        actuales = alcances_tarea(instance.sprint_id, previa["epica__proyecto_id"])
+    else:
+        actuales = _alcances_de_tareas([instance.pk])
+    invalidar(*actuales, *anteriores)
+
+
+@receiver(post_delete, sender=Tarea)
+def _tarea_borrada_invalidar(sender, instance, **kwargs):
+    invalidar("global", *getattr(instance, "_alcances_previos", ()))
+
+
+@receiver(post_save, sender=BloqueTarea)
+@receiver(post_delete, sender=BloqueTarea)
+def _bloque_invalidar(sender, instance, origin=None, **kwargs):
+    if _borrado_en_cascada(instance, origin):
+        return
+    invalidar(*_alcances_de_tareas([instance.tarea_id]))
+
+
+@receiver(post_save, sender=Subtarea)
+@receiver(post_delete, sender=Subtarea)
+def _subtarea_invalidar(sender, instance, origin=None, **kwargs):
+    if _borrado_en_cascada(instance, origin):
+        return
+    tarea_id = BloqueTarea.objects.filter(pk=instance.bloque_id).values_list("tarea_id", flat=True).first()
+    invalidar(*_alcances_de_tareas([tarea_id]))
+
+
+@receiver(m2m_changed, sender=TareaAsignacion)
+def _asignados_invalidar(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidar(*_alcances_de_tareas([instance.pk]))
+    elif pk_set:
+        invalidar(*_alcances_de_tareas(pk_set))
+    else:
+        invalidar("catalogo")  # integrante.tareas_asignadas.clear(): no se sabe qué tareas eran
+
+
+@receiver(post_save, sender=Daily)
+@receiver(post_delete, sender=Daily)
+@receiver(post_save, sender=DailyItem)
+@receiver(post_delete, sender=DailyItem)
+def _daily_invalidar(sender, **kwargs):
+    invalidar("daily")
+
+
+@receiver(post_save, sender=Sprint)
+@receiver(post_delete, sender=Sprint)
+@receiver(post_save, sender=Proyecto)
+@receiver(post_delete, sender=Proyecto)
+@receiver(post_save, sender=Epica)
+@receiver(post_delete, sender=Epica)
+@receiver(post_save, sender=Integrante)
+@receiver(post_delete, sender=Integrante)
+def _catalogo_invalidar(sender, **kwargs):
+    # Combos y agrupaciones de todas las vistas cacheadas
+    invalidar("catalogo")
+
+
+@receiver(post_save, sender=Festivo)
+@receiver(post_delete, sender=Festivo)
+def _festivo_invalidar(sender, **kwargs):
+    # Calendario de cada proceso (calendario.py) y días hábiles de todas las vistas cacheadas
+    invalidar("festivos", "catalogo")
+
+
+# ==============================
+# Avisos en vivo (SSE)
+# ==============================
+@receiver(post_save, sender=Tarea)
+def _tarea_avisar(sender, instance, **kwargs):
+    avisar(aviso_tarea(instance))
+
+
+@receiver(post_delete, sender=Tarea)
+def _tarea_borrada_avisar(sender, instance, **kwargs):
+    avisar(aviso_tarea(instance, borrada=True))
+
+
+@receiver(post_save, sender=Subtarea)
+@receiver(post_delete, sender=Subtarea)
+def _subtarea_avisar(sender, instance, signal, origin=None, **kwargs):
+    if _borrado_en_cascada(instance, origin):
+        return
+    avisar(aviso_subtarea(instance, borrada=signal is post_delete))
+
+
+@receiver(post_save, sender=Daily)
+@receiver(post_delete, sender=Daily)
+def _daily_avisar(sender, instance, signal, **kwargs):
+    avisar(aviso_daily(instance, borrada=signal is post_delete))
+
+
+# ==============================
+# Documento de búsqueda (TareaBusqueda)
+# ==============================
+@receiver(post_save, sender=Tarea)
+def _tarea_reindexar(sender, instance, created, **kwargs):
+    # Los cambios de estado/categoría (la mayoría de guardados) no tocan el documento
+    if created or _cambio(instance, CAMPOS_BUSQUEDA_TAREA):
+        reindexar_al_confirmar(instance.pk)
+
+
+@receiver(pre_save, sender=Epica)
+def _epica_previa(sender, instance, **kwargs):
+    # Título y proyecto antes de guardar: búsqueda y visibilidad
+    instance._previa = _foto_previa(sender, instance, CAMPOS_PREVIOS_EPICA)
+
+
+@receiver(post_save, sender=Epica)
+def _epica_reindexar(sender, instance, created, **kwargs):
+    if created or not _cambio(instance, ("titulo",)):
+        return
+    reindexar_al_confirmar(*Tarea.objects.filter(epica_id=instance.pk).values_list("id", flat=True))
+
+
+@receiver(pre_delete, sender=Epica)
+def _epica_borrada_reindexar(sender, instance, **kwargs):
+    # Sus tareas quedan sin épica (SET_NULL, sin señales): se pide antes de perder la relación
+    reindexar_al_confirmar(*Tarea.objects.filter(epica_id=instance.pk).values_list("id", flat=True))
+
+
+@receiver(post_save, sender=BloqueTarea)
+@receiver(post_delete, sender=BloqueTarea)
+@receiver(post_save, sender=Evidencia)
+@receiver(post_delete, sender=Evidencia)
+def _hijo_tarea_reindexar(sender, instance, origin=None, **kwargs):
+    if _borrado_en_cascada(instance, origin):
+        return
+    reindexar_al_confirmar(instance.tarea_id)
+
+
+@receiver(post_save, sender=Subtarea)
+@receiver(post_delete, sender=Subtarea)
+def _subtarea_reindexar(sender, instance, origin=None, **kwargs):
+    if _borrado_en_cascada(instance, origin):
+        return
+    reindexar_al_confirmar(
+        BloqueTarea.objects.filter(pk=instance.bloque_id).values_list("tarea_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=EvidenciaSubtarea)
+@receiver(post_delete, sender=EvidenciaSubtarea)
+def _evidencia_subtarea_reindexar(sender, instance, origin=None, **kwargs):
+    if _borrado_en_cascada(instance, origin):
+        return
+    reindexar_al_confirmar(
+        Subtarea.objects.filter(pk=instance.subtarea_id).values_list("bloque__tarea_id", flat=True).first()
+    )
+
+
+# ==============================
+# Contexto de autorización (caché por usuario)
+# ==============================
+def _invalidar_autorizacion(integrante_ids):
+    ids = [i for i in integrante_ids if i]
+    if ids:
+        users = Integrante.objects.filter(pk__in=ids).values_list("user_id", flat=True)
+        invalidar(*(alcance_usuario(u) for u in users))
+
+
+@receiver(post_save, sender=Integrante)
+@receiver(post_delete, sender=Integrante)
+def _integrante_autorizacion(sender, instance, **kwargs):
+    invalidar(alcance_usuario(instance.user_id))
+
+
+@receiver(post_save, sender=PermisoProyecto)
+@receiver(post_delete, sender=PermisoProyecto)
+def _permiso_autorizacion(sender, instance, **kwargs):
+    _invalidar_autorizacion([instance.integrante_id])
+
+
+@receiver(post_save, sender=Proyecto)
+@receiver(post_delete, sender=Proyecto)
+def _proyecto_autorizacion(sender, **kwargs):
+    # Un proyecto inactivo deja de estar autorizado para todos sus visualizadores
+    invalidar("auth")
+
+
+@receiver(post_save, sender=Tarea)
+def _tarea_responsable_autorizacion(sender, instance, created, **kwargs):
+    # asignado_a cuenta como responsable (y se replica a asignados sin m2m_changed)
+    anterior = _previo(instance, "asignado_a_id")
+    if created or anterior != instance.asignado_a_id:
+        _invalidar_autorizacion([anterior, instance.asignado_a_id])
+
+
+@receiver(m2m_changed, sender=TareaAsignacion)
+def _asignados_autorizacion(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if reverse:
+        invalidar(alcance_usuario(instance.user_id))
+    elif pk_set:
+        _invalidar_autorizacion(pk_set)
+    else:
+        invalidar("auth")  # tarea.asignados.clear(): no se sabe a quiénes tenía
+
+
+# ==============================
+# Índice de visibilidad (TareaVisibilidad)
+# ==============================
+@receiver(post_save, sender=Tarea)
+def _tarea_visibilidad(sender, instance, created, **kwargs):
+    # Épica (visualizadores) o asignado_a (se replica a asignados sin m2m_changed)
+    if created or _cambio(instance, ("asignado_a_id", "epica_id")):
+        sincronizar_al_confirmar(tareas=[instance.pk])
+
+
+@receiver(m2m_changed, sender=TareaAsignacion)
+def _asignados_visibilidad(sender, instance, action, reverse, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if reverse:
+        sincronizar_al_confirmar(integrantes=[instance.pk])
+    else:
+        sincronizar_al_confirmar(tareas=[instance.pk])
+
+
+@receiver(post_save, sender=Epica)
+def _epica_visibilidad(sender, instance, created, **kwargs):
+    if created or not _cambio(instance, ("proyecto_id",)):
+        return
+    sincronizar_al_confirmar(tareas=Tarea.objects.filter(epica_id=instance.pk).values_list("id", flat=True))
+
+
+@receiver(pre_delete, sender=Epica)
+def _epica_borrada_visibilidad(sender, instance, **kwargs):
+    # Sus tareas quedan sin épica (SET_NULL): los visualizadores dejan de verlas
+    sincronizar_al_confirmar(tareas=Tarea.objects.filter(epica_id=instance.pk).values_list("id", flat=True))
+
+
+@receiver(post_save, sender=PermisoProyecto)
+@receiver(post_delete, sender=PermisoProyecto)
+def _permiso_visibilidad(sender, instance, **kwargs):
+    sincronizar_al_confirmar(integrantes=[instance.integrante_id])
+
+
+@receiver(post_save, sender=Integrante)
+def _integrante_visibilidad(sender, instance, created, **kwargs):
+    # Cambio de rol visualizador ↔ miembro (las filas del borrado se van por CASCADE)
+    if not created:
+        sincronizar_al_confirmar(integrantes=[instance.pk])
+
+
+@receiver(post_save, sender=Proyecto)
+def _proyecto_visibilidad(sender, instance, created, **kwargs):
+    # Activar/desactivar el proyecto cambia lo que ven sus visualizadores
+    if not created:
+        sincronizar_al_confirmar(
+            integrantes=PermisoProyecto.objects.filter(proyecto_id=instance.pk).values_list("integrante_id", flat=True)
+        )
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Snapshots de cierre de sprint (SprintSnapshot).
+
+Un sprint cerrado ya no cambia su historia: se calcula una vez con consultas
+agrupadas y los gráficos históricos (velocidad, burndown del equipo, esfuerzo,
+cumplimiento de daily) leen la fila congelada. Se congela solo con el cron
+diario (python manage.py congelar_sprints); las vistas no escriben: un sprint
+cerrado que aún no tiene foto se calcula en vivo.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache_datos import alcances_tarea, invalidar
+from .calendario import dias_habiles
+from .metricas import metricas_daily_por_integrante, serie_burndown
+from .models import Integrante, SprintSnapshot, Subtarea, Tarea, TareaAsignacion
+
+
+def _por_estado(qs):
+    return {
+        r["estado"]: {"n": r["n"], "sp": r["sp"]}
+        for r in qs.values("estado").annotate(n=Count("id"), sp=Coalesce(Sum("esfuerzo_sp"), 0)).order_by()
+    }
+
+
+def _por_integrante(tareas, subtareas):
+    res = {}
+
+    def fila(iid):
+        return res.setdefault(str(iid), dict.fromkeys(
+            ("hu", "hu_terminadas", "sp", "sp_completados", "st", "st_terminadas", "sp_st_terminadas"), 0
+        ))
+
+    asignaciones = (
+        TareaAsignacion.objects.filter(tarea__in=tareas)
+        .values("integrante_id")
+        .annotate(
+            hu=Count("tarea_id"),
+            hu_terminadas=Count("tarea_id", filter=Q(tarea__terminada=True)),
+            sp=Coalesce(Sum("tarea__esfuerzo_sp"), 0),
+            sp_completados=Coalesce(Sum("tarea__esfuerzo_sp", filter=Q(tarea__terminada=True)), 0),
+        )
+        .order_by()
+    )
+    for r in asignaciones:
+        fila(r.pop("integrante_id")).update(r)
+
+    por_responsable = (
+        subtareas.filter(responsable__isnull=False)
+        .values("responsable_id")
+        .annotate(
+            st=Count("id"),
+            st_terminadas=Count("id", filter=Q(terminada=True)),
+            sp_st_terminadas=Coalesce(Sum("esfuerzo_sp", filter=Q(terminada=True)), 0),
+        )
+        .order_by()
+    )
+    for r in por_responsable:
+        fila(r.pop("responsable_id")).update(r)
+    return res
+
+
+def calcular_snapshot(sprint):
+    """Arma (sin guardar) el SprintSnapshot del sprint a partir de los datos actuales."""
+    tareas = Tarea.objects.filter(sprint=sprint)
+    subtareas = Subtarea.objects.filter(bloque__tarea__sprint=sprint)
+
+    tot = tareas.aggregate(
+        hu_total=Count("id"),
+        hu_terminadas=Count("id", filter=Q(terminada=True)),
+        sp_planificados=Coalesce(Sum("esfuerzo_sp"), 0),
+        sp_completados=Coalesce(Sum("esfuerzo_sp", filter=Q(terminada=True)), 0),
+    )
+    st_tot = subtareas.aggregate(
+        st_total=Count("id"),
+        st_terminadas=Count("id", filter=Q(terminada=True)),
+        sp_subtareas_terminadas=Coalesce(Sum("esfuerzo_sp", filter=Q(terminada=True)), 0),
+    )
+    por_proyecto = {
+        str(r["epica__proyecto_id"]): {"sp_planificados": r["plan"], "sp_completados": r["hecho"]}
+        for r in (
+            tareas.filter(epica__proyecto__isnull=False)
+            .values("epica__proyecto_id")
+            .annotate(
+                plan=Coalesce(Sum("esfuerzo_sp"), 0),
+                hecho=Coalesce(Sum("esfuerzo_sp", filter=Q(terminada=True)), 0),
+            )
+            .order_by()
+        )
+    }
+    daily = metricas_daily_por_integrante(
+        sprint=sprint,
+        integrante_ids=Integrante.objects.values_list("id", flat=True),
+        dias_habiles=dias_habiles(sprint.inicio, sprint.fin),
+    )
+
+    return SprintSnapshot(
+        sprint=sprint,
+        congelado_en=timezone.now(),
+        **tot,
+        **st_tot,
+        hu_por_estado=_por_estado(tareas),
+        st_por_estado=_por_estado(subtareas),
+        por_proyecto=por_proyecto,
+        por_integrante=_por_integrante(tareas, subtareas),
+        daily={str(k): v for k, v in daily.items()},
+        burndown=serie_burndown(sprint.inicio, sprint.fin, tareas, subtareas),
+    )
+
+
+def congelar_sprint(sprint, forzar=False):
+    """
+    Escribe el snapshot del sprint. Sin `forzar` respeta el existente
+    (se congela una sola vez); con `forzar` lo recalcula y reemplaza.
+    """
+    with transaction.atomic():
+        actual = SprintSnapshot.objects.select_for_update().filter(sprint=sprint).first()
+        if actual and not forzar:
+            return actual
+        nuevo = calcular_snapshot(sprint)
+        if actual:
+            nuevo.pk = actual.pk
+        try:
+            with transaction.atomic():
+                nuevo.save()
+        except IntegrityError:
+            # Otro proceso lo congeló al mismo tiempo: vale el suyo
+            return SprintSnapshot.objects.get(sprint=sprint)
+        if actual:
+            # Re-congelado: cambian los históricos ya cacheados del sprint y de sus proyectos
+            proyectos = set(actual.por_proyecto or {}) | set(nuevo.por_proyecto)
+            invalidar(*alcances_tarea(sprint.id), *(f"proyecto:{pid}" for pid in proyectos))
+        return nuevo
+
+
+def snapshots_de(sprints):
+    """
+    {sprint_id: SprintSnapshot} de los sprints cerrados de la lista que ya tienen
+    foto. No congela (las vistas de lectura no escriben): los que falten quedan
+    fuera y el llamador los calcula en vivo. Los sprints abiertos (o reabiertos
+    al mover su fin) nunca usan snapshot.
+    """
+    cerrados = [sp for sp in sprints if sp.cerrado]
+    if not cerrados:
+        return {}
+    return {s.sprint_id: s for s in SprintSnapshot.objects.filter(sprint__in=cerrados)}
+
+
+def snapshot_si_cerrado(sprint):
+    """SprintSnapshot del sprint si ya cerró y está congelado, si no None (cálculo en vivo)."""
+    if sprint is None or not sprint.cerrado:
+        return None
+    return snapshots_de([sprint]).get(sprint.id)
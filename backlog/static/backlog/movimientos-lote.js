@@ -0,0 +1,55 @@
+/*
+ * Cola de movimientos del tablero (Kanban / Matriz).
+ * Junta los drag & drop de unos instantes y los envía en un solo POST a
+ * mover_tareas_lote: {"movimientos": [{tarea_id, estado|categoria, observacion?}]}.
+ */
+function crearColaMovimientos(url, csrfToken, esperaMs) {
+  let pendientes = [];
+  let timer = null;
+
+  function enviar() {
+    clearTimeout(timer);
+    timer = null;
+    const lote = pendientes;
+    pendientes = [];
+    if (!lote.length) return;
+
+    fetch(url, {
+      method: 'POST',
+      keepalive: true,  // el último lote sobrevive a la navegación
+      headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrfToken },
+      body: JSON.stringify({ movimientos: lote.map(p => p.movimiento) })
+    })
+    .then(r => r.json().then(data => ({ ok: r.ok, data })))
+    .then(({ ok, data }) => {
+      if (!ok || !Array.isArray(data.resultados)) throw new Error(data.error || 'Respuesta inválida');
+      const errores = [];
+      data.resultados.forEach((res, i) => {
+        if (res.ok) {
+          if (lote[i].alAplicar) lote[i].alAplicar(res);
+        } else {
+          errores.push(`#${res.tarea_id}: ${res.error}`);
+        }
+      });
+      if (errores.length) {
+        alert('No se aplicaron algunos movimientos:\n' + errores.join('\n'));
+        location.reload();
+      }
+    })
+    .catch(err => {
+      alert('Error al mover tareas (' + err.message + '). Recarga la página.');
+      location.reload();
+    });
+  }
+
+  window.addEventListener('pagehide', enviar);
+
+  return {
+    agregar(movimiento, alAplicar) {
+      pendientes.push({ movimiento, alAplicar });
+      clearTimeout(timer);
+      timer = setTimeout(enviar, esperaMs || 600);
+    },
+    enviar,
+  };
+}
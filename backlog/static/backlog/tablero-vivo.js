@@ -0,0 +1,20 @@
+/*
+ * Avisos en vivo (SSE) para Kanban, Matriz y Resumen de Daily.
+ * escucharTablero(url, alCambio): alCambio(aviso) con {tipo, id, estado|categoria|borrada, v}.
+ * Si el servidor no es ASGI responde 501 y EventSource deja de reintentar.
+ */
+function escucharTablero(url, alCambio) {
+  if (!window.EventSource) return null;
+  const fuente = new EventSource(url);
+  const versiones = {};  // "tipo:id" -> última versión aplicada
+  fuente.addEventListener('cambio', e => {
+    let aviso;
+    try { aviso = JSON.parse(e.data); } catch (err) { return; }
+    const clave = aviso.tipo + ':' + aviso.id;
+    if (aviso.v && versiones[clave] && aviso.v < versiones[clave]) return;  // aviso atrasado
+    versiones[clave] = aviso.v || 0;
+    alCambio(aviso);
+  });
+  window.addEventListener('pagehide', () => fuente.close());
+  return fuente;
+}
@@ -1,3 +1,992 @@
+import importlib
+import json
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from disponibilidad.models import DisponibilidadSemanal
+
+from . import busqueda, visibilidad
+from .autorizacion import contexto_usuario
+from .cache_datos import versiones
+from .calendario import dias_habiles, es_habil, festivos_colombia
+from .capacidad import calcular_capacidad, horas_disponibles, sp_comprometidos
+from .eventos_vivo import aviso_daily, aviso_subtarea, aviso_tarea, filtro_visibilidad
+from .metricas import (
+    completar_burndown, historial_estados, metricas_daily_por_integrante, serie_burndown, tiempo_ciclo,
+)
+from .models import (
+    Integrante, PermisoProyecto, Proyecto, Epica, Sprint, Festivo, SprintSnapshot,
+    Tarea, TareaAsignacion, BloqueTarea, Subtarea, EstadoEvento, TareaVisibilidad, Daily, DailyItem,
+    Evidencia, TareaBusqueda,
+    compute_alineacion_bulk, normalizar_estado_subtarea, normalizar_estado_tarea,
+    precrear_dailies, q_item_alineado, registrar_daily,
+)
+from .snapshots import congelar_sprint
+from .views import KANBAN_PAGINA, LISTA_PAGINA
+
+
+# ==============================
+# Datos de prueba
+# ==============================
+def crear_integrante(username, rol=Integrante.ROL_MIEMBRO):
+    return Integrante.objects.create(user=User.objects.create(username=username), rol=rol)
+
+
+class DatosBase(TestCase):
+    """Un proyecto con una épica, dos sprints consecutivos y tres integrantes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_integrante("admin", Integrante.ROL_SM_PO)
+        cls.ana = crear_integrante("ana")
+        cls.beto = crear_integrante("beto")
+        cls.proyecto = Proyecto.objects.create(codigo="P1", nombre="Proyecto 1")
+        cls.epica = Epica.objects.create(titulo="Épica 1", proyecto=cls.proyecto)
+        cls.s1 = Sprint.objects.create(nombre="S1", inicio=date(2025, 1, 6), fin=date(2025, 1, 17))
+        cls.s2 = Sprint.objects.create(nombre="S2", inicio=date(2025, 1, 20), fin=date(2025, 1, 31))
+
+    def tarea(self, titulo="T", sprint=None, asignado=None, **extra):
+        return Tarea.objects.create(
+            titulo=titulo, sprint=sprint or self.s1, epica=self.epica, asignado_a=asignado, **extra
+        )
+
+    def bloque(self, tarea, inicio, fin, indice=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            return BloqueTarea.objects.create(tarea=tarea, indice=indice, fecha_inicio=inicio, fecha_fin=fin)
+
+    def daily(self, integrante, fecha, sprint=None):
+        return Daily.objects.create(integrante=integrante, fecha=fecha, hora=time(7, 0), sprint=sprint)
+
+
+# ==============================
+# Cumplimiento del Daily por integrante (user-001)
+# ==============================
+class MetricasDailyTests(DatosBase):
+    def test_conteos_y_porcentajes(self):
+        t = self.tarea(asignado=self.ana)
+        self.bloque(t, date(2025, 1, 6), date(2025, 1, 17))
+        a_tiempo = self.daily(self.ana, date(2025, 1, 6), sprint=self.s1)
+        DailyItem.objects.create(daily=a_tiempo, tipo="HOY", tarea=t)
+        DailyItem.objects.create(daily=a_tiempo, tipo="HOY", descripcion="libre")
+        tarde = Daily.objects.create(integrante=self.ana, fecha=date(2025, 1, 7), hora=time(10, 0))
+        DailyItem.objects.create(daily=tarde, tipo="HOY", tarea=t)
+        self.daily(self.ana, date(2025, 1, 20))                        # fuera del sprint
+        Daily.objects.create(integrante=self.ana, fecha=date(2025, 1, 8), hora=time(7, 0),
+                             registrado=False)                         # precreado sin enviar
+
+        m = metricas_daily_por_integrante(sprint=self.s1, integrante_ids=[self.ana.pk, self.beto.pk],
+                                          dias_habiles=10)
+        self.assertEqual(
+            {k: m[self.ana.pk][k] for k in ("presentes", "a_tiempo", "con_retraso", "faltantes",
+                                             "items_total", "items_alineados")},
+            {"presentes": 2, "a_tiempo": 1, "con_retraso": 1, "faltantes": 8, "items_total": 3,
+             "items_alineados": 2},
+        )
+        self.assertEqual((m[self.ana.pk]["participacion"], m[self.ana.pk]["cumplimiento"]), (20.0, 10.0))
+        self.assertAlmostEqual(m[self.ana.pk]["efectividad"], 200 / 3)
+        self.assertEqual((m[self.beto.pk]["presentes"], m[self.beto.pk]["no_completado"]), (0, 100.0))
+
+        self.assertEqual(metricas_daily_por_integrante()[self.ana.pk]["presentes"], 3)
+
+    def test_regla_sql_igual_a_la_de_python(self):
+        t = self.tarea(asignado=self.ana)
+        b = self.bloque(t, date(2025, 1, 6), date(2025, 1, 10))
+        st = Subtarea.objects.create(bloque=b, titulo="st", responsable=self.ana,
+                                     fecha_inicio=date(2025, 1, 8), fecha_fin=date(2025, 1, 9))
+        for fecha in (date(2025, 1, 7), date(2025, 1, 8), date(2025, 1, 13)):
+            d = self.daily(self.ana, fecha, sprint=self.s1)
+            for objetivo in ({"tarea": t}, {"subtarea": st}, {"descripcion": "libre"}):
+                DailyItem.objects.create(daily=d, tipo="HOY", **objetivo)
+
+        for d in Daily.objects.filter(integrante=self.ana):
+            alineados = set(d.items.filter(q_item_alineado()).values_list("id", flat=True))
+            no_alineados = set(d.items.exclude(id__in=alineados).values_list("id", flat=True))
+            self.assertEqual(no_alineados, set(d.alineacion["ids_no_alineados"]))
+
+
+# ==============================
+# Alineación del Daily (user-002)
+# ==============================
+class AlineacionTests(DatosBase):
+    def test_reglas_por_linea(self):
+        t = self.tarea(asignado=self.ana)
+        b = self.bloque(t, date(2025, 1, 6), date(2025, 1, 10))
+        st_propia = Subtarea.objects.create(
+            bloque=b, titulo="propias", responsable=self.ana,
+            fecha_inicio=date(2025, 1, 8), fecha_fin=date(2025, 1, 9),
+        )
+        st_bloque = Subtarea.objects.create(bloque=b, titulo="del bloque", responsable=self.ana)
+        st_otro = Subtarea.objects.create(bloque=b, titulo="de beto", responsable=self.beto)
+        fuera = self.tarea("fuera", sprint=self.s2, asignado=self.ana)
+
+        d = self.daily(self.ana, date(2025, 1, 7), sprint=self.s1)
+        casos = {
+            DailyItem.objects.create(daily=d, tipo="HOY", subtarea=st_propia): False,  # antes de sus fechas
+            DailyItem.objects.create(daily=d, tipo="HOY", subtarea=st_bloque): True,   # hereda el bloque
+            DailyItem.objects.create(daily=d, tipo="HOY", subtarea=st_otro): False,    # otro responsable
+            DailyItem.objects.create(daily=d, tipo="HOY", tarea=t): True,              # en la ventana
+            DailyItem.objects.create(daily=d, tipo="HOY", tarea=fuera): False,         # sin ventana ni sprint
+            DailyItem.objects.create(daily=d, tipo="HOY", descripcion="libre"): False,
+        }
+
+        m = compute_alineacion_bulk([d.pk])[d.pk]
+        self.assertEqual(m["total"], len(casos))
+        self.assertEqual(m["alineados"], sum(casos.values()))
+        self.assertEqual(m["porcentaje"], round(100 * 2 / 6))
+        self.assertEqual(sorted(m["ids_no_alineados"]), sorted(i.id for i, ok in casos.items() if not ok))
+
+    def test_mismo_sprint_sin_ventana(self):
+        t = self.tarea(sprint=self.s2, asignado=self.ana)
+        con_sprint = self.daily(self.ana, date(2025, 1, 21), sprint=self.s2)
+        sin_sprint = self.daily(self.ana, date(2025, 1, 22))
+        for d in (con_sprint, sin_sprint):
+            DailyItem.objects.create(daily=d, tipo="HOY", tarea=t)
+
+        m = compute_alineacion_bulk(Daily.objects.filter(integrante=self.ana))
+        self.assertEqual(m[con_sprint.pk]["alineados"], 1)
+        self.assertEqual(m[sin_sprint.pk]["alineados"], 0)
+
+    def test_daily_sin_lineas(self):
+        d = self.daily(self.beto, date(2025, 1, 7))
+        self.assertEqual(compute_alineacion_bulk([d.pk])[d.pk]["total"], 0)
+        self.assertEqual(d.alineacion["porcentaje"], 0)
+
+
+# ==============================
+# Contadores de alineación en Daily (user-003)
+# ==============================
+class ContadoresAlineacionTests(DatosBase):
+    def contadores(self, d):
+        d.refresh_from_db()
+        return d.items_total, d.items_alineados, d.porcentaje_alineacion
+
+    def test_lineas_y_cambios_de_objetivo(self):
+        t = self.tarea(asignado=self.ana)
+        b = self.bloque(t, date(2025, 1, 6), date(2025, 1, 10))
+        st = Subtarea.objects.create(bloque=b, titulo="st", responsable=self.ana)
+        d = self.daily(self.ana, date(2025, 1, 7))
+
+        DailyItem.objects.create(daily=d, tipo="HOY", subtarea=st)
+        item = DailyItem.objects.create(daily=d, tipo="HOY", descripcion="libre")
+        self.assertEqual(self.contadores(d), (2, 1, 50))
+
+        st.responsable = self.beto
+        st.save()
+        self.assertEqual(self.contadores(d), (2, 0, 0))
+
+        item.delete()
+        self.assertEqual(self.contadores(d), (1, 0, 0))
+
+    def test_cambio_de_sprint_del_daily(self):
+        t = self.tarea(sprint=self.s2, asignado=self.ana)
+        d = self.daily(self.ana, date(2025, 1, 21))
+        DailyItem.objects.create(daily=d, tipo="HOY", tarea=t)
+        self.assertEqual(self.contadores(d), (1, 0, 0))
+
+        d.sprint = self.s2
+        d.save()
+        self.assertEqual(self.contadores(d), (1, 1, 100))
+
+    def test_backfill_0027_igual_a_la_regla(self):
+        t = self.tarea(asignado=self.ana)
+        self.bloque(t, date(2025, 1, 6), date(2025, 1, 8))
+        otra = self.tarea("otra", sprint=self.s2, asignado=self.beto)
+        for dia, integrante, sprint in [(7, self.ana, None), (9, self.ana, self.s1), (21, self.beto, self.s2),
+                                        (22, self.beto, None)]:
+            d = self.daily(integrante, date(2025, 1, dia), sprint=sprint)
+            DailyItem.objects.create(daily=d, tipo="HOY", tarea=t)
+            DailyItem.objects.create(daily=d, tipo="HOY", tarea=otra)
+            DailyItem.objects.create(daily=d, tipo="AYER", descripcion="libre")
+        Daily.objects.update(items_total=0, items_alineados=0, porcentaje_alineacion=0)
+
+        migracion = importlib.import_module("backlog.migrations.0027_daily_contadores_alineacion")
+        migracion.backfill(apps, connection.schema_editor())
+
+        esperado = compute_alineacion_bulk(Daily.objects.all())
+        for d in Daily.objects.all():
+            m = esperado[d.pk]
+            self.assertEqual(
+                (d.items_total, d.items_alineados, d.porcentaje_alineacion),
+                (m["total"], m["alineados"], m["porcentaje"]),
+            )
+
+
+# ==============================
+# Ventana de la Tarea (user-004)
+# ==============================
+class VentanaTareaTests(DatosBase):
+    def test_bloques_mueven_ventana_y_alineacion(self):
+        t = self.tarea("sin sprint común", sprint=self.s2, asignado=self.ana)
+        b = self.bloque(t, date(2025, 1, 6), date(2025, 1, 8))
+        extra = self.bloque(t, date(2025, 1, 9), date(2025, 1, 14), indice=2)
+        t.refresh_from_db()
+        self.assertEqual((t.ventana_inicio, t.ventana_fin), (date(2025, 1, 6), date(2025, 1, 14)))
+
+        d = self.daily(self.ana, date(2025, 1, 13))
+        DailyItem.objects.create(daily=d, tipo="HOY", tarea=t)
+        d.refresh_from_db()
+        self.assertEqual(d.items_alineados, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            extra.delete()
+        t.refresh_from_db()
+        d.refresh_from_db()
+        self.assertEqual((t.ventana_inicio, t.ventana_fin), (date(2025, 1, 6), date(2025, 1, 8)))
+        self.assertEqual(d.items_alineados, 0)
+
+        b.fecha_fin = date(2025, 1, 13)
+        with self.captureOnCommitCallbacks(execute=True):
+            b.save()
+        d.refresh_from_db()
+        self.assertEqual(d.items_alineados, 1)
+
+    def test_nueva_tarea_con_bloques_invalidos_no_queda(self):
+        self.client.force_login(self.admin.user)
+        datos = {
+            "titulo": "Nueva", "categoria": "UI", "estado": "NUEVO", "sprint": self.s1.pk,
+            "bloques-TOTAL_FORMS": "1", "bloques-INITIAL_FORMS": "0",
+            "bloques-MIN_NUM_FORMS": "0", "bloques-MAX_NUM_FORMS": "1000",
+            "bloques-0-indice": "1", "bloques-0-fecha_inicio": "2025-01-10", "bloques-0-fecha_fin": "2025-01-05",
+        }
+        r = self.client.post(reverse("nueva_tarea"), datos)
+        self.assertEqual(r.status_code, 200)
+        self.assertFalse(Tarea.objects.filter(titulo="Nueva").exists())
+
+        datos["bloques-0-fecha_fin"] = "2025-01-14"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("nueva_tarea"), datos)
+        t = Tarea.objects.get(titulo="Nueva")
+        self.assertEqual((t.ventana_inicio, t.ventana_fin), (date(2025, 1, 10), date(2025, 1, 14)))
+
+
+# ==============================
+# Estado canónico (user-005)
+# ==============================
+class EstadoCanonicoTests(DatosBase):
+    def test_normalizadores(self):
+        for valor, esperado in [("completada", "COMPLETADO"), (" Aprobado ", "COMPLETADO"),
+                                ("en progreso", "EN_PROGRESO"), ("todo", "NUEVO"), ("", "NUEVO"), (None, "NUEVO")]:
+            self.assertEqual(normalizar_estado_tarea(valor), esperado)
+        for valor, esperado in [("COMPLETADO", "cerrada"), ("Entregada", "entregada"), ("NUEVO", "pendiente"),
+                                ("BLOQUEADO", "bloqueada"), ("", "pendiente")]:
+            self.assertEqual(normalizar_estado_subtarea(valor), esperado)
+        with self.assertRaises(ValidationError):
+            normalizar_estado_tarea("raro")
+        with self.assertRaises(ValidationError):
+            normalizar_estado_subtarea("raro")
+
+    def test_guardar_deriva_terminada(self):
+        t = self.tarea(estado="completada")
+        self.assertEqual((t.estado, t.terminada), ("COMPLETADO", True))
+        t.estado = "EN_PROGRESO"
+        t.save()
+        t.refresh_from_db()
+        self.assertEqual((t.estado, t.terminada), ("EN_PROGRESO", False))
+
+    def test_migracion_0029(self):
+        # Tabla suelta: la de Tarea ya tiene el CHECK de estado válido
+        migracion = importlib.import_module("backlog.migrations.0029_estado_canonico")
+        editor = connection.schema_editor()
+        editor.execute("CREATE TABLE prueba_estado (id integer PRIMARY KEY, estado varchar(20), terminada boolean)")
+        legado = {"completada": "COMPLETADO", "Aprobado": "COMPLETADO", " pendiente ": "NUEVO",
+                  "EN PROGRESO": "EN_PROGRESO", "": "NUEVO", None: "NUEVO", "bloqueada": "BLOQUEADO"}
+        filas = list(enumerate(legado, 1))
+        for pk, valor in filas:
+            editor.execute("INSERT INTO prueba_estado (id, estado) VALUES (%s, %s)", [pk, valor])
+        editor.execute("INSERT INTO prueba_estado (id, estado) VALUES (99, 'raro')")
+
+        with self.assertRaisesMessage(RuntimeError, "'raro'"):
+            migracion._normalizar(editor, "prueba_estado", "UPPER", migracion.MAPEO_TAREA, migracion.TERMINADA_TAREA)
+
+        editor.execute("DELETE FROM prueba_estado WHERE id = 99")
+        migracion._normalizar(editor, "prueba_estado", "UPPER", migracion.MAPEO_TAREA, migracion.TERMINADA_TAREA)
+        with connection.cursor() as c:
+            c.execute("SELECT id, estado, terminada FROM prueba_estado ORDER BY id")
+            self.assertEqual(
+                [(pk, e, bool(t)) for pk, e, t in c.fetchall()],
+                [(pk, legado[v], legado[v] == "COMPLETADO") for pk, v in filas],
+            )
+
+
+# ==============================
+# Asignación única por la tabla puente (user-006)
+# ==============================
+class AsignacionTests(DatosBase):
+    def test_asignado_legado_en_asignados(self):
+        t = self.tarea(asignado=self.ana)
+        otra = self.tarea("otra")
+        otra.asignados.add(self.beto)
+        self.assertEqual(list(Tarea.objects.asignadas_a(self.ana)), [t])
+        self.assertEqual(list(Tarea.objects.asignadas_a(self.beto.pk)), [otra])
+
+        t.asignados.remove(self.ana)
+        t.refresh_from_db()
+        self.assertIsNone(t.asignado_a_id)
+        self.assertFalse(Tarea.objects.asignadas_a(self.ana).exists())
+
+        t.asignado_a = self.beto
+        t.save()
+        self.beto.tareas_asignadas.clear()
+        t.refresh_from_db()
+        self.assertIsNone(t.asignado_a_id)
+
+    def test_cambio_de_estado_no_toca_asignados(self):
+        t = self.tarea(asignado=self.ana)
+        t.estado, t.categoria = "EN_PROGRESO", "UI"
+        with CaptureQueriesContext(connection) as c:
+            t.save()
+        tabla = TareaAsignacion._meta.db_table
+        self.assertFalse([q for q in c.captured_queries if tabla in q["sql"]])
+
+    def test_migracion_0030_copia_faltantes(self):
+        t = self.tarea(asignado=self.ana)
+        TareaAsignacion.objects.filter(tarea=t).delete()
+        migracion = importlib.import_module("backlog.migrations.0030_tarea_asignacion_unica")
+        migracion.migrar_asignado_legado(apps, connection.schema_editor())
+        migracion.migrar_asignado_legado(apps, connection.schema_editor())
+        self.assertEqual(list(TareaAsignacion.objects.filter(tarea=t).values_list("integrante_id", flat=True)),
+                         [self.ana.pk])
+
+
+# ==============================
+# Burndown en SQL (user-010)
+# ==============================
+class BurndownTests(DatosBase):
+    def test_serie_e_ideal(self):
+        Festivo.objects.create(fecha=date(2025, 1, 6), nombre="Reyes Magos")
+        cache.clear()
+        hecha = self.tarea("hecha", esfuerzo_sp=5, estado="COMPLETADO")
+        Tarea.objects.filter(pk=hecha.pk).update(
+            fecha_cierre=timezone.make_aware(datetime(2025, 1, 8, 20, 0))  # hora local
+        )
+        abierta = self.tarea("abierta", esfuerzo_sp=3)
+        b = self.bloque(abierta, date(2025, 1, 6), date(2025, 1, 17))
+        Subtarea.objects.create(bloque=b, titulo="st", esfuerzo_sp=2, estado="cerrada", fecha_fin=date(2025, 1, 10))
+        Subtarea.objects.create(bloque=b, titulo="fuera", esfuerzo_sp=1, estado="cerrada", fecha_fin=date(2025, 2, 3))
+
+        serie = completar_burndown(serie_burndown(
+            self.s1.inicio, self.s1.fin,
+            Tarea.objects.filter(sprint=self.s1), Subtarea.objects.filter(bloque__tarea__sprint=self.s1),
+        ))
+        self.assertEqual(serie["planificado"], 11)
+        self.assertEqual(len(serie["dias"]), 12)
+        self.assertEqual(serie["hecho"][:5], [0, 0, 5, 5, 7])
+        self.assertEqual(serie["restante"][-1], 4)
+        # 9 días hábiles (sin fin de semana ni festivo): el ideal no baja el lunes festivo
+        self.assertEqual(len(serie["habiles"]), 9)
+        self.assertEqual(serie["ideal"][0], 11)
+        self.assertEqual(serie["ideal"][1], round(11 * 8 / 9, 2))
+        self.assertEqual(serie["ideal"][-1], 0)
+
+
+# ==============================
+# Caché versionada de dashboard/KPIs (user-007)
+# ==============================
+class CacheVersionadaTests(DatosBase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin.user)
+
+    def burndown(self, sprint):
+        r = self.client.get(reverse("kpi_burndown_json"), {"sprint_id": sprint.pk})
+        return r["X-Neusi-Cache"], r.json()
+
+    def test_escritura_invalida_solo_su_sprint(self):
+        t = self.tarea(esfuerzo_sp=3)
+        self.assertEqual(self.burndown(self.s1)[0], "miss")
+        self.assertEqual(self.burndown(self.s2)[0], "miss")
+        self.assertEqual(self.burndown(self.s1), ("hit", self.burndown(self.s1)[1]))
+
+        # La versión sube al confirmar, no antes
+        t.esfuerzo_sp = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            t.save()
+            self.assertEqual(self.burndown(self.s1)[0], "hit")
+        origen, datos = self.burndown(self.s1)
+        self.assertEqual((origen, datos["planificado"]), ("miss", 5))
+        self.assertEqual(self.burndown(self.s2)[0], "hit")
+
+    def test_usuarios_con_distinto_alcance_no_comparten(self):
+        self.tarea(esfuerzo_sp=3)
+        self.assertEqual(self.burndown(self.s1)[0], "miss")
+        self.client.force_login(self.ana.user)
+        self.assertEqual(self.burndown(self.s1)[0], "miss")
+
+
+# ==============================
+# Snapshots de sprints cerrados (user-008)
+# ==============================
+class SnapshotSprintTests(DatosBase):
+    def test_congelar_sprints_una_vez(self):
+        abierto = Sprint.objects.create(
+            nombre="S3", inicio=timezone.localdate(), fin=timezone.localdate() + timedelta(days=13)
+        )
+        self.tarea("hecha", esfuerzo_sp=3, estado="COMPLETADO")
+        pendiente = self.tarea("pendiente", esfuerzo_sp=5)
+
+        call_command("congelar_sprints", stdout=StringIO())
+        self.assertEqual(set(SprintSnapshot.objects.values_list("sprint_id", flat=True)), {self.s1.pk, self.s2.pk})
+        self.assertFalse(SprintSnapshot.objects.filter(sprint=abierto).exists())
+        foto = SprintSnapshot.objects.get(sprint=self.s1)
+        self.assertEqual((foto.hu_total, foto.sp_planificados, foto.sp_completados), (2, 8, 3))
+
+        pendiente.estado = "COMPLETADO"
+        pendiente.save()
+        call_command("congelar_sprints", stdout=StringIO())
+        self.assertEqual(SprintSnapshot.objects.get(sprint=self.s1).sp_completados, 3)
+        call_command("congelar_sprints", sprint=[self.s1.pk], forzar=True, stdout=StringIO())
+        self.assertEqual(SprintSnapshot.objects.get(sprint=self.s1).sp_completados, 8)
+
+    def test_recongelar_invalida_sprint_y_proyecto(self):
+        cache.clear()
+        self.tarea(esfuerzo_sp=3)
+        congelar_sprint(self.s1)
+        alcances = ["global", f"sprint:{self.s1.pk}", f"proyecto:{self.proyecto.pk}", f"sprint:{self.s2.pk}"]
+        antes = versiones(alcances)
+        with self.captureOnCommitCallbacks(execute=True):
+            congelar_sprint(self.s1, forzar=True)
+        despues = versiones(alcances)
+        self.assertEqual([antes[a] != despues[a] for a in alcances], [True, True, True, False])
+
+    def test_vistas_no_congelan(self):
+        self.tarea(esfuerzo_sp=3)
+        self.client.force_login(self.admin.user)
+        for url in (reverse("dashboard_neusi") + f"?scope=sprint&sprint_id={self.s1.pk}",
+                    reverse("kpi_burndown_page") + f"?sprint_id={self.s1.pk}"):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertFalse(SprintSnapshot.objects.exists())
+
+
+# ==============================
+# Bitácora de estados (user-009)
+# ==============================
+class BitacoraEstadosTests(DatosBase):
+    def test_eventos_y_tiempo_de_ciclo(self):
+        t = self.tarea(asignado=self.ana)
+        b = self.bloque(t, date(2025, 1, 6), date(2025, 1, 10))
+        st = Subtarea.objects.create(bloque=b, titulo="st", responsable=self.ana)
+        for estado in ("EN_PROGRESO", "BLOQUEADO", "COMPLETADO"):
+            t.estado = estado
+            t._actor = self.ana.user
+            t.save()
+        st.estado = "cerrada"
+        st.save()
+
+        eventos = historial_estados(t.pk)
+        self.assertEqual(
+            [(e.entidad, e.estado_anterior, e.estado_nuevo) for e in eventos],
+            [("tarea", "", "NUEVO"), ("subtarea", "", "pendiente"), ("tarea", "NUEVO", "EN_PROGRESO"),
+             ("tarea", "EN_PROGRESO", "BLOQUEADO"), ("tarea", "BLOQUEADO", "COMPLETADO"),
+             ("subtarea", "pendiente", "cerrada")],
+        )
+        self.assertEqual(eventos[2].actor, self.ana.user)
+
+        inicio = timezone.now() - timedelta(days=3)
+        for e, dias in zip(eventos, (0, 0, 0, 1, 3, 3)):
+            EstadoEvento.objects.filter(pk=e.pk).update(ocurrido_en=inicio + timedelta(days=dias))
+        self.assertEqual(tiempo_ciclo(historial_estados(t.pk)), timedelta(days=3))
+
+        t.estado = "EN_PROGRESO"
+        t.save()
+        self.assertIsNone(tiempo_ciclo(historial_estados(t.pk)))
+
+    def test_detalle_muestra_historial(self):
+        t = self.tarea(asignado=self.ana)
+        self.client.force_login(self.admin.user)
+        r = self.client.get(reverse("detalle_tarea", args=[t.pk]))
+        self.assertContains(r, "Historial de estados")
+
+
+# ==============================
+# Lista agrupada: cabeceras agregadas y tareas por grupo (user-015)
+# ==============================
+class ListaAgrupadaTests(DatosBase):
+    def setUp(self):
+        self.client.force_login(self.admin.user)
+
+    def test_cabeceras_en_una_consulta_agregada(self):
+        self.tarea("a", categoria="UI", esfuerzo_sp=3)
+        self.tarea("b", categoria="UI", esfuerzo_sp=5, completada=True)
+        self.tarea("c", sprint=self.s2, categoria="NUI", esfuerzo_sp=8)
+        Tarea.objects.create(titulo="suelta", sprint=self.s2, categoria="UNI")
+
+        grupos = self.client.get(reverse("backlog_lista"), {"group": "epica"}).context["grupos"]
+        # sin orden: dónde quedan los NULL depende del motor
+        self.assertEqual(
+            {g["gid"]: (g["total"], g["abiertas"], g["cerradas"], g["sp"], g["sp_abiertas"]) for g in grupos},
+            {self.epica.pk: (3, 2, 1, 16, 11), "none": (1, 1, 0, 0, 0)},
+        )
+        grupos = self.client.get(reverse("backlog_lista"), {"group": "sprint"}).context["grupos"]
+        self.assertEqual([(g["id"], g["inicio"], g["total"]) for g in grupos],
+                         [(self.s1.pk, self.s1.inicio, 2), (self.s2.pk, self.s2.inicio, 2)])
+
+    def test_tareas_de_un_grupo_por_pagina(self):
+        for i in range(LISTA_PAGINA + 1):
+            self.tarea(f"t{i:02d}", categoria="UI")
+        self.tarea("cerrada", categoria="UI", completada=True)
+        url = reverse("backlog_lista_grupo")
+
+        datos = self.client.get(url, {"group": "epica", "expand": self.epica.pk}).json()
+        self.assertEqual((datos["cantidad"], datos["siguiente"]), (LISTA_PAGINA, 2))
+        datos = self.client.get(url, {"group": "epica", "expand": self.epica.pk, "page": 2}).json()
+        self.assertEqual((datos["cantidad"], datos["siguiente"]), (1, None))
+        self.assertIn(f"t{LISTA_PAGINA:02d}", datos["html"])
+        datos = self.client.get(url, {"group": "epica", "expand": self.epica.pk, "cerradas": "1"}).json()
+        self.assertEqual(datos["cantidad"], 1)
+        self.assertEqual(self.client.get(url, {"group": "epica", "expand": "none"}).json()["cantidad"], 0)
+
+        self.assertEqual(self.client.get(url, {"group": "estado"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"expand": "x"}).status_code, 400)
+
+
+# ==============================
+# Búsqueda de texto (user-016)
+# ==============================
+class BusquedaTests(DatosBase):
+    def setUp(self):
+        # La tabla FTS5 (o la columna tsvector) la crea la migración, no el modelo
+        importlib.import_module("backlog.migrations.0033_tareabusqueda").crear_indice_texto(
+            apps, connection.schema_editor()
+        )
+
+    def buscar(self, integrante, q):
+        self.client.force_login(integrante.user)
+        return self.client.get(reverse("buscar_tareas"), {"q": q}).json()["resultados"]
+
+    def test_documento_al_confirmar_y_relevancia(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            en_titulo = self.tarea("Migración de facturas", asignado=self.ana)
+            en_cuerpo = self.tarea("Reportes", asignado=self.beto, descripcion="antes de la migracion")
+            otra = self.tarea("Sin relación", asignado=self.ana)
+        self.assertEqual([r["id"] for r in self.buscar(self.admin, "MIGRA")], [en_titulo.pk, en_cuerpo.pk])
+        self.assertEqual([r["id"] for r in self.buscar(self.ana, "migración")], [en_titulo.pk])
+        self.assertEqual(self.buscar(self.admin, "m"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Evidencia.objects.create(tarea=otra, comentario="quedó lista la migración")
+        self.assertIn(otra.pk, [r["id"] for r in self.buscar(self.ana, "migracion lista")])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            b = self.bloque(en_cuerpo, date(2025, 1, 6), date(2025, 1, 10))
+            Subtarea.objects.create(bloque=b, titulo="conciliar bancos", responsable=self.beto)
+        resultado, = self.buscar(self.beto, "concil")
+        self.assertEqual(resultado["id"], en_cuerpo.pk)
+        self.assertEqual(resultado["url"], reverse("detalle_tarea", args=[en_cuerpo.pk]))
+
+    def test_motor_sin_indice(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tarea("Migración de facturas")
+        with mock.patch.object(connection, "vendor", "mysql"):
+            self.assertEqual(self.buscar(self.admin, "migracion"), [])
+
+    def test_observacion_del_lote(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            t = self.tarea("Reportes", asignado=self.ana)
+        self.client.force_login(self.ana.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("mover_tareas_lote"), json.dumps({"movimientos": [
+                {"tarea_id": t.pk, "estado": "EN_PROGRESO", "observacion": "zanahoria"},
+            ]}), content_type="application/json")
+        self.assertEqual([r["id"] for r in self.buscar(self.ana, "zanahoria")], [t.pk])
+
+    def test_poblar_documentos(self):
+        t = self.tarea("Título", descripcion="desc", criterios_aceptacion="crit")
+        b = self.bloque(t, date(2025, 1, 6), date(2025, 1, 10))
+        Subtarea.objects.create(bloque=b, titulo="st", descripcion="detalle")
+        Evidencia.objects.create(tarea=t, comentario="evidencia")
+        TareaBusqueda.objects.all().delete()
+
+        importlib.import_module("backlog.migrations.0033_tareabusqueda").poblar_documentos(
+            apps, connection.schema_editor()
+        )
+        doc = TareaBusqueda.objects.get(tarea=t)
+        self.assertEqual(doc.titulo, busqueda.documentos([t.pk])[t.pk][0])
+        self.assertEqual(doc.documento.split(), busqueda.documentos([t.pk])[t.pk][1].split())
+
+
+# ==============================
+# Matriz en una sola pasada y su JSON (user-014)
+# ==============================
+class MatrizTests(DatosBase):
+    def matriz(self, integrante, **params):
+        self.client.force_login(integrante.user)
+        return self.client.get(reverse("backlog_matriz_json"), {"sprint": self.s2.pk, **params}).json()
+
+    def test_cuadrantes_y_resumen(self):
+        with self.captureOnCommitCallbacks(execute=True):  # índice de visibilidad
+            ui = self.tarea("ui", sprint=self.s2, asignado=self.ana, categoria="UI", esfuerzo_sp=3)
+            self.tarea("ui 2", sprint=self.s2, asignado=self.beto, categoria="UI", esfuerzo_sp=5)
+            self.tarea("nuni", sprint=self.s2, asignado=self.ana, categoria="NUNI")
+            self.tarea("cerrada", sprint=self.s2, asignado=self.ana, categoria="NUI", esfuerzo_sp=8,
+                       estado="COMPLETADO", completada=True, terminada=True)
+
+        datos = self.matriz(self.admin)
+        self.assertEqual(datos["resumen"], {"ui": {"total": 2, "sp": 8}, "nui": {"total": 0, "sp": 0},
+                                            "uni": {"total": 0, "sp": 0}, "nuni": {"total": 1, "sp": 0}})
+        self.assertEqual(self.matriz(self.admin, include_closed="1")["resumen"]["nui"], {"total": 1, "sp": 8})
+        self.assertEqual(self.matriz(self.admin, persona=self.beto.pk)["resumen"]["ui"], {"total": 1, "sp": 5})
+
+        propias = self.matriz(self.ana)
+        self.assertEqual([t["id"] for t in propias["ui"]], [ui.pk])
+        self.assertEqual(propias["ui"][0]["asignados"], [{"id": self.ana.pk, "nombre": str(self.ana)}])
+        self.assertEqual(self.matriz(self.ana, persona=self.beto.pk)["resumen"]["ui"]["total"], 1)
+
+    def test_consultas_fijas(self):
+        def consultas():
+            self.client.force_login(self.admin.user)
+            with CaptureQueriesContext(connection) as c:
+                self.client.get(reverse("backlog_matriz_json"), {"sprint": self.s2.pk})
+            return len(c)
+
+        self.tarea("a", sprint=self.s2, asignado=self.ana, categoria="UI")
+        consultas()  # el contexto de autorización queda en caché
+        antes = consultas()
+        for i, categoria in enumerate(("UI", "NUI", "UNI", "NUNI") * 3):
+            self.tarea(f"t{i}", sprint=self.s2, asignado=self.beto, categoria=categoria)
+        self.assertEqual(consultas(), antes)
+
+
+# ==============================
+# Carga del Kanban por columnas (user-011)
+# ==============================
+class KanbanTests(DatosBase):
+    def setUp(self):
+        self.client.force_login(self.admin.user)
+
+    def test_conteos_y_primera_pagina(self):
+        nuevas = [self.tarea(f"n{i}", sprint=self.s2) for i in range(KANBAN_PAGINA + 2)]
+        self.tarea("bloqueada", sprint=self.s2, estado="BLOQUEADO")
+        self.tarea("cerrada", sprint=self.s2, estado="COMPLETADO", completada=True, terminada=True)
+
+        r = self.client.get(reverse("kanban_board"), {"sprint": self.s2.pk})
+        self.assertEqual(r.context["conteos"], {"nuevo": KANBAN_PAGINA + 2, "en_progreso": 0,
+                                                "completado": 0, "bloqueado": 1})
+        self.assertEqual([t.pk for t in r.context["nuevo"]], [t.pk for t in reversed(nuevas)][:KANBAN_PAGINA])
+        self.assertEqual(r.context["hay_mas"], {"nuevo": True, "en_progreso": False,
+                                                "completado": False, "bloqueado": False})
+
+        r = self.client.get(reverse("kanban_board"), {"sprint": self.s2.pk, "include_closed": "1"})
+        self.assertEqual(r.context["conteos"]["completado"], 1)
+
+    def test_paginas_de_una_columna(self):
+        nuevas = [self.tarea(f"n{i}", sprint=self.s2) for i in range(KANBAN_PAGINA + 2)]
+        url = reverse("kanban_columna")
+        datos = self.client.get(url, {"estado": "nuevo", "sprint": self.s2.pk}).json()
+        self.assertEqual((datos["estado"], datos["cantidad"]), ("NUEVO", KANBAN_PAGINA))
+        self.assertEqual(datos["siguiente"], nuevas[2].pk)
+
+        datos = self.client.get(url, {"estado": "NUEVO", "sprint": self.s2.pk,
+                                      "antes_de": datos["siguiente"]}).json()
+        self.assertEqual((datos["cantidad"], datos["siguiente"]), (2, None))
+        self.assertIn(nuevas[0].titulo, datos["html"])
+
+        self.assertEqual(self.client.get(url, {"estado": "VOLANDO"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"estado": "NUEVO", "antes_de": "x"}).status_code, 400)
+
+
+# ==============================
+# Movimientos en lote del Kanban/Matriz (user-012)
+# ==============================
+class MoverTareasLoteTests(DatosBase):
+    def mover(self, integrante, movimientos):
+        self.client.force_login(integrante.user)
+        r = self.client.post(reverse("mover_tareas_lote"), json.dumps({"movimientos": movimientos}),
+                             content_type="application/json")
+        return r.status_code, r.json()
+
+    def test_permisos_y_validacion_por_movimiento(self):
+        propia = self.tarea("propia", asignado=self.ana, categoria="NUNI")
+        ajena = self.tarea("ajena", asignado=self.beto)
+        status, datos = self.mover(self.ana, [
+            {"tarea_id": propia.pk, "estado": "en_progreso", "categoria": "ui", "observacion": "arranco"},
+            {"tarea_id": ajena.pk, "estado": "COMPLETADO"},
+            {"tarea_id": propia.pk, "estado": "VOLANDO"},
+            {"tarea_id": "x"},
+        ])
+        self.assertEqual(status, 200)
+        self.assertEqual(datos["aplicados"], 1)
+        self.assertEqual([r["ok"] for r in datos["resultados"]], [True, False, False, False])
+
+        propia.refresh_from_db()
+        ajena.refresh_from_db()
+        self.assertEqual((propia.estado, propia.categoria), ("EN_PROGRESO", "UI"))
+        self.assertEqual(ajena.estado, "NUEVO")
+        evento = EstadoEvento.objects.filter(tarea_id=propia.pk).exclude(estado_anterior="").get()
+        self.assertEqual((evento.estado_anterior, evento.estado_nuevo), ("NUEVO", "EN_PROGRESO"))
+        self.assertTrue(propia.evidencias.filter(comentario__contains="arranco").exists())
+
+    def test_admin_y_tarea_inexistente(self):
+        t = self.tarea(asignado=self.beto)
+        status, datos = self.mover(self.admin, [{"tarea_id": t.pk, "estado": "COMPLETADO"},
+                                                {"tarea_id": 999999, "categoria": "UI"}])
+        self.assertEqual(datos["resultados"][1], {"tarea_id": 999999, "ok": False, "error": "Tarea no encontrada"})
+        t.refresh_from_db()
+        self.assertEqual((t.estado, t.terminada), ("COMPLETADO", True))
+
+    def test_lote_vacio_o_excedido(self):
+        self.assertEqual(self.mover(self.admin, [])[0], 400)
+        self.assertEqual(self.mover(self.admin, [{"tarea_id": 1, "categoria": "UI"}] * 201)[0], 400)
+
+
+# ==============================
+# Avisos en vivo filtrados por visibilidad (user-013)
+# ==============================
+class FiltroAvisosTests(DatosBase):
+    def setUp(self):
+        cache.clear()
+
+    async def filtro(self, integrante):
+        user = await User.objects.aget(pk=integrante.user_id)
+        return await filtro_visibilidad(await sync_to_async(contexto_usuario)(user))
+
+    async def test_miembro_ve_solo_sus_tareas_y_su_daily(self):
+        def datos():
+            with self.captureOnCommitCallbacks(execute=True):
+                propia = self.tarea("propia", asignado=self.ana)
+                ajena = self.tarea("ajena", asignado=self.beto)
+                bloque = BloqueTarea.objects.create(
+                    tarea=propia, indice=1, fecha_inicio=date(2025, 1, 6), fecha_fin=date(2025, 1, 10)
+                )
+            st = Subtarea.objects.create(bloque=bloque, titulo="st")
+            return propia, ajena, st, self.daily(self.ana, date(2025, 1, 7)), self.daily(self.beto, date(2025, 1, 7))
+
+        propia, ajena, st, d_ana, d_beto = await sync_to_async(datos)()
+        ve = await self.filtro(self.ana)
+        self.assertTrue(await ve(aviso_tarea(propia)))
+        self.assertFalse(await ve(aviso_tarea(ajena)))
+        self.assertTrue(await ve(aviso_subtarea(st)))
+        self.assertTrue(await ve(aviso_daily(d_ana)))
+        self.assertFalse(await ve(aviso_daily(d_beto)))
+
+        # Tarea asignada con la conexión ya abierta
+        def asignar():
+            with self.captureOnCommitCallbacks(execute=True):
+                ajena.asignados.add(self.ana)
+        await sync_to_async(asignar)()
+        self.assertTrue(await ve(aviso_tarea(ajena)))
+
+    async def test_admin_ve_todo(self):
+        self.assertIsNone(await self.filtro(self.admin))
+
+
+# ==============================
+# Contexto de autorización en caché (user-017)
+# ==============================
+class ContextoAutorizacionTests(DatosBase):
+    def setUp(self):
+        cache.clear()
+
+    def contexto(self, integrante):
+        return contexto_usuario(User.objects.get(pk=integrante.user_id))
+
+    def test_segunda_peticion_sin_consultas(self):
+        t = self.tarea(asignado=self.ana)
+        self.assertEqual(self.contexto(self.ana).tareas_responsable, {t.pk})
+        user = User.objects.get(pk=self.ana.user_id)  # la petición siguiente trae su propio User
+        with self.assertNumQueries(0):
+            ctx = contexto_usuario(user)
+            self.assertFalse(ctx.puede_ver_todo)
+            self.assertTrue(ctx.es_responsable(t))
+
+    def test_permisos_invalidan_la_cache(self):
+        visor = crear_integrante("visor", Integrante.ROL_VISUALIZADOR)
+        self.assertEqual(self.contexto(visor).proyectos_ids, frozenset())
+        with self.captureOnCommitCallbacks(execute=True):
+            PermisoProyecto.objects.create(integrante=visor, proyecto=self.proyecto, activo=True)
+        self.assertTrue(self.contexto(visor).ve_proyecto(self.proyecto.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            visor.rol = Integrante.ROL_SM_PO
+            visor.save()
+        self.assertTrue(self.contexto(visor).es_admin)
+
+    def test_asignaciones_invalidan_la_cache(self):
+        t = self.tarea()
+        self.assertEqual(self.contexto(self.beto).tareas_responsable, frozenset())
+        with self.captureOnCommitCallbacks(execute=True):
+            t.asignados.add(self.beto)
+        self.assertEqual(self.contexto(self.beto).tareas_responsable, {t.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            t.asignados.remove(self.beto)
+        self.assertEqual(self.contexto(self.beto).tareas_responsable, frozenset())
+
+
+# ==============================
+# Índice de visibilidad (user-018)
+# ==============================
+class IndiceVisibilidadTests(DatosBase):
+    def indice(self):
+        return set(TareaVisibilidad.objects.values_list("integrante_id", "tarea_id"))
+
+    def test_senales_mantienen_el_indice(self):
+        visor = crear_integrante("visor", Integrante.ROL_VISUALIZADOR)
+        otro = Proyecto.objects.create(codigo="P2", nombre="Proyecto 2")
+        with self.captureOnCommitCallbacks(execute=True):
+            permiso = PermisoProyecto.objects.create(integrante=visor, proyecto=self.proyecto, activo=True)
+            t = self.tarea(asignado=self.ana)
+            t.asignados.add(self.beto)
+        self.assertEqual(self.indice(), visibilidad.filas())
+        self.assertIn((visor.pk, t.pk), self.indice())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.epica.proyecto = otro
+            self.epica.save()
+            t.asignados.remove(self.beto)
+        self.assertEqual(self.indice(), visibilidad.filas())
+        self.assertNotIn((visor.pk, t.pk), self.indice())
+        self.assertNotIn((self.beto.pk, t.pk), self.indice())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            permiso.proyecto = otro
+            permiso.save()
+            self.ana.rol = Integrante.ROL_PO
+            self.ana.save()
+        self.assertEqual(self.indice(), visibilidad.filas())
+        self.assertIn((visor.pk, t.pk), self.indice())
+
+    def test_sincronizar_repara_desvios(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            t = self.tarea(asignado=self.ana)
+        TareaVisibilidad.objects.all().delete()
+        TareaVisibilidad.objects.create(integrante=self.beto, tarea=t)
+
+        self.assertEqual(visibilidad.sincronizar(tarea_ids=[t.pk]), (1, 1))
+        self.assertEqual(self.indice(), {(self.ana.pk, t.pk)})
+        self.assertEqual(visibilidad.sincronizar(), (0, 0))
+
+
+# ==============================
+# Capacidad del sprint (user-023)
+# ==============================
+class CapacidadSprintTests(DatosBase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Festivo.objects.create(fecha=date(2025, 1, 6), nombre="Reyes Magos")
+        # ana: lunes a viernes todo el día (tope de una jornada) las dos semanas de S1
+        for lunes in (date(2025, 1, 6), date(2025, 1, 13)):
+            semana = DisponibilidadSemanal.objects.create(usuario=cls.ana.user, semana_inicio=lunes)
+            semana.ensure_dias()
+            for dia in semana.dias.filter(dia_semana__lt=5):
+                dia.tipo = "D"
+                dia.save()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_horas_sin_festivos_ni_usuarios_sin_registro(self):
+        horas = horas_disponibles([self.ana.user_id, self.beto.user_id], self.s1.inicio, self.s1.fin)
+        self.assertEqual(horas[self.ana.user_id], {"horas": 9 * 8.0, "dias": 9})
+        self.assertEqual(horas[self.beto.user_id], {"horas": 0.0, "dias": 0})
+        dos_dias = horas_disponibles([self.ana.user_id], date(2025, 1, 8), date(2025, 1, 9))
+        self.assertEqual(dos_dias[self.ana.user_id]["dias"], 2)
+
+    def test_sp_repartidos_y_estado(self):
+        compartida = self.tarea("compartida", esfuerzo_sp=6)
+        compartida.asignados.add(self.ana, self.beto)
+        hecha = self.tarea("hecha", esfuerzo_sp=2, estado="COMPLETADO")
+        hecha.asignados.add(self.ana)
+        b = self.bloque(compartida, date(2025, 1, 6), date(2025, 1, 10))
+        Subtarea.objects.create(bloque=b, titulo="st", responsable=self.ana, esfuerzo_sp=1)
+
+        sp = sp_comprometidos(self.s1.pk)
+        self.assertEqual(sp[self.ana.pk], {"sp": 6.0, "sp_pendiente": 4.0})
+        self.assertEqual(sp[self.beto.pk], {"sp": 3.0, "sp_pendiente": 3.0})
+
+        filas = {f["integrante_id"]: f for f in calcular_capacidad(self.s1)["filas"]}
+        self.assertEqual((filas[self.ana.pk]["capacidad_sp"], filas[self.ana.pk]["estado"]), (18.0, "ok"))
+        self.assertEqual((filas[self.beto.pk]["capacidad_sp"], filas[self.beto.pk]["estado"]), (0.0, "sobrecargado"))
+
+
+# ==============================
+# Calendario laboral (user-024)
+# ==============================
+class CalendarioTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("sembrar_festivos", desde=2024, hasta=2026, stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()  # versión "festivos" nueva: recarga la lista del proceso
+
+    def test_festivos_colombia(self):
+        festivos = festivos_colombia(2025)
+        self.assertEqual(len(festivos), 18)
+        self.assertIn((date(2025, 4, 18), "Viernes Santo"), festivos)
+        self.assertIn((date(2025, 1, 6), "Día de los Reyes Magos"), festivos)  # ya era lunes
+        self.assertIn((date(2025, 3, 24), "Día de San José"), festivos)  # 19/03 → lunes siguiente
+        # Sagrado Corazón y San Pedro caen el mismo lunes: una sola fila
+        self.assertEqual(
+            Festivo.objects.get(fecha=date(2025, 6, 30)).nombre, "Sagrado Corazón / San Pedro y San Pablo"
+        )
+
+    def test_dias_habiles_igual_al_conteo_dia_a_dia(self):
+        festivos = set(Festivo.objects.values_list("fecha", flat=True))
+        inicio = date(2024, 12, 20)
+        dias = [inicio + timedelta(days=i) for i in range(400)]
+        for ini in dias[::13]:
+            for fin in dias[::17]:
+                esperado = sum(1 for d in dias if ini <= d <= fin and d.weekday() < 5 and d not in festivos)
+                self.assertEqual(dias_habiles(ini, fin), esperado, (ini, fin))
+        self.assertEqual(dias_habiles(date(2025, 1, 10), date(2025, 1, 9)), 0)
+        self.assertEqual(dias_habiles(None, date(2025, 1, 9)), 0)
+
+    def test_nuevo_festivo_recarga_la_lista(self):
+        dia = date(2025, 2, 12)
+        self.assertTrue(es_habil(dia))
+        with self.captureOnCommitCallbacks(execute=True):
+            Festivo.objects.create(fecha=dia, nombre="Día de la empresa")
+        self.assertFalse(es_habil(dia))
+        self.assertEqual(dias_habiles(date(2025, 2, 10), date(2025, 2, 14)), 4)
+
+
+# ==============================
+# Envío del Daily sobre filas precreadas (user-025)
+# ==============================
+class RegistroDailyTests(DatosBase):
+    def test_precrear_dailies(self):
+        visor = crear_integrante("visor", Integrante.ROL_VISUALIZADOR)
+        inactivo = crear_integrante("inactivo")
+        User.objects.filter(pk=inactivo.user_id).update(is_active=False)
+        self.daily(self.beto, date(2025, 1, 8))
+        fecha = date(2025, 1, 8)
+
+        self.assertEqual(precrear_dailies(fecha, integrante_ids=[self.ana.pk, visor.pk]), 1)
+        self.assertEqual(precrear_dailies(fecha), 1)  # solo falta admin
+        self.assertEqual(precrear_dailies(fecha), 0)
+        filas = Daily.objects.filter(fecha=fecha, registrado=False)
+        self.assertEqual(set(filas.values_list("integrante_id", flat=True)), {self.ana.pk, self.admin.pk})
+        self.assertEqual(set(filas.values_list("sprint_id", flat=True)), {self.s1.pk})
+
+    def test_primer_envio_y_reenvio(self):
+        fecha = date(2025, 1, 8)
+        self.assertIsNone(registrar_daily(self.ana.pk, fecha, time(6, 0), {"que_hara_hoy": "x"}))
+        precrear_dailies(fecha, integrante_ids=[self.ana.pk])
+
+        daily_id = registrar_daily(self.ana.pk, fecha, time(6, 30), {"que_hizo_ayer": "a", "que_hara_hoy": "b"})
+        d = Daily.objects.get(pk=daily_id)
+        self.assertEqual((d.registrado, d.hora, d.fuera_horario, d.que_hara_hoy), (True, time(6, 30), False, "b"))
+
+        self.assertEqual(registrar_daily(self.ana.pk, fecha, time(10, 0), {"que_hara_hoy": "c"}), daily_id)
+        d.refresh_from_db()
+        self.assertEqual((d.hora, d.fuera_horario, d.que_hara_hoy, d.que_hizo_ayer), (time(6, 30), False, "c", ""))
 
-# Create your tests here.
+    def test_vista_sin_fila_precreada(self):
+        self.client.force_login(self.ana.user)
+        r = self.client.post(reverse("daily_personal"), {"que_hizo_ayer": "a", "que_hara_hoy": "b", "impedimentos": ""})
+        self.assertRedirects(r, reverse("daily_resumen"), fetch_redirect_response=False)
+        d = Daily.objects.get(integrante=self.ana)
+        self.assertEqual((d.registrado, d.que_hara_hoy), (True, "b"))
@@ -13,7 +13,10 @@ urlpatterns = [
 
     # 📋 Backlog (lista y matriz)
     path("lista/", views.backlog_lista, name="backlog_lista"),
+    path("lista/grupo/", views.backlog_lista_grupo, name="backlog_lista_grupo"),
+    path("buscar/", views.buscar_tareas, name="buscar_tareas"),
     path("matriz/", views.backlog_matriz, name="backlog_matriz"),
+    path("matriz/json/", views.backlog_matriz_json, name="backlog_matriz_json"),
 
     # ✅ Tareas
     path("nueva/", views.nueva_tarea, name="nueva_tarea"),  # Crear tarea
@@ -89,7 +92,9 @@ urlpatterns = [
     
     # Páginas HTML (con selects por NOMBRE)
     path("kpis/individual/page/", views.kpi_individual_page, name="kpi_individual_page"),
+    path("kpis/cache/stats/", views.cache_stats, name="cache_stats"),
     path("kpis/individual/burndown/page/", views.kpi_burndown_page, name="kpi_burndown_page"),
+    path("kpis/individual/burndown/json/", views.kpi_burndown_json, name="kpi_burndown_json"),
     path("kpis/individual/esfuerzo/page/", views.kpi_esfuerzo_page, name="kpi_esfuerzo_page"),
         # Alias para lo que ya tienes en los botones (evita 404)
     path(
@@ -102,10 +107,15 @@ urlpatterns = [
     path("sprints/nuevo/", views.sprint_create, name="sprint_create"),
     path("sprints/<int:sprint_id>/editar/", views.sprint_edit, name="sprint_edit"),
     path("sprints/<int:sprint_id>/eliminar/", views.sprint_delete, name="sprint_delete"),
+    path("sprints/capacidad/", views.capacidad_sprint_page, name="capacidad_sprint"),
+    path("sprints/capacidad/json/", views.capacidad_sprint_json, name="capacidad_sprint_json"),
 
     # 📊 Kanban Board
     path("kanban/", views.kanban_board, name="kanban_board"),
+    path("kanban/columna/", views.kanban_columna, name="kanban_columna"),
     path("tarea/<int:tarea_id>/cambiar-estado/", views.cambiar_estado_tarea, name="cambiar_estado_tarea"),
+    path("tareas/mover-lote/", views.mover_tareas_lote, name="mover_tareas_lote"),
+    path("eventos/stream/", views.eventos_stream, name="eventos_stream"),
 
     # 🧱 Épicas
     path("epicas/", views.epica_list, name="epica_list"),
@@ -2,13 +2,19 @@
 from functools import wraps
 from datetime import time, datetime, timedelta
 import json
-from django.views.decorators.cache import cache_page
+from asgiref.sync import sync_to_async
+from .autorizacion import contexto_de, contexto_integrante
+from .busqueda import buscar, reindexar_al_confirmar
+from .cache_datos import alcances_tarea, cache_por_version, estadisticas, invalidar
+from .eventos_vivo import aviso_daily, aviso_tarea, avisar, filtro_visibilidad, flujo_sse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.utils.timezone import localtime, now
 from django.db.models import Q, Count
 from django.core.paginator import Paginator
@@ -19,7 +25,7 @@ from django.utils.timezone import localtime
 from django.db import transaction
 from .models import (
     Tarea, Sprint, Integrante, Daily, Evidencia, Epica, Proyecto,
-    BloqueTarea, Subtarea,EvidenciaSubtarea
+    BloqueTarea, Subtarea,EvidenciaSubtarea, TareaAsignacion, EstadoEvento,
 )
 from .forms import (
     TareaForm, DailyForm, EvidenciaForm, SprintForm, EpicaForm, ProyectoForm,
@@ -39,23 +45,14 @@ def en_ventana_daily(hora):
 
 def _flags_usuario(request):
     """
-    Devuelve:
+    Devuelve (del contexto de autorización de la petición, ver autorizacion.py):
       - integrante: Integrante|None (auto-creado si falta)
       - puede_admin: bool (roles admin)
       - es_visualizador: bool (roles visualización global por proyecto)
       - puede_ver_todo: bool (admin o visualizador)
     """
-    integrante = getattr(request.user, "integrante", None)
-    if request.user.is_authenticated and integrante is None:
-        integrante, _ = Integrante.objects.get_or_create(
-            user=request.user,
-            defaults={'rol': Integrante.ROL_MIEMBRO}
-        )
-
-    puede_admin = bool(integrante and integrante.es_admin())
-    es_visualizador = bool(integrante and integrante.es_visualizador())
-    puede_ver_todo = bool(puede_admin or es_visualizador)
-    return integrante, puede_admin, es_visualizador, puede_ver_todo
+    ctx = contexto_de(request)
+    return ctx.integrante, ctx.es_admin, ctx.es_visualizador, ctx.puede_ver_todo
 
 
 def _sync_subtareas_fechas(bloque: BloqueTarea):
@@ -74,44 +71,21 @@ def _sync_subtareas_fechas(bloque: BloqueTarea):
 # ==============================
 
 def _proyectos_autorizados_qs(integrante: Integrante):
-    if not integrante:
-        return Proyecto.objects.none()
-    if integrante.es_admin():
-        return Proyecto.objects.all()
-    if integrante.es_visualizador():
-        return Proyecto.objects.filter(
-            permisos_integrantes__integrante=integrante,
-            permisos_integrantes__activo=True,
-            activo=True
-        ).distinct()
-    return Proyecto.objects.none()
-
-def _filtrar_por_proyectos_autorizados_tareas(qs, integrante: Integrante):
-    if not integrante or not integrante.es_visualizador():
-        return qs
-    proys = _proyectos_autorizados_qs(integrante)
-    if not proys.exists():
-        return qs.none()
-    return qs.filter(epica__proyecto__in=proys).distinct()
+    return contexto_integrante(integrante).proyectos_qs()
 
 def _filtrar_por_proyectos_autorizados_epicas(qs, integrante: Integrante):
-    if not integrante or not integrante.es_visualizador():
+    ctx = contexto_integrante(integrante)
+    if not ctx.es_visualizador:
         return qs
-    proys = _proyectos_autorizados_qs(integrante)
-    if not proys.exists():
+    if not ctx.proyectos_ids:
         return qs.none()
-    return qs.filter(proyecto__in=proys).distinct()
+    return qs.filter(proyecto_id__in=ctx.proyectos_ids)
 
 def _es_admin(request):
-    integrante = getattr(request.user, "integrante", None)
-    return bool(integrante and integrante.es_admin())
+    return contexto_de(request).es_admin
 
 def _es_responsable(tarea: Tarea, integrante: Integrante) -> bool:
-    if not integrante:
-        return False
-    if tarea.asignado_a_id == getattr(integrante, "id", None):
-        return True
-    return tarea.asignados.filter(id=integrante.id).exists()
+    return contexto_integrante(integrante).es_responsable(tarea)
 
 # === Conjunto de roles "administrativos" ===
 ADMIN_ROLES = {
@@ -145,13 +119,11 @@ def _queryset_visible_tareas(integrante: Integrante, puede_ver_todo: bool):
     if not integrante:
         return Tarea.objects.none()
 
-    if integrante.es_admin():
+    if contexto_integrante(integrante).es_admin:
         return base
 
-    if integrante.es_visualizador():
-        return _filtrar_por_proyectos_autorizados_tareas(base, integrante)
-
-    return base.filter(Q(asignados=integrante) | Q(asignado_a=integrante)).distinct()
+    # Visualizador (proyectos autorizados) o miembro (asignadas): índice TareaVisibilidad
+    return base.visibles_para(integrante)
 
 # ==============================
 # Decoradores de permisos
@@ -220,12 +192,15 @@ def editar_tarea(request, tarea_id):
         ok_set  = True if formset is None else formset.is_valid()
 
         if ok_form and ok_set:
-            form.save()
-            if formset:
-                formset.save()
-                # sincronizar fechas de subtareas con cada bloque actualizado
-                for b in tarea.bloques.all():
-                    _sync_subtareas_fechas(b)
+            with transaction.atomic():
+                form.instance._actor = request.user
+                form.save()
+                if formset:
+                    formset.save()
+                    # sincronizar fechas de subtareas con cada bloque actualizado
+                    # (ventana y alineación: señales de BloqueTarea al confirmar)
+                    for b in tarea.bloques.all():
+                        _sync_subtareas_fechas(b)
             messages.success(request, "✅ Cambios guardados correctamente.")
             return redirect("detalle_tarea", tarea_id=tarea.id)
         else:
@@ -268,19 +243,26 @@ def nueva_tarea(request):
             tarea.es_macro = True
         if hasattr(tarea, "creada_por") and hasattr(request.user, "integrante"):
             tarea.creada_por = request.user.integrante
-        tarea.save()
-        form.save_m2m()
+        tarea._actor = request.user
 
-        formset = BloqueFormSet(request.POST, prefix="bloques", instance=tarea)
-        all_empty = all(f.empty_permitted and not f.has_changed() for f in formset.forms)
+        # Tarea y bloques en la misma transacción (ventana: señal de BloqueTarea)
+        with transaction.atomic():
+            tarea.save()
+            form.save_m2m()
 
-        if formset.is_valid():
-            if not all_empty:
+            formset = BloqueFormSet(request.POST, prefix="bloques", instance=tarea)
+            all_empty = all(f.empty_permitted and not f.has_changed() for f in formset.forms)
+            ok_set = formset.is_valid()
+            if ok_set and not all_empty:
                 formset.save()
+            if not ok_set:
+                transaction.set_rollback(True)
+
+        if ok_set:
             messages.success(request, "✅ Tarea creada correctamente.")
             return redirect("detalle_tarea", tarea_id=tarea.id)
 
-        tarea.delete()
+        tarea.pk = None  # revertida con la transacción
         messages.error(request, "⚠️ Corrige los errores en los bloques.")
         return render(request, "backlog/nueva_tarea.html", {"form": form, "formset": formset})
 
@@ -305,9 +287,15 @@ def detalle_tarea(request, tarea_id):
     puede_editar = bool(es_admin or es_responsable or (integrante and integrante.puede_editar_tareas()))
     puede_cerrar = bool(es_admin or es_responsable)
 
+    # Bitácora EstadoEvento: historial de estados y tiempo de ciclo
+    historial = historial_estados(tarea.id)
+    ciclo = tiempo_ciclo(historial)
+
     return render(request, "backlog/detalle_tarea.html", {
         "tarea": tarea,
         "evidencias": evidencias,
+        "historial": historial,
+        "ciclo_dias": round(ciclo.total_seconds() / 86400, 1) if ciclo is not None else None,
         "form": form,
         "tiene_permisos_admin": es_admin,
         "es_admin": es_admin,                 # <-- para templates que usen esta clave
@@ -410,10 +398,13 @@ def cerrar_tarea(request, tarea_id):
         elif confirmacion != "confirmo":
             messages.error(request, "❌ Debes confirmar el cierre de la tarea.")
         else:
+            tarea.estado = "COMPLETADO"
             tarea.completada = True
             tarea.fecha_cierre = now()
             tarea.informe_cierre = informe
-            tarea.save()
+            tarea._actor = request.user
+            with transaction.atomic():
+                tarea.save()
             messages.success(request, f"✅ La tarea '{tarea.titulo}' fue cerrada.")
             return redirect("backlog_lista")
 
@@ -476,7 +467,7 @@ from django.utils.timezone import localtime
 from django.views.decorators.http import require_http_methods, require_POST
 
 # Modelos usados en este bloque
-from .models import Daily, DailyItem, Integrante, Tarea
+from .models import Daily, DailyItem, Integrante, Tarea, registrar_daily, sprint_de
 # Nota: este bloque usa helpers definidos en tu archivo:
 #   - en_ventana_daily(hora)
 #   - _flags_usuario(request)
@@ -495,6 +486,27 @@ def _get_or_create_today_daily(integrante):
     return daily
 
 
+def _guardar_daily(integrante_id, fecha, hora, campos):
+    """
+    Guarda el envío del daily y devuelve su id. Camino normal: UPDATE ... RETURNING
+    sobre la fila precreada (manage.py precrear_dailies), sin leerla antes. Si no
+    existe (integrante nuevo, día sin precreación) se crea como antes.
+    """
+    daily_id = registrar_daily(integrante_id, fecha, hora, campos)
+    if daily_id is None:
+        daily, created = Daily.objects.get_or_create(
+            integrante_id=integrante_id, fecha=fecha,
+            defaults={**campos, "hora": hora, "sprint_id": sprint_de(fecha)},
+        )
+        if created:
+            return daily.pk  # post_save ya invalidó y avisó
+        daily_id = registrar_daily(integrante_id, fecha, hora, campos)  # otro envío la creó primero
+    # El UPDATE no dispara post_save: lo que harían las señales de Daily
+    invalidar("daily")
+    avisar(aviso_daily(Daily(pk=daily_id, integrante_id=integrante_id, fecha=fecha)))
+    return daily_id
+
+
 @login_required
 def daily_view(request, integrante_id=None):
     _, es_admin, es_visualizador, _ = _flags_usuario(request)
@@ -511,7 +523,7 @@ def daily_view(request, integrante_id=None):
             return redirect("home")
     else:
         integrante = get_object_or_404(Integrante, id=integrante_id)
-        if integrante.user != request.user and not es_admin:
+        if integrante.user_id != request.user.id and not es_admin:
             messages.error(request, "❌ Solo puedes registrar tu propio daily.")
             return redirect("daily_personal")
 
@@ -521,19 +533,8 @@ def daily_view(request, integrante_id=None):
     if request.method == "POST":
         form = DailyForm(request.POST)
         if form.is_valid():
-            # 1) crear/actualizar cabecera
-            daily, created = Daily.objects.get_or_create(
-                integrante=integrante,
-                fecha=fecha_actual,
-                defaults=form.cleaned_data
-            )
-            if not created:
-                for f, v in form.cleaned_data.items():
-                    setattr(daily, f, v)
-
-            # fuera de horario
-            daily.fuera_horario = not en_ventana_daily(hora_actual)
-            daily.save()
+            # 1) crear/actualizar cabecera (fuera_horario según la hora del primer envío)
+            daily_id = _guardar_daily(integrante.id, fecha_actual, hora_actual, form.cleaned_data)
 
             # 2) si enviaron enlace de tarea/subtarea, crear la línea HOY
             link_tipo   = (request.POST.get("link_tipo") or "").lower()
@@ -550,13 +551,13 @@ def daily_view(request, integrante_id=None):
             try:
                 if link_tipo == "tarea" and tarea_id:
                     DailyItem.objects.create(
-                        daily=daily, tipo="HOY",
+                        daily_id=daily_id, tipo="HOY",
                         descripcion=descripcion_hoy,
                         tarea_id=int(tarea_id)
                     )
                 elif link_tipo == "subtarea" and subtarea_id:
                     DailyItem.objects.create(
-                        daily=daily, tipo="HOY",
+                        daily_id=daily_id, tipo="HOY",
                         descripcion=descripcion_hoy,
                         subtarea_id=int(subtarea_id)
                     )
@@ -607,7 +608,7 @@ def daily_resumen(request):
 
     if not puede_filtrar:
         registros = Daily.objects.filter(
-            integrante=integrante, fecha__gte=fecha_limite
+            integrante=integrante, fecha__gte=fecha_limite, registrado=True
         ).select_related("integrante__user", "sprint").order_by("-fecha") if integrante else Daily.objects.none()
         integrantes = []
         persona_id = None
@@ -615,7 +616,7 @@ def daily_resumen(request):
         if es_admin:
             registros = Daily.objects.select_related(
                 "integrante__user", "sprint"
-            ).filter(fecha__gte=fecha_limite).order_by("-fecha")
+            ).filter(fecha__gte=fecha_limite, registrado=True).order_by("-fecha")
             integrantes = Integrante.objects.select_related("user").all().order_by("user__first_name", "user__last_name")
         else:
             proyectos = _proyectos_autorizados_qs(integrante)
@@ -623,13 +624,11 @@ def daily_resumen(request):
                 registros = Daily.objects.none()
                 integrantes = []
             else:
-                ids_legacy = Tarea.objects.filter(epica__proyecto__in=proyectos).values_list("asignado_a_id", flat=True)
-                ids_m2m = Tarea.objects.filter(epica__proyecto__in=proyectos).values_list("asignados__id", flat=True)
-                ids_integrantes = {i for i in list(ids_legacy) + list(ids_m2m) if i is not None}
+                ids_integrantes = Tarea.objects.filter(epica__proyecto__in=proyectos).ids_asignados()
 
                 registros = Daily.objects.select_related(
                     "integrante__user", "sprint"
-                ).filter(integrante_id__in=ids_integrantes, fecha__gte=fecha_limite).order_by("-fecha")
+                ).filter(integrante_id__in=ids_integrantes, fecha__gte=fecha_limite, registrado=True).order_by("-fecha")
                 integrantes = Integrante.objects.select_related("user").filter(
                     id__in=ids_integrantes
                 ).order_by("user__first_name", "user__last_name")
@@ -642,13 +641,6 @@ def daily_resumen(request):
             except (ValueError, Integrante.DoesNotExist):
                 pass
 
-    # === Añadir métricas de alineación para visualización ===
-    for d in registros:
-        try:
-            d.metricas = d.alineacion
-        except Exception:
-            d.metricas = {'porcentaje': 0, 'alineados': 0, 'no_alineados': 0, 'total': 0, 'ids_no_alineados': []}
-
     return render(request, "backlog/daily_resumen.html", {
         "registros": registros,
         "integrantes": integrantes,
@@ -696,7 +688,9 @@ def dailyitem_create(request, daily_id):
     if subtarea_id:
         kwargs["subtarea_id"] = subtarea_id
 
-    item = DailyItem.objects.create(**kwargs)
+    # La señal post_save recalcula la alineación del daily en la misma transacción
+    with transaction.atomic():
+        item = DailyItem.objects.create(**kwargs)
     return JsonResponse({"success": True, "item": {"id": item.id, "tipo": item.tipo, "descripcion": item.descripcion}})
 
 
@@ -742,7 +736,8 @@ def dailyitem_edit(request, item_id):
     if item.tarea_id and item.subtarea_id:
         return JsonResponse({"error": "Seleccione solo Tarea o Subtarea (no ambas)."}, status=400)
 
-    item.save()
+    with transaction.atomic():
+        item.save()
     return JsonResponse({"success": True})
 
 
@@ -754,7 +749,8 @@ def dailyitem_delete(request, item_id):
     if not owner or (owner.id != item.daily.integrante_id and not owner.es_admin()):
         return JsonResponse({"error": "Sin permisos para eliminar esta línea."}, status=403)
 
-    item.delete()
+    with transaction.atomic():
+        item.delete()
     return JsonResponse({"success": True})
 
 
@@ -836,8 +832,8 @@ def reporte_enlaces_daily(request):
             pass
 
     if not include_closed:
-        base = base.exclude(Q(tarea__estado="COMPLETADO") | Q(tarea__completada=True))
-        base = base.exclude(Q(subtarea__estado="cerrada") | Q(subtarea__estado="COMPLETADO"))
+        base = base.exclude(Q(tarea__terminada=True) | Q(tarea__completada=True))
+        base = base.exclude(subtarea__estado="cerrada")
 
     # ---- Agrupación por objetivo (tarea/subtarea) ----
     grupos = {}
@@ -931,13 +927,10 @@ def daily_tareas_opciones(request):
 
     qs = (
         Tarea.objects
-        .filter(
-            Q(asignado_a=integrante) | Q(asignados=integrante),
-            completada=False
-        )
-        .exclude(estado="COMPLETADO")
+        .asignadas_a(integrante)
+        .filter(completada=False)
+        .exclude(terminada=True)
         .select_related("sprint", "epica")
-        .distinct()
         .order_by("sprint__inicio", "titulo")
         .values("id", "titulo")
     )
@@ -970,44 +963,26 @@ def daily_subtareas_opciones(request):
 # ==============================
 # Backlog
 # ==============================
-@login_required
-def backlog_lista(request):
-    integrante, tiene_permisos_admin, es_visualizador, puede_ver_todo = _flags_usuario(request)
-
-    group_by  = request.GET.get("group", "epica")
-    expand_id = request.GET.get("expand")
-
-    tareas = (
-        _queryset_visible_tareas(integrante, puede_ver_todo)
-        .select_related("sprint", "epica", "epica__proyecto")
-        .prefetch_related("asignados__user")
-    )
-
-    sprints = Sprint.objects.all().order_by("inicio")
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.template.loader import render_to_string
+
+LISTA_PAGINA = 25
+
+# Agrupación de la lista: campo del grupo, campos de la cabecera y orden de las tareas
+LISTA_GRUPOS = {
+    "proyecto": ("epica__proyecto_id", ("epica__proyecto__nombre",),
+                 ("epica__proyecto__nombre", "sprint__inicio", "categoria", "titulo")),
+    "epica":    ("epica_id", ("epica__titulo",),
+                 ("epica__titulo", "sprint__inicio", "categoria", "titulo")),
+    "sprint":   ("sprint_id", ("sprint__inicio", "sprint__fin"),
+                 ("sprint__inicio", "categoria", "titulo")),
+}
 
-    if puede_ver_todo:
-        ids_a = tareas.values_list("asignado_a_id", flat=True)
-        ids_m = tareas.values_list("asignados__id", flat=True)
-        ids_set = {i for i in list(ids_a) + list(ids_m) if i is not None}
-        integrantes = (
-            Integrante.objects
-            .select_related("user")
-            .filter(id__in=ids_set) if es_visualizador else
-            Integrante.objects.select_related("user").all()
-        )
-        integrantes = integrantes.order_by("user__first_name", "user__last_name").distinct()
 
-        epicas = Epica.objects.filter(tareas__isnull=False).distinct().order_by("titulo")
-        if es_visualizador:
-            epicas = _filtrar_por_proyectos_autorizados_epicas(epicas, integrante)
-    else:
-        integrantes = []
-        epicas = (
-            Epica.objects
-            .filter(Q(tareas__asignados=integrante) | Q(tareas__asignado_a=integrante))
-            .distinct()
-            .order_by("titulo")
-        )
+def _lista_filtrar(request, integrante, puede_ver_todo):
+    """Tareas visibles de la lista según los filtros GET (filtrar=1) + los filtros normalizados."""
+    tareas = _queryset_visible_tareas(integrante, puede_ver_todo)
 
     aplicar_filtros = request.GET.get("filtrar") == "1"
     persona_id = request.GET.get("persona") if aplicar_filtros else None
@@ -1019,7 +994,7 @@ def backlog_lista(request):
         if persona_id:
             try:
                 pid = int(persona_id)
-                tareas = tareas.filter(Q(asignados__id=pid) | Q(asignado_a__id=pid)).distinct()
+                tareas = tareas.asignadas_a(pid)
             except ValueError:
                 pass
         if sprint_id:
@@ -1037,39 +1012,101 @@ def backlog_lista(request):
         elif estado == "cerradas":
             tareas = tareas.filter(completada=True)
 
-    if group_by == "proyecto":
-        tareas = tareas.order_by("epica__proyecto__nombre", "sprint__inicio", "categoria", "titulo")
-    elif group_by == "epica":
-        tareas = tareas.order_by("epica__titulo", "sprint__inicio", "categoria", "titulo")
-    elif group_by == "sprint":
-        tareas = tareas.order_by("sprint__inicio", "categoria", "titulo")
+    filtros = dict(
+        estado=estado or "", persona_id=persona_id or "",
+        sprint_id=sprint_id or "", epica_id=epica_id or "",
+    )
+    return tareas, filtros
+
+
+def _lista_grupos(tareas, group_by):
+    """
+    Cabeceras de la lista agrupada en una sola consulta agregada: por grupo,
+    total de tareas, abiertas/cerradas y SP (totales y abiertos). Las tareas de
+    cada grupo se piden aparte, por página, con backlog_lista_grupo.
+    """
+    campo, etiquetas, _ = LISTA_GRUPOS[group_by]
+    filas = (
+        tareas.prefetch_related(None)
+        .order_by()
+        .values(campo, *etiquetas)
+        .annotate(
+            total=Count("id"),
+            abiertas=Count("id", filter=Q(completada=False)),
+            cerradas=Count("id", filter=Q(completada=True)),
+            sp=Coalesce(Sum("esfuerzo_sp"), 0),
+            sp_abiertas=Coalesce(Sum("esfuerzo_sp", filter=Q(completada=False)), 0),
+        )
+        .order_by(*etiquetas)
+    )
+    return [
+        {
+            "id": f[campo],
+            "gid": f[campo] if f[campo] is not None else "none",
+            "nombre": f.get("epica__proyecto__nombre") or f.get("epica__titulo"),
+            "inicio": f.get("sprint__inicio"),
+            "fin": f.get("sprint__fin"),
+            **{k: f[k] for k in ("total", "abiertas", "cerradas", "sp", "sp_abiertas")},
+        }
+        for f in filas
+    ]
+
+
+@login_required
+def backlog_lista(request):
+    integrante, tiene_permisos_admin, es_visualizador, puede_ver_todo = _flags_usuario(request)
+
+    group_by  = request.GET.get("group", "epica")
+    expand_id = request.GET.get("expand")
+
+    tareas, filtros = _lista_filtrar(request, integrante, puede_ver_todo)
+
+    sprints = Sprint.objects.all().order_by("inicio")
+
+    if puede_ver_todo:
+        integrantes = (
+            Integrante.objects
+            .select_related("user")
+            .filter(id__in=_queryset_visible_tareas(integrante, puede_ver_todo).ids_asignados()) if es_visualizador else
+            Integrante.objects.select_related("user").all()
+        )
+        integrantes = integrantes.order_by("user__first_name", "user__last_name")
+
+        epicas = Epica.objects.filter(tareas__isnull=False).distinct().order_by("titulo")
+        if es_visualizador:
+            epicas = _filtrar_por_proyectos_autorizados_epicas(epicas, integrante)
     else:
-        tareas = tareas.order_by("sprint__inicio", "categoria", "titulo")
+        integrantes = []
+        epicas = (
+            Epica.objects
+            .filter(id__in=Tarea.objects.asignadas_a(integrante).values("epica_id"))
+            .order_by("titulo")
+        )
 
-    grouped = None
+    grupos = None
     paginator = None
-    PAGE_SIZE = 25
-
-    if group_by in ("proyecto", "epica", "sprint"):
-        grouped = {}
-        for t in tareas:
-            if group_by == "proyecto":
-                k = t.epica.proyecto if (t.epica and hasattr(t.epica, "proyecto")) else None
-            elif group_by == "epica":
-                k = t.epica
-            else:
-                k = t.sprint
-            grouped.setdefault(k, []).append(t)
+    consulta_grupo = ""
+
+    if group_by in LISTA_GRUPOS:
+        # Solo cabeceras; las tareas de un grupo se cargan al expandirlo (backlog_lista_grupo)
+        grupos = _lista_grupos(tareas, group_by)
+        consulta = request.GET.copy()
+        for k in ("expand", "page", "cerradas"):
+            consulta.pop(k, None)
+        consulta["group"] = group_by
+        consulta_grupo = consulta.urlencode()
     else:
-        paginator = Paginator(tareas, PAGE_SIZE)
+        tareas = tareas.order_by("sprint__inicio", "categoria", "titulo")
+        paginator = Paginator(tareas, LISTA_PAGINA)
         page_number = request.GET.get("page")
         tareas = paginator.get_page(page_number)
 
     return render(request, "backlog/backlog_lista.html", {
         "tareas": tareas,
-        "grouped": grouped,
+        "grupos": grupos,
         "group_by": group_by,
         "expand_id": expand_id,
+        "consulta_grupo": consulta_grupo,
         "paginator": paginator,
         "sprints": sprints,
         "integrantes": integrantes,
@@ -1077,10 +1114,85 @@ def backlog_lista(request):
         "tiene_permisos_admin": tiene_permisos_admin,
         "puede_ver_todo": puede_ver_todo,
         "es_visualizador": es_visualizador,
-        "estado": estado if aplicar_filtros else "",
-        "persona_id": persona_id if aplicar_filtros else "",
-        "sprint_id": sprint_id if aplicar_filtros else "",
-        "epica_id": epica_id if aplicar_filtros else "",
+        **filtros,
+    })
+
+
+@login_required
+@require_GET
+def backlog_lista_grupo(request):
+    """
+    Tareas de un grupo de la lista, por página (mismos filtros GET que backlog_lista).
+    ?group=epica&expand=<id del grupo | none>&cerradas=0|1&page=N
+    """
+    integrante, tiene_permisos_admin, _, puede_ver_todo = _flags_usuario(request)
+    group_by = request.GET.get("group", "epica")
+    if group_by not in LISTA_GRUPOS:
+        return JsonResponse({"error": "Agrupación no válida"}, status=400)
+    campo, _, orden = LISTA_GRUPOS[group_by]
+
+    expand = request.GET.get("expand") or ""
+    cerradas = request.GET.get("cerradas") == "1"
+    try:
+        page = max(int(request.GET.get("page") or 1), 1)
+    except ValueError:
+        return JsonResponse({"error": "page debe ser numérico"}, status=400)
+
+    tareas, _ = _lista_filtrar(request, integrante, puede_ver_todo)
+    if expand == "none":
+        tareas = tareas.filter(**{f"{campo}__isnull": True})
+    else:
+        try:
+            tareas = tareas.filter(**{campo: int(expand)})
+        except ValueError:
+            return JsonResponse({"error": "expand debe ser el id del grupo o 'none'"}, status=400)
+
+    inicio = (page - 1) * LISTA_PAGINA
+    pagina = list(tareas.filter(completada=cerradas).order_by(*orden, "id")[inicio:inicio + LISTA_PAGINA + 1])
+    hay_mas = len(pagina) > LISTA_PAGINA
+    pagina = pagina[:LISTA_PAGINA]
+
+    html = render_to_string("backlog/backlog_lista_tarjetas.html", {
+        "tareas": pagina,
+        "cerradas": cerradas,
+        "tiene_permisos_admin": tiene_permisos_admin,
+    }, request=request)
+    return JsonResponse({
+        "html": html,
+        "cantidad": len(pagina),
+        "siguiente": page + 1 if hay_mas else None,
+    })
+
+@login_required
+@require_GET
+def buscar_tareas(request):
+    """
+    Búsqueda de texto en el backlog (?q=...): título, épica, descripción, criterios,
+    bloques, subtareas y evidencias. Solo entre las tareas que el usuario puede ver,
+    ordenadas por relevancia (ver busqueda.py).
+    """
+    integrante, _, _, puede_ver_todo = _flags_usuario(request)
+    texto = (request.GET.get("q") or "").strip()
+    if len(texto) < 2:
+        return JsonResponse({"q": texto, "resultados": []})
+
+    tareas = _queryset_visible_tareas(integrante, puede_ver_todo).prefetch_related(None)
+    resultados = buscar(texto, tareas)
+    return JsonResponse({
+        "q": texto,
+        "resultados": [
+            {
+                "id": t.id,
+                "titulo": t.titulo,
+                "epica": t.epica.titulo if t.epica else None,
+                "estado": t.estado,
+                "categoria": t.categoria,
+                "sprint": str(t.sprint) if t.sprint_id else None,
+                "url": reverse("detalle_tarea", args=[t.id]),
+                "rango": round(t.rango, 4),
+            }
+            for t in resultados
+        ],
     })
 
 #===========MATRIZ HZ================
@@ -1099,7 +1211,7 @@ def _activos_por_defecto(qs, include_closed: bool, show_old: bool, sprint_id: st
     limite = today - timezone.timedelta(days=2)
 
     if not include_closed:
-        qs = qs.exclude(estado="COMPLETADO").exclude(completada=True)
+        qs = qs.exclude(terminada=True).exclude(completada=True)
 
     if sprint_id:
         qs = qs.filter(sprint_id=sprint_id)
@@ -1110,16 +1222,17 @@ def _activos_por_defecto(qs, include_closed: bool, show_old: bool, sprint_id: st
     return qs.select_related("epica", "asignado_a", "sprint").order_by("-id")
 
 
-@login_required
-def backlog_matriz(request):
-    """
-    Matriz Eisenhower (UI / NUI / UNI / NUNI).
-    - Usuarios no admin: solo ven sus tareas (asignado_a o en M2M asignados).
-    - Visualizadores: ven lo autorizado por proyecto.
-    - Admin: ven todo y pueden filtrar por persona.
-    """
-    integrante, es_admin, es_visualizador, puede_ver_todo = _flags_usuario(request)
+# Cuadrantes en el orden en que se pintan (clave de categoría, título)
+MATRIZ_CUADRANTES = [
+    ("UI",   "🔥 Urgente e Importante"),
+    ("NUI",  "📊 No Urgente e Importante"),
+    ("UNI",  "⚡ Urgente y No Importante"),
+    ("NUNI", "🏝 No Urgente y No Importante"),
+]
 
+
+def _matriz_filtrar(request, integrante, es_admin, es_visualizador, puede_ver_todo):
+    """Tareas visibles de la matriz según los filtros GET + los filtros normalizados."""
     include_closed = request.GET.get("include_closed") == "1"
     show_old       = request.GET.get("show_old") == "1"
     sprint_id      = request.GET.get("sprint") or ""
@@ -1135,48 +1248,108 @@ def backlog_matriz(request):
     if (es_admin or es_visualizador) and persona_id:
         try:
             pid = int(persona_id)
-            base = base.filter(Q(asignado_a_id=pid) | Q(asignados__id=pid)).distinct()
+            base = base.asignadas_a(pid)
         except ValueError:
             pass
 
-    # Cuadrantes
-    ui   = base.filter(categoria="UI")
-    nui  = base.filter(categoria="NUI")
-    uni  = base.filter(categoria="UNI")
-    nuni = base.filter(categoria="NUNI")
+    filtros = dict(
+        persona_id=persona_id if (es_admin or es_visualizador) else "",
+        sprint_id=sprint_id, include_closed=include_closed, show_old=show_old,
+    )
+    return base, filtros
+
+
+def _materializar_matriz(base):
+    """
+    Evalúa la matriz una sola vez: 1 consulta de tareas (con épica, sprint y
+    asignado_a__user) + 1 prefetch de asignados__user, repartidas por categoría
+    en memoria. Devuelve la lista de cuadrantes con sus tareas, conteo y SP, y
+    los ids de los integrantes asignados (para el combo de personas).
+    """
+    por_categoria = {clave: [] for clave, _ in MATRIZ_CUADRANTES}
+    ids_asignados = set()
+    for t in base.prefetch_related("asignados__user"):
+        if t.categoria in por_categoria:
+            por_categoria[t.categoria].append(t)
+        ids_asignados.update(i.id for i in t.asignados.all())
+
+    cuadrantes = [
+        {
+            "clave": clave.lower(),
+            "titulo": titulo,
+            "tareas": por_categoria[clave],
+            "total": len(por_categoria[clave]),
+            "sp": sum(t.esfuerzo_sp or 0 for t in por_categoria[clave]),
+        }
+        for clave, titulo in MATRIZ_CUADRANTES
+    ]
+    return cuadrantes, ids_asignados
+
+
+@login_required
+def backlog_matriz(request):
+    """
+    Matriz Eisenhower (UI / NUI / UNI / NUNI).
+    - Usuarios no admin: solo ven sus tareas (asignado_a o en M2M asignados).
+    - Visualizadores: ven lo autorizado por proyecto.
+    - Admin: ven todo y pueden filtrar por persona.
+    Número fijo de consultas sin importar cuántas tareas haya (ver _materializar_matriz).
+    """
+    integrante, es_admin, es_visualizador, puede_ver_todo = _flags_usuario(request)
+    base, filtros = _matriz_filtrar(request, integrante, es_admin, es_visualizador, puede_ver_todo)
+    cuadrantes, ids_asignados = _materializar_matriz(base)
 
     # Combos
     sprints = Sprint.objects.order_by("-inicio", "-fin")
     if puede_ver_todo:
         # Solo muestra integrantes que aparecen en las tareas visibles (reduce lista)
-        ids_a = base.values_list("asignado_a_id", flat=True)
-        ids_m = base.values_list("asignados__id", flat=True)
-        ids_set = {i for i in list(ids_a) + list(ids_m) if i is not None}
         integrantes_opts = (
             Integrante.objects
             .select_related("user")
-            .filter(id__in=ids_set)
+            .filter(id__in=ids_asignados)
             .order_by("user__first_name", "user__last_name")
-            .distinct()
         )
     else:
         integrantes_opts = []
 
     ctx = {
-        "ui": ui,
-        "nui": nui,
-        "uni": uni,
-        "nuni": nuni,
+        "cuadrantes": cuadrantes,
         "tiene_permisos_admin": es_admin,
         "integrantes": integrantes_opts,
-        "persona_id": persona_id if (es_admin or es_visualizador) else "",
         "sprints": sprints,
-        "sprint_id": sprint_id,
-        "include_closed": include_closed,
-        "show_old": show_old,
+        **filtros,
     }
     return render(request, "backlog/backlog_matriz.html", ctx)
 
+
+@login_required
+@require_GET
+def backlog_matriz_json(request):
+    """
+    Matriz en JSON (ver api_docs/README_BACKEND_MATRIZ_API.md): una lista de
+    tareas por cuadrante + "resumen" con conteo y SP. Mismos filtros GET que la página.
+    """
+    integrante, es_admin, es_visualizador, puede_ver_todo = _flags_usuario(request)
+    base, _ = _matriz_filtrar(request, integrante, es_admin, es_visualizador, puede_ver_todo)
+    cuadrantes, _ = _materializar_matriz(base)
+
+    data = {"resumen": {}}
+    for c in cuadrantes:
+        data[c["clave"]] = [
+            {
+                "id": t.id,
+                "titulo": t.titulo,
+                "estado": t.estado,
+                "esfuerzo_sp": t.esfuerzo_sp,
+                "sprint_id": t.sprint_id,
+                "epica_id": t.epica_id,
+                "asignados": [{"id": i.id, "nombre": str(i)} for i in t.asignados.all()],
+            }
+            for t in c["tareas"]
+        ]
+        data["resumen"][c["clave"]] = {"total": c["total"], "sp": c["sp"]}
+    return JsonResponse(data)
+
 # ==============================
 # Checklist de tareas
 # ==============================
@@ -1197,10 +1370,10 @@ def checklist_view(request, integrante_id):
         return redirect("backlog_lista")
 
     tareas = (Tarea.objects
-              .filter(Q(asignados=integrante_obj) | Q(asignado_a=integrante_obj), completada=False)
+              .asignadas_a(integrante_obj)
+              .filter(completada=False)
               .select_related("sprint")
               .prefetch_related("asignados__user")
-              .distinct()
               .order_by("sprint__inicio", "categoria"))
 
     return render(request, "backlog/checklist.html", {
@@ -1321,12 +1494,9 @@ def daily_create_admin(request):
         integrante = get_object_or_404(Integrante, id=integrante_id)
         form = DailyForm(request.POST)
         if form.is_valid():
-            daily = form.save(commit=False)
-            daily.integrante = integrante
-            hora_actual = localtime().time()
-            if not en_ventana_daily(hora_actual):
-                daily.fuera_horario = True
-            daily.save()
+            # Mismo camino que el envío propio: la fila de hoy puede estar precreada
+            ahora = localtime()
+            _guardar_daily(integrante.id, ahora.date(), ahora.time(), form.cleaned_data)
             messages.success(request, f"✅ Daily registrado para {integrante.user.first_name}.")
             return redirect("daily_resumen")
     else:
@@ -1367,12 +1537,24 @@ def eliminar_tarea(request, tarea_id):
 # ==============================
 # Kanban
 # ==============================
-@login_required
-def kanban_board(request):
-    integrante, tiene_permisos_admin, es_visualizador, puede_ver_todo = _flags_usuario(request)
-    tareas = _queryset_visible_tareas(integrante, puede_ver_todo)
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.template.loader import render_to_string
+
+# (clave de contexto, estado) en el orden de las columnas del tablero
+KANBAN_COLUMNAS = (
+    ("nuevo", "NUEVO"),
+    ("en_progreso", "EN_PROGRESO"),
+    ("completado", "COMPLETADO"),
+    ("bloqueado", "BLOQUEADO"),
+)
+KANBAN_PAGINA = 30  # tarjetas por columna en la primera carga y en cada "ver más"
+
+
+def _kanban_filtrar(request, integrante, puede_ver_todo):
+    """Tareas visibles del tablero según los filtros GET + los filtros normalizados."""
+    tareas = _queryset_visible_tareas(integrante, puede_ver_todo).prefetch_related(None)
 
-    # ---- Filtros GET ----
     persona_id     = request.GET.get("persona") if puede_ver_todo else None
     epica_id       = request.GET.get("epica")   if puede_ver_todo else None
     sprint_id      = request.GET.get("sprint") or ""
@@ -1383,7 +1565,7 @@ def kanban_board(request):
     if persona_id and puede_ver_todo:
         try:
             pid = int(persona_id)
-            tareas = tareas.filter(Q(asignados__id=pid) | Q(asignado_a__id=pid)).distinct()
+            tareas = tareas.asignadas_a(pid)
         except ValueError:
             pass
 
@@ -1409,18 +1591,26 @@ def kanban_board(request):
 
     # Ocultar cerradas (COMPLETADO/completada) por defecto
     if not include_closed:
-        tareas = tareas.exclude(estado__iexact="COMPLETADO").exclude(completada=True)
+        tareas = tareas.exclude(terminada=True).exclude(completada=True)
+
+    filtros = dict(persona_id=persona_id, sprint_id=sprint_id, include_closed=include_closed, show_old=show_old)
+    return tareas, filtros
+
+
+@login_required
+def kanban_board(request):
+    integrante, tiene_permisos_admin, es_visualizador, puede_ver_todo = _flags_usuario(request)
+    tareas, filtros = _kanban_filtrar(request, integrante, puede_ver_todo)
 
     # ---- Combos ----
     if puede_ver_todo:
-        ids_a = tareas.values_list("asignado_a_id", flat=True)
-        ids_m = tareas.values_list("asignados__id", flat=True)
-        ids_set = {i for i in list(ids_a) + list(ids_m) if i is not None}
-        integrantes = (
-            Integrante.objects.select_related("user").filter(id__in=ids_set)
-            if es_visualizador else
-            Integrante.objects.select_related("user").all()
-        ).order_by("user__first_name", "user__last_name")
+        integrantes = Integrante.objects.select_related("user")
+        if es_visualizador:
+            # Subconsulta: personas asignadas a alguna tarea visible
+            integrantes = integrantes.filter(
+                id__in=TareaAsignacion.objects.filter(tarea__in=tareas.order_by().values("pk")).values("integrante_id")
+            )
+        integrantes = integrantes.order_by("user__first_name", "user__last_name")
 
         epicas = Epica.objects.all().order_by("titulo")
         if es_visualizador:
@@ -1428,32 +1618,92 @@ def kanban_board(request):
     else:
         integrantes = []
         epicas = Epica.objects.filter(
-            Q(tareas__asignados=integrante) | Q(tareas__asignado_a=integrante)
-        ).distinct().order_by("titulo")
+            id__in=Tarea.objects.asignadas_a(integrante).values("epica_id")
+        ).order_by("titulo")
 
     sprints = Sprint.objects.all().order_by("-inicio")
 
-    # ---- Columnas ----
-    estados = {
-        "nuevo":        tareas.filter(estado__iexact="NUEVO").order_by("-id"),
-        "en_progreso":  tareas.filter(estado__iexact="EN_PROGRESO").order_by("-id"),
-        "completado":   tareas.filter(estado__iexact="COMPLETADO").order_by("-id"),
-        "bloqueado":    tareas.filter(estado__iexact="BLOQUEADO").order_by("-id"),
-    }
+    # ---- Columnas: una consulta con las primeras KANBAN_PAGINA tarjetas de cada
+    # estado y el total de su columna (funciones de ventana por estado) ----
+    filas = (
+        tareas
+        .annotate(
+            pos_columna=Window(RowNumber(), partition_by=F("estado"), order_by=F("id").desc()),
+            total_columna=Window(Count("id"), partition_by=F("estado")),
+        )
+        .filter(pos_columna__lte=KANBAN_PAGINA)
+        .order_by("-id")
+    )
+    clave_de = {estado: clave for clave, estado in KANBAN_COLUMNAS}
+    columnas = {clave: [] for clave, _ in KANBAN_COLUMNAS}
+    conteos = dict.fromkeys(columnas, 0)
+    for t in filas:
+        clave = clave_de[t.estado]
+        columnas[clave].append(t)
+        conteos[clave] = t.total_columna
+    hay_mas = {clave: conteos[clave] > len(columnas[clave]) for clave in columnas}
 
     return render(request, "backlog/kanban_board.html", {
-        **estados,
+        **columnas,
+        "conteos": conteos,
+        "hay_mas": hay_mas,
         "integrantes": integrantes,
         "epicas": epicas,
         "sprints": sprints,
-        "persona_id": persona_id if puede_ver_todo else None,
         "tiene_permisos_admin": tiene_permisos_admin,
         "puede_ver_todo": puede_ver_todo,
-        "include_closed": include_closed,
-        "show_old": show_old,
-        "sprint_id": sprint_id,
+        **filtros,
+    })
+
+
+@login_required
+@require_GET
+def kanban_columna(request):
+    """
+    Siguiente página de una columna del tablero (mismos filtros GET que kanban_board).
+    Paginación por id: ?estado=COMPLETADO&antes_de=<id de la última tarjeta mostrada>.
+    """
+    integrante, tiene_permisos_admin, _, puede_ver_todo = _flags_usuario(request)
+    estado = (request.GET.get("estado") or "").upper()
+    if estado not in dict(Tarea.ESTADO_CHOICES):
+        return JsonResponse({"error": "Estado no válido"}, status=400)
+    try:
+        antes_de = int(request.GET.get("antes_de") or 0)
+    except ValueError:
+        return JsonResponse({"error": "antes_de debe ser numérico"}, status=400)
+
+    tareas, _ = _kanban_filtrar(request, integrante, puede_ver_todo)
+    tareas = tareas.filter(estado=estado).order_by("-id")
+    if antes_de:
+        tareas = tareas.filter(id__lt=antes_de)
+    pagina = list(tareas[:KANBAN_PAGINA + 1])
+    hay_mas = len(pagina) > KANBAN_PAGINA
+    pagina = pagina[:KANBAN_PAGINA]
+
+    html = render_to_string("backlog/kanban_tarjetas.html", {
+        "tareas": pagina,
+        "tiene_permisos_admin": tiene_permisos_admin,
+    }, request=request)
+    return JsonResponse({
+        "estado": estado,
+        "html": html,
+        "cantidad": len(pagina),
+        "siguiente": pagina[-1].id if hay_mas else None,
     })
-    
+
+def _aplicar_estado_tarea(tarea, nuevo_estado):
+    """Estado + campos derivados (completada, fecha_cierre, terminada) sin guardar."""
+    tarea.estado = nuevo_estado
+    tarea.terminada = nuevo_estado in Tarea.ESTADOS_TERMINADA
+    if nuevo_estado == "COMPLETADO":
+        tarea.completada = True
+        if not tarea.fecha_cierre:
+            tarea.fecha_cierre = now()
+    else:
+        tarea.completada = False
+        tarea.fecha_cierre = None
+
+
 @login_required
 def cambiar_estado_tarea(request, tarea_id):
     if request.method != "POST":
@@ -1470,29 +1720,22 @@ def cambiar_estado_tarea(request, tarea_id):
         nuevo_estado = data.get("estado", "").upper()
         observacion  = (data.get("observacion") or "").strip()
 
-        estados_validos = ["NUEVO", "EN_PROGRESO", "COMPLETADO", "BLOQUEADO"]
-        if nuevo_estado not in estados_validos:
+        if nuevo_estado not in dict(Tarea.ESTADO_CHOICES):
             return JsonResponse({"error": "Estado no válido"}, status=400)
 
         estado_anterior = tarea.estado
-        tarea.estado = nuevo_estado
-
-        if nuevo_estado == "COMPLETADO":
-            tarea.completada = True
-            if not tarea.fecha_cierre:
-                tarea.fecha_cierre = now()
-        else:
-            tarea.completada = False
-            tarea.fecha_cierre = None
+        _aplicar_estado_tarea(tarea, nuevo_estado)
 
-        tarea.save()
+        tarea._actor = request.user
+        with transaction.atomic():
+            tarea.save()
 
-        if nuevo_estado == "EN_PROGRESO" and observacion:
-            Evidencia.objects.create(
-                tarea=tarea,
-                comentario=f"[OBS ESTADO] {observacion}\n(De: {estado_anterior} → EN_PROGRESO)",
-                creado_por=request.user
-            )
+            if nuevo_estado == "EN_PROGRESO" and observacion:
+                Evidencia.objects.create(
+                    tarea=tarea,
+                    comentario=f"[OBS ESTADO] {observacion}\n(De: {estado_anterior} → EN_PROGRESO)",
+                    creado_por=request.user
+                )
 
         return JsonResponse({
             "success": True,
@@ -1529,7 +1772,9 @@ def cambiar_categoria_tarea(request, tarea_id):
             return JsonResponse({"error": "Categoría no válida"}, status=400)
 
         tarea.categoria = nueva_categoria
-        tarea.save()
+        tarea._actor = request.user
+        with transaction.atomic():
+            tarea.save()
 
         return JsonResponse({
             "success": True,
@@ -1542,6 +1787,144 @@ def cambiar_categoria_tarea(request, tarea_id):
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
+# ==============================
+# Kanban / Matriz: movimientos en lote
+# ==============================
+MOVIMIENTOS_MAX = 200
+
+
+def _leer_movimiento(m):
+    """(tarea_id, estado, categoria, observacion) validados o ValueError con el motivo."""
+    if not isinstance(m, dict):
+        raise ValueError("Movimiento inválido")
+    try:
+        tarea_id = int(m.get("tarea_id"))
+    except (TypeError, ValueError):
+        raise ValueError("tarea_id inválido")
+    estado = str(m.get("estado") or "").upper() or None
+    categoria = str(m.get("categoria") or "").upper() or None
+    if not (estado or categoria):
+        raise ValueError("Indica estado o categoría")
+    if estado and estado not in dict(Tarea.ESTADO_CHOICES):
+        raise ValueError("Estado no válido")
+    if categoria and categoria not in dict(Tarea.MATRIZ_CHOICES):
+        raise ValueError("Categoría no válida")
+    return tarea_id, estado, categoria, str(m.get("observacion") or "").strip()
+
+
+@login_required
+@require_POST
+def mover_tareas_lote(request):
+    """
+    Aplica varios drag & drop del Kanban/Matriz en una sola transacción:
+        {"movimientos": [{"tarea_id": 1, "estado": "EN_PROGRESO", "observacion": "..."},
+                         {"tarea_id": 2, "categoria": "UI"}]}
+    Permisos de todas las tareas en una consulta, filas bloqueadas con
+    select_for_update y un solo bulk_update. Responde un resultado por
+    movimiento, en el mismo orden.
+    """
+    integrante, es_admin, _, _ = _flags_usuario(request)
+    try:
+        movimientos = json.loads(request.body).get("movimientos")
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({"error": "JSON inválido"}, status=400)
+    if not isinstance(movimientos, list) or not movimientos:
+        return JsonResponse({"error": "Envía una lista 'movimientos'."}, status=400)
+    if len(movimientos) > MOVIMIENTOS_MAX:
+        return JsonResponse({"error": f"Máximo {MOVIMIENTOS_MAX} movimientos por lote."}, status=400)
+
+    resultados, validos = [], []
+    for m in movimientos:
+        try:
+            tarea_id, estado, categoria, observacion = _leer_movimiento(m)
+        except ValueError as e:
+            resultados.append({"tarea_id": m.get("tarea_id") if isinstance(m, dict) else None,
+                               "ok": False, "error": str(e)})
+            continue
+        res = {"tarea_id": tarea_id}
+        resultados.append(res)
+        validos.append((res, tarea_id, estado, categoria, observacion))
+
+    ids = {v[1] for v in validos}
+    if es_admin:
+        permitidas = ids
+    else:
+        permitidas = set(Tarea.objects.filter(id__in=ids).asignadas_a(integrante).values_list("id", flat=True))
+
+    eventos, evidencias, cambiadas = [], [], {}
+    with transaction.atomic():
+        tareas = (
+            Tarea.objects
+            .select_for_update(of=("self",))
+            .annotate(proyecto_id=F("epica__proyecto_id"))
+            .in_bulk(ids & permitidas)
+        )
+        for res, tarea_id, estado, categoria, observacion in validos:
+            tarea = tareas.get(tarea_id)
+            if tarea_id not in permitidas:
+                res.update(ok=False, error="Solo responsables o administradores pueden mover la tarea")
+                continue
+            if tarea is None:
+                res.update(ok=False, error="Tarea no encontrada")
+                continue
+
+            if estado and estado != tarea.estado:
+                anterior = tarea.estado
+                _aplicar_estado_tarea(tarea, estado)
+                eventos.append(EstadoEvento.de_tarea(tarea, anterior, actor=request.user))
+                if estado == "EN_PROGRESO" and observacion:
+                    evidencias.append(Evidencia(
+                        tarea=tarea,
+                        comentario=f"[OBS ESTADO] {observacion}\n(De: {anterior} → EN_PROGRESO)",
+                        creado_por=request.user,
+                    ))
+                cambiadas[tarea.id] = tarea
+            if categoria and categoria != tarea.categoria:
+                tarea.categoria = categoria
+                cambiadas[tarea.id] = tarea
+            res.update(ok=True, estado=tarea.estado, categoria=tarea.categoria)
+
+        if cambiadas:
+            # bulk_update no pasa por save()/señales: bitácora, búsqueda y caché se escriben aquí
+            Tarea.objects.bulk_update(
+                cambiadas.values(), ["estado", "terminada", "completada", "fecha_cierre", "categoria"]
+            )
+            EstadoEvento.objects.bulk_create(eventos)
+            Evidencia.objects.bulk_create(evidencias)
+            reindexar_al_confirmar(*{e.tarea_id for e in evidencias})
+            invalidar(*{a for t in cambiadas.values() for a in alcances_tarea(t.sprint_id, t.proyecto_id)})
+            avisar(*(aviso_tarea(t) for t in cambiadas.values()))
+
+    return JsonResponse({
+        "success": True,
+        "aplicados": sum(1 for r in resultados if r.get("ok")),
+        "resultados": resultados,
+    })
+
+# ==============================
+# Avisos en vivo (SSE, requiere servidor ASGI)
+# ==============================
+TIPOS_AVISO = {"tarea", "subtarea", "daily"}
+
+
+@login_required
+async def eventos_stream(request):
+    """
+    text/event-stream con los cambios de tareas/subtareas/dailies
+    (?tipos=tarea,subtarea), solo de lo que el usuario puede ver
+    (eventos_vivo.filtro_visibilidad). Bajo WSGI no hay conexión larga
+    posible: 501, y EventSource deja de intentar.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Los avisos en vivo requieren el servidor ASGI."}, status=501)
+    tipos = {t for t in (request.GET.get("tipos") or "").split(",") if t in TIPOS_AVISO}
+    filtro = await filtro_visibilidad(await sync_to_async(contexto_de)(request))
+    resp = StreamingHttpResponse(flujo_sse(tipos, filtro=filtro), content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"  # nginx: no acumular el flujo
+    return resp
+
+
 # ==============================
 # CRUD de Épicas
 # ==============================
@@ -1570,8 +1953,7 @@ def epica_list(request):
             epicas = (
                 Epica.objects
                 .filter(
-                    Q(tareas__asignados=integrante) |
-                    Q(tareas__asignado_a=integrante) |
+                    Q(id__in=Tarea.objects.asignadas_a(integrante).values("epica_id")) |
                     Q(owner=integrante) |
                     Q(owners=integrante)
                 )
@@ -1596,8 +1978,8 @@ def epica_list(request):
         proyectos = _proyectos_autorizados_qs(integrante).order_by("codigo")
     else:
         proyectos = Proyecto.objects.filter(
-            activo=True, epicas__tareas__asignados=integrante
-        ).distinct().order_by("codigo")
+            activo=True, id__in=Tarea.objects.asignadas_a(integrante).values("epica__proyecto_id")
+        ).order_by("codigo")
 
     context = {
         "epicas": epicas,
@@ -1679,8 +2061,7 @@ def epica_detail(request, epica_id):
     )
 
     if es_visualizador and not es_admin:
-        proyectos = _proyectos_autorizados_qs(integrante)
-        if not proyectos.filter(id=getattr(epica.proyecto, "id", None)).exists():
+        if not contexto_de(request).ve_proyecto(epica.proyecto_id):
             messages.error(request, "❌ No tienes permisos para ver esta épica.")
             return redirect("epica_list")
 
@@ -1690,9 +2071,7 @@ def epica_detail(request, epica_id):
                 epica.owner_id == integrante.id or epica.owners.filter(id=integrante.id).exists()
             )
         )
-        tiene_tareas = epica.tareas.filter(
-            Q(asignados=integrante) | Q(asignado_a=integrante)
-        ).exists() if integrante else False
+        tiene_tareas = epica.tareas.asignadas_a(integrante).exists() if integrante else False
 
         if not (tiene_tareas or es_owner):
             messages.error(request, "❌ No tienes permisos para ver esta épica.")
@@ -1711,10 +2090,10 @@ def epica_detail(request, epica_id):
     avance_efectivo = epica.avance
 
     estados = {
-        "NUEVO": tareas_qs.filter(estado__iexact="NUEVO"),
-        "EN_PROGRESO": tareas_qs.filter(estado__iexact="EN_PROGRESO"),
-        "BLOQUEADO": tareas_qs.filter(estado__iexact="BLOQUEADO"),
-        "COMPLETADO": tareas_qs.filter(estado__iexact="COMPLETADO"),
+        "NUEVO": tareas_qs.filter(estado="NUEVO"),
+        "EN_PROGRESO": tareas_qs.filter(estado="EN_PROGRESO"),
+        "BLOQUEADO": tareas_qs.filter(estado="BLOQUEADO"),
+        "COMPLETADO": tareas_qs.filter(estado="COMPLETADO"),
     }
 
     conteos_por_estado = (
@@ -1778,8 +2157,9 @@ def bloque_edit(request, bloque_id):
     if request.method == "POST":
         form = BloqueTareaForm(request.POST, instance=bloque)
         if form.is_valid():
-            bloque = form.save()
-            _sync_subtareas_fechas(bloque)  # sincroniza todas las subtareas del bloque
+            with transaction.atomic():
+                bloque = form.save()
+                _sync_subtareas_fechas(bloque)  # sincroniza todas las subtareas del bloque
             messages.success(request, "✏️ Bloque actualizado correctamente.")
             return redirect("detalle_tarea", tarea_id=tarea.id)
         messages.error(request, "⚠️ Revisa los campos del bloque.")
@@ -1811,6 +2191,7 @@ def subtarea_create(request, bloque_id):
             instance=Subtarea(bloque=bloque),  # << clave
         )
         if form.is_valid():
+            form.instance._actor = request.user
             form.save(commit=True)
             messages.success(request, "✅ Subtarea creada correctamente.")
             return redirect("detalle_tarea", tarea_id=tarea.id)
@@ -1844,6 +2225,7 @@ def subtarea_edit(request, subtarea_id):
     if request.method == "POST":
         form = SubtareaForm(request.POST, instance=subtarea, tarea=tarea, bloque=bloque, es_admin=es_admin)
         if form.is_valid():
+            form.instance._actor = request.user
             obj = form.save(commit=True)  # fuerza bloque y fechas
             messages.success(request, "✏️ Subtarea actualizada correctamente.")
             return redirect("detalle_tarea", tarea_id=tarea.id)
@@ -1895,12 +2277,13 @@ def subtarea_cambiar_estado(request, subtarea_id):
         return JsonResponse({"error": "Sin permisos para cambiar estado."}, status=403)
 
     try:
-        nuevo = (request.POST.get("estado") or "").upper()
-        validos = {c[0] for c in Subtarea.ESTADO_CHOICES}
-        if nuevo not in validos:
+        nuevo = (request.POST.get("estado") or "").strip().lower()
+        if nuevo not in dict(Subtarea.ESTADO_CHOICES):
             return JsonResponse({"error": "Estado no válido."}, status=400)
         st.estado = nuevo
-        st.save(update_fields=["estado"])
+        st._actor = request.user
+        with transaction.atomic():
+            st.save(update_fields=["estado"])
         return JsonResponse({"success": True, "estado": st.get_estado_display()})
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
@@ -2021,13 +2404,17 @@ def eliminar_evidencia_subtarea(request, subtarea_id, evid_id):
 # views.py
 from django.shortcuts import render
 from django.db.models import (
-    Count, Sum, Q, Case, When, F, FloatField, IntegerField
+    Count, Sum, Q, Case, When, F, FloatField
 )
-from django.db.models.functions import Upper
 from django.utils import timezone
 from datetime import timedelta, date
 
 from .models import Proyecto, Sprint, Epica, Tarea, Subtarea, Daily, Integrante
+from .calendario import dias_habiles
+from .metricas import (
+    completar_burndown, historial_estados, metricas_daily_por_integrante, serie_burndown, tiempo_ciclo,
+)
+from .snapshots import snapshot_si_cerrado, snapshots_de
 
 # ===============================
 # Helpers internos
@@ -2036,22 +2423,43 @@ def _sprint_actual():
     hoy = timezone.localdate()
     return Sprint.objects.filter(inicio__lte=hoy, fin__gte=hoy).order_by("-inicio").first()
 
-def _business_days(d1: date, d2: date) -> int:
-    """Cuenta días hábiles inclusive entre d1 y d2."""
-    if not d1 or not d2 or d2 < d1:
-        return 0
-    days = 0
-    cur = d1
-    while cur <= d2:
-        if cur.weekday() < 5:  # lunes–viernes
-            days += 1
-        cur += timedelta(days=1)
-    return days
+# ===============================
+# Caché versionada de dashboard/KPIs (ver cache_datos.py)
+# ===============================
+VISTAS_CACHEADAS = ("dashboard_neusi", "kpi_individual", "kpi_burndown", "kpi_burndown_json", "kpi_esfuerzo")
+
+
+def _deps_dashboard(request):
+    # Velocidad de los últimos sprints y métricas de daily de todo el equipo
+    return ["global", "daily"]
+
+
+def _deps_kpi(request):
+    sid = request.GET.get("sprint_id")
+    pid = request.GET.get("proyecto_id")
+    if sid:
+        return [f"sprint:{sid}"]
+    if pid:
+        return [f"proyecto:{pid}"]
+    return ["global"]
+
+
+@login_required
+def cache_stats(request):
+    """Aciertos/fallos de la caché versionada (solo admin)."""
+    if not _es_admin(request):
+        return JsonResponse({"error": "Solo administradores."}, status=403)
+    from django.conf import settings
+    return JsonResponse({
+        "backend": settings.CACHES["default"]["BACKEND"],
+        "vistas": estadisticas(VISTAS_CACHEADAS),
+    })
+
 
 # ===============================
-# DASHBOARD PRINCIPAL (cache 45s)
+# DASHBOARD PRINCIPAL (caché versionada)
 # ===============================
-@cache_page(45, key_prefix="dashboard_neusi")
+@cache_por_version("dashboard_neusi", 120, _deps_dashboard)
 def dashboard_neusi(request):
     # ------- Filtros -------
     sprint_actual = _sprint_actual()
@@ -2070,19 +2478,17 @@ def dashboard_neusi(request):
     if proyecto_id:
         tareas = tareas.filter(epica__proyecto_id=proyecto_id)
     if integrante_id:
-        tareas = tareas.filter(Q(asignado_a_id=integrante_id) | Q(asignados__id=integrante_id)).distinct()
+        tareas = tareas.asignadas_a(integrante_id)
 
-    # ===== Normalización de estado para TAREA (HU) =====
-    tareas_u = tareas.annotate(estado_u=Upper("estado"))
-
-    cards = tareas_u.aggregate(
+    # ===== Estado de TAREA (HU): valores canónicos, igualdad directa =====
+    cards = tareas.aggregate(
         hu_total=Count("id"),
-        hu_new=Count("id", filter=Q(estado_u="NUEVO")),
-        hu_inprog=Count("id", filter=Q(estado_u="EN_PROGRESO")),
-        hu_blocked=Count("id", filter=Q(estado_u="BLOQUEADO")),
-        hu_done=Count("id", filter=Q(estado_u__in=["COMPLETADO", "COMPLETADA"])),
+        hu_new=Count("id", filter=Q(estado="NUEVO")),
+        hu_inprog=Count("id", filter=Q(estado="EN_PROGRESO")),
+        hu_blocked=Count("id", filter=Q(estado="BLOQUEADO")),
+        hu_done=Count("id", filter=Q(terminada=True)),
         sp_planned=Sum("esfuerzo_sp"),
-        sp_completed=Sum("esfuerzo_sp", filter=Q(estado_u__in=["COMPLETADO", "COMPLETADA"])),
+        sp_completed=Sum("esfuerzo_sp", filter=Q(terminada=True)),
     )
 
     # Datos para gráfica de HU por estado (doughnut)
@@ -2101,7 +2507,7 @@ def dashboard_neusi(request):
             total_st=Count("bloques__subtareas", distinct=True),
             cerradas_st=Count(
                 "bloques__subtareas",
-                filter=Q(bloques__subtareas__estado__in=["entregada", "cerrada", "COMPLETADO", "completado"]),
+                filter=Q(bloques__subtareas__terminada=True),
                 distinct=True,
             ),
         )
@@ -2116,19 +2522,19 @@ def dashboard_neusi(request):
 
     # ------- HU por responsable -------
     hu_por_resp = (
-        tareas_u
+        tareas
         .values("asignado_a__user__first_name", "asignado_a__user__last_name", "asignado_a_id")
         .annotate(
             total=Count("id", distinct=True),
-            new=Count("id", filter=Q(estado_u="NUEVO"), distinct=True),
-            inprog=Count("id", filter=Q(estado_u="EN_PROGRESO"), distinct=True),
-            blocked=Count("id", filter=Q(estado_u="BLOQUEADO"), distinct=True),
-            done=Count("id", filter=Q(estado_u__in=["COMPLETADO", "COMPLETADA"]), distinct=True),
+            new=Count("id", filter=Q(estado="NUEVO"), distinct=True),
+            inprog=Count("id", filter=Q(estado="EN_PROGRESO"), distinct=True),
+            blocked=Count("id", filter=Q(estado="BLOQUEADO"), distinct=True),
+            done=Count("id", filter=Q(terminada=True), distinct=True),
         )
         .order_by("-total")
     )
 
-    # ------- Subtareas: normalización de estado -------
+    # ------- Subtareas por estado (valores canónicos) -------
     subtareas_qs = Subtarea.objects.all()
     if sprint_id:
         subtareas_qs = subtareas_qs.filter(bloque__tarea__sprint_id=sprint_id)
@@ -2137,51 +2543,62 @@ def dashboard_neusi(request):
     if integrante_id:
         subtareas_qs = subtareas_qs.filter(responsable_id=integrante_id)
 
-    st_u = subtareas_qs.annotate(estado_u=Upper("estado"))
-
-    subtareas_stats = st_u.aggregate(
+    subtareas_stats = subtareas_qs.aggregate(
         st_total=Count("id"),
-        st_nuevo=Count("id", filter=Q(estado_u__in=["NUEVO", "PENDIENTE"])),
-        st_prog=Count("id", filter=Q(estado_u="EN_PROGRESO")),
-        st_bloq=Count("id", filter=Q(estado_u="BLOQUEADO")),
-        st_comp=Count("id", filter=Q(estado_u__in=["ENTREGADA", "COMPLETADO", "CERRADA"])),
+        st_nuevo=Count("id", filter=Q(estado="pendiente")),
+        st_prog=Count("id", filter=Q(estado="en_progreso")),
+        st_bloq=Count("id", filter=Q(estado="bloqueada")),
+        st_comp=Count("id", filter=Q(terminada=True)),
     )
 
     subtareas_por_responsable = (
-        st_u
+        subtareas_qs
         .values("responsable__user__first_name", "responsable__user__last_name")
         .annotate(
-            nuevo=Sum(Case(When(estado_u__in=["NUEVO", "PENDIENTE"], then=1), default=0, output_field=IntegerField())),
-            prog=Sum(Case(When(estado_u="EN_PROGRESO", then=1), default=0, output_field=IntegerField())),
-            bloq=Sum(Case(When(estado_u="BLOQUEADO", then=1), default=0, output_field=IntegerField())),
-            comp=Sum(Case(When(estado_u__in=["ENTREGADA", "COMPLETADO", "CERRADA"], then=1), default=0, output_field=IntegerField())),
+            nuevo=Count("id", filter=Q(estado="pendiente")),
+            prog=Count("id", filter=Q(estado="en_progreso")),
+            bloq=Count("id", filter=Q(estado="bloqueada")),
+            comp=Count("id", filter=Q(terminada=True)),
             total=Count("id"),
         )
         .order_by("responsable__user__first_name", "responsable__user__last_name")
     )
 
-    st_res_tot = st_u.aggregate(
-        nuevo=Count("id", filter=Q(estado_u__in=["NUEVO", "PENDIENTE"])),
-        prog=Count("id", filter=Q(estado_u="EN_PROGRESO")),
-        bloq=Count("id", filter=Q(estado_u="BLOQUEADO")),
-        comp=Count("id", filter=Q(estado_u__in=["ENTREGADA", "COMPLETADO", "CERRADA"])),
+    st_res_tot = subtareas_qs.aggregate(
+        nuevo=Count("id", filter=Q(estado="pendiente")),
+        prog=Count("id", filter=Q(estado="en_progreso")),
+        bloq=Count("id", filter=Q(estado="bloqueada")),
+        comp=Count("id", filter=Q(terminada=True)),
         total=Count("id"),
     )
 
     # ------- Velocidad por sprint (SP) -------
     ultimos_sprints = list(Sprint.objects.order_by("-inicio")[:5])[::-1]
+    # Sprints cerrados: snapshot congelado; abiertos: una consulta agrupada
+    snaps = snapshots_de(ultimos_sprints)
+    vivos = Tarea.objects.filter(sprint_id__in=[sp.id for sp in ultimos_sprints if sp.id not in snaps])
+    if proyecto_id:
+        vivos = vivos.filter(epica__proyecto_id=proyecto_id)
+    vel_vivos = {
+        r["sprint_id"]: (r["plan"] or 0, r["hecho"] or 0)
+        for r in vivos.values("sprint_id").annotate(
+            plan=Sum("esfuerzo_sp"), hecho=Sum("esfuerzo_sp", filter=Q(terminada=True))
+        ).order_by()
+    }
     vel_labels, vel_planned, vel_done = [], [], []
     for sp in ultimos_sprints:
-        qs_sp = Tarea.objects.filter(sprint=sp).annotate(estado_u=Upper("estado"))
-        if proyecto_id:
-            qs_sp = qs_sp.filter(epica__proyecto_id=proyecto_id)
+        if sp.id in snaps:
+            plan, hecho = snaps[sp.id].velocidad(proyecto_id)
+        else:
+            plan, hecho = vel_vivos.get(sp.id, (0, 0))
         vel_labels.append(sp.nombre)
-        vel_planned.append(qs_sp.aggregate(Sum("esfuerzo_sp"))["esfuerzo_sp__sum"] or 0)
-        vel_done.append(qs_sp.filter(estado_u__in=["COMPLETADO", "COMPLETADA"]).aggregate(Sum("esfuerzo_sp"))["esfuerzo_sp__sum"] or 0)
+        vel_planned.append(plan)
+        vel_done.append(hecho)
 
     # ===============================
     # MÉTRICAS DE DAILY POR INTEGRANTE
     # ===============================
+    snap_daily = None
     if scope == "global" or not sprint_id:
         fin_rango = timezone.localdate()
         ini_rango = fin_rango - timedelta(days=29)
@@ -2189,49 +2606,39 @@ def dashboard_neusi(request):
         sp = Sprint.objects.filter(id=sprint_id).first()
         ini_rango = sp.inicio if sp else None
         fin_rango = sp.fin if sp else None
+        snap_daily = snapshot_si_cerrado(sp)
 
     integrantes = list(Integrante.objects.select_related("user").order_by("user__first_name", "user__last_name"))
     if proyecto_id:
-        integ_ids_en_proyecto = (
-            Tarea.objects.filter(epica__proyecto_id=proyecto_id)
-            .values_list("asignado_a_id", flat=True)
+        integ_ids_en_proyecto = Tarea.objects.filter(epica__proyecto_id=proyecto_id).ids_asignados()
+        integrantes = [i for i in integrantes if i.id in integ_ids_en_proyecto]
+
+    total_habiles = dias_habiles(ini_rango, fin_rango)  # lunes–viernes sin festivos
+
+    # Presencia, horario y alineación de todo el equipo en consultas agrupadas
+    # (sprint cerrado: cifras congeladas en su snapshot)
+    if snap_daily:
+        metricas = {int(k): v for k, v in snap_daily.daily.items()}
+    else:
+        metricas = metricas_daily_por_integrante(
+            ini_rango, fin_rango,
+            integrante_ids=[i.id for i in integrantes],
+            dias_habiles=total_habiles,
         )
-        integrantes = [i for i in integrantes if i.id in set(integ_ids_en_proyecto)]
 
-    total_habiles = _business_days(ini_rango, fin_rango) if (ini_rango and fin_rango) else 0
     tabla_daily = []
-
     for integ in integrantes:
-        dails = Daily.objects.filter(integrante=integ)
-        if ini_rango and fin_rango:
-            dails = dails.filter(fecha__range=(ini_rango, fin_rango))
-
-        present = dails.count()
-        on_time = dails.filter(fuera_horario=False).count()
-        delayed = dails.filter(fuera_horario=True).count()
-        no_done = max(total_habiles - present, 0)
-
-        alin_ok = 0
-        alin_tot = 0
-        for d in dails.prefetch_related("items"):
-            met = d.alineacion
-            alin_ok += met.get("alineados", 0)
-            alin_tot += met.get("total", 0)
-        efectividad = (100.0 * alin_ok / alin_tot) if alin_tot else 0.0
-
-        participacion = (100.0 * present / total_habiles) if total_habiles else 0.0
-        cumplimiento = (100.0 * on_time / total_habiles) if total_habiles else 0.0
-        retrasos = (100.0 * delayed / total_habiles) if total_habiles else 0.0
-        no_completado = (100.0 * no_done / total_habiles) if total_habiles else 0.0
-
+        m = metricas.get(integ.id)
+        if m is None:  # integrante creado después del cierre del sprint
+            continue
         nombre = integ.user.get_full_name() or integ.user.username
         tabla_daily.append(dict(
             integrante=nombre.title(),
-            cumplimiento=cumplimiento,
-            retrasos=retrasos,
-            no_completado=no_completado,
-            efectividad=efectividad,
-            participacion=participacion,
+            cumplimiento=m["cumplimiento"],
+            retrasos=m["retrasos"],
+            no_completado=m["no_completado"],
+            efectividad=m["efectividad"],
+            participacion=m["participacion"],
         ))
     tabla_daily.sort(key=lambda r: r["integrante"])
 
@@ -2267,11 +2674,10 @@ def dashboard_neusi(request):
 # --- KPI VIEWS (macro vs subtareas, sin doble conteo) ---
 from django.shortcuts import render
 from django.db.models import Sum, Count, Q
-from django.db.models.functions import Upper, Coalesce
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import timedelta, date
 from django.db.models.functions import Coalesce
-from django.db.models import Min
 from .models import Proyecto, Sprint, Epica, Tarea, Subtarea, Integrante
 from django.contrib.auth.models import User
 
@@ -2293,7 +2699,7 @@ def _qs_tareas(uid, sid, pid):
     if pid:
         qs = qs.filter(epica__proyecto_id=pid)
     if uid:
-        qs = qs.filter(Q(asignado_a_id=uid) | Q(asignados__id=uid)).distinct()
+        qs = qs.asignadas_a(uid)
     return qs
 
 
@@ -2311,18 +2717,19 @@ def _qs_subtareas(uid, sid, pid):
 
 
 def _q_done_tarea():
-    return Q(estado__isnull=False) & Q(estado__iregex=r"^(completad[oa])$")
+    # COMPLETADO (columna derivada `terminada`, indexada con sprint)
+    return Q(terminada=True)
 
 
 def _q_done_subtarea():
-    # ENTREGADA / COMPLETADO / CERRADA
-    return Q(estado__isnull=False) & Q(estado__iregex=r"^(entregada|completado|cerrada)$")
+    # entregada / cerrada (columna derivada `terminada`, indexada con responsable)
+    return Q(terminada=True)
 
 
 # ============================
-# KPI INDIVIDUAL (cache 60s)
+# KPI INDIVIDUAL (caché versionada)
 # ============================
-@cache_page(60, key_prefix="kpi_individual")
+@cache_por_version("kpi_individual", 300, _deps_kpi)
 def kpi_individual_page(request):
     user_id     = request.GET.get("user_id") or None
     sprint_id   = request.GET.get("sprint_id") or None
@@ -2332,10 +2739,9 @@ def kpi_individual_page(request):
     tareas = (
         Tarea.objects
         .select_related("epica", "epica__proyecto", "sprint", "asignado_a")
-        .annotate(estado_u=Upper("estado"))
     )
     if user_id:
-        tareas = tareas.filter(Q(asignado_a_id=user_id) | Q(asignados__id=user_id)).distinct()
+        tareas = tareas.asignadas_a(user_id)
     if sprint_id:
         tareas = tareas.filter(sprint_id=sprint_id)
     if proyecto_id:
@@ -2347,7 +2753,6 @@ def kpi_individual_page(request):
     subtareas = (
         Subtarea.objects
         .select_related("bloque", "bloque__tarea", "bloque__tarea__epica", "bloque__tarea__sprint")
-        .annotate(estado_u=Upper("estado"))
     )
     if user_id:
         subtareas = subtareas.filter(responsable_id=user_id)
@@ -2356,7 +2761,7 @@ def kpi_individual_page(request):
     if proyecto_id:
         subtareas = subtareas.filter(bloque__tarea__epica__proyecto_id=proyecto_id)
 
-    st_done_q = subtareas.filter(estado_u__in=["ENTREGADA", "COMPLETADO", "CERRADA"])
+    st_done_q = subtareas.filter(_q_done_subtarea())
     sp_by_sub_done = st_done_q.aggregate(v=Coalesce(Sum("esfuerzo_sp"), 0))["v"] or 0
 
     total_subtareas = subtareas.count()
@@ -2369,17 +2774,14 @@ def kpi_individual_page(request):
         vel_map[sid] = vel_map.get(sid, 0) + (r["sp"] or 0)
     velocidad_prom = round(sum(vel_map.values()) / (len(vel_map) or 1), 2)
 
-    st_inicio = (
-        Subtarea.objects
-        .filter(bloque__tarea__in=tareas, fecha_inicio__isnull=False)
-        .values("bloque__tarea_id")
-        .annotate(min_inicio=Min("fecha_inicio"))
-    )
-    inicio_map = {r["bloque__tarea_id"]: r["min_inicio"] for r in st_inicio}
-
+    # Tiempo de ciclo: inicio = ventana materializada de la tarea (min de sus bloques)
     deltas = []
-    for tid, f_cierre in tareas.filter(estado_u__in=["COMPLETADO", "COMPLETADA"]).values_list("id", "fecha_cierre"):
-        ini = inicio_map.get(tid)
+    cerradas = tareas.filter(
+        _q_done_tarea(),
+        ventana_inicio__isnull=False,
+        fecha_cierre__isnull=False,
+    )
+    for ini, f_cierre in cerradas.values_list("ventana_inicio", "fecha_cierre"):
         if ini and f_cierre:
             ini_dt = timezone.make_aware(timezone.datetime.combine(ini, timezone.datetime.min.time()))
             deltas.append((f_cierre - ini_dt).days)
@@ -2417,69 +2819,31 @@ def kpi_individual_page(request):
     return render(request, "backlog/kpi/individual.html", ctx)
 
 # ============================
-# BURNDOWN PERSONAL (cache 60s)
+# BURNDOWN PERSONAL / EQUIPO (serie en SQL, caché versionada)
 # ============================
-from datetime import timedelta  # si no lo tienes ya
-
-def _daterange(start_date, end_date):
-    cur = start_date
-    while cur <= end_date:
-        yield cur
-        cur += timedelta(days=1)
-
-
-@cache_page(60, key_prefix="kpi_burndown")
-def kpi_burndown_page(request):
+def _burndown_sprint(request):
+    """(sprint, serie completa) según los filtros; sprint actual si no llega sprint_id."""
     uid, sid, pid = _get_filters(request)
-
-    # Sprint actual por defecto si no llega sid
-    today = timezone.localdate()
     if not sid:
-        cur = Sprint.objects.filter(inicio__lte=today, fin__gte=today).order_by("-inicio").first()
+        cur = _sprint_actual()
     else:
         cur = Sprint.objects.filter(id=sid).first()
-
     if not cur:
-        ctx = dict(
-            users=list(Integrante.objects.select_related("user").order_by("user__first_name", "user__last_name")
-                      .values("id", "user__first_name", "user__last_name")),
-            sprints=Sprint.objects.order_by("-inicio"),
-            proyectos=Proyecto.objects.filter(activo=True).order_by("codigo"),
-            user_id=int(uid) if uid else None,
-            sprint_id=int(sid) if sid else None,
-            proyecto_id=int(pid) if pid else None,
-            labels=[], planned=[], done=[], remain=[]
-        )
-        return render(request, "backlog/kpi/burndown.html", ctx)
-
-    tareas = _qs_tareas(uid, cur.id, pid).annotate(estado_u=Upper("estado"))
-    subtareas = _qs_subtareas(uid, cur.id, pid).annotate(estado_u=Upper("estado"))
-
-    planned_total = (tareas.aggregate(v=Coalesce(Sum("esfuerzo_sp"), 0))["v"]
-                     + subtareas.aggregate(v=Coalesce(Sum("esfuerzo_sp"), 0))["v"])
-
-    done_by_day = {}
-    for t in tareas.filter(_q_done_tarea()):
-        d = getattr(t, "fecha_cierre", None)
-        if d:
-            d = timezone.localdate(d)
-            if cur.inicio <= d <= cur.fin:
-                done_by_day[d] = done_by_day.get(d, 0) + (t.esfuerzo_sp or 0)
-
-    for s in subtareas.filter(_q_done_subtarea()):
-        d = getattr(s, "fecha_fin", None)
-        if d and cur.inicio <= d <= cur.fin:
-            done_by_day[d] = done_by_day.get(d, 0) + (s.esfuerzo_sp or 0)
-
-    labels, planned, done, remain = [], [], [], []
-    cum_done = 0
-    for d in _daterange(cur.inicio, cur.fin):
-        labels.append(d.strftime("%d-%b"))
-        cum_done += done_by_day.get(d, 0)
-        done.append(cum_done)
-        planned.append(planned_total)
-        remain_val = max(planned_total - cum_done, 0)
-        remain.append(remain_val)
+        return None, None
+
+    # Sprint cerrado, vista de equipo: la serie está congelada en su snapshot
+    snap = None if (uid or pid) else snapshot_si_cerrado(cur)
+    if snap:
+        serie = snap.burndown
+    else:
+        serie = serie_burndown(cur.inicio, cur.fin, _qs_tareas(uid, cur.id, pid), _qs_subtareas(uid, cur.id, pid))
+    return cur, completar_burndown(serie)
+
+
+@cache_por_version("kpi_burndown", 300, _deps_kpi)
+def kpi_burndown_page(request):
+    uid, sid, pid = _get_filters(request)
+    cur, serie = _burndown_sprint(request)
 
     ctx = dict(
         users=list(Integrante.objects.select_related("user").order_by("user__first_name", "user__last_name")
@@ -2487,32 +2851,53 @@ def kpi_burndown_page(request):
         sprints=Sprint.objects.order_by("-inicio"),
         proyectos=Proyecto.objects.filter(activo=True).order_by("codigo"),
         user_id=int(uid) if uid else None,
-        sprint_id=cur.id,
+        sprint_id=cur.id if cur else (int(sid) if sid else None),
         proyecto_id=int(pid) if pid else None,
-        labels=labels, planned=planned, done=done, remain=remain,
+        labels=[], planned=[], done=[], remain=[], ideal=[],
     )
+    if serie:
+        ctx.update(
+            labels=[date.fromisoformat(d).strftime("%d-%b") for d in serie["dias"]],
+            planned=[serie["planificado"]] * len(serie["dias"]),
+            done=serie["hecho"],
+            remain=serie["restante"],
+            ideal=serie["ideal"],
+        )
     return render(request, "backlog/kpi/burndown.html", ctx)
 
 
+@cache_por_version("kpi_burndown_json", 300, _deps_kpi)
+def kpi_burndown_json(request):
+    """Serie del burndown para el gráfico (mismos filtros que la página; sin user_id = equipo)."""
+    cur, serie = _burndown_sprint(request)
+    if not cur:
+        return JsonResponse({"sprint": None, "dias": [], "planificado": 0, "hecho": [], "restante": [], "ideal": []})
+    return JsonResponse({
+        "sprint": {"id": cur.id, "nombre": cur.nombre, "inicio": cur.inicio, "fin": cur.fin},
+        "modo": "individual" if request.GET.get("user_id") else "equipo",
+        **serie,
+    })
+
+
 
 # ==================================
-# DISTRIBUCIÓN DE ESFUERZO (cache 60s)
+# DISTRIBUCIÓN DE ESFUERZO (caché versionada)
 # ==================================
-@cache_page(60, key_prefix="kpi_esfuerzo")
+@cache_por_version("kpi_esfuerzo", 300, _deps_kpi)
 def kpi_esfuerzo_page(request):
     user_id     = request.GET.get("user_id") or None
     sprint_id   = request.GET.get("sprint_id") or None
     proyecto_id = request.GET.get("proyecto_id") or None
 
-    tareas = Tarea.objects.annotate(estado_u=Upper("estado"))
+    tareas = Tarea.objects.all()
     if user_id:
-        tareas = tareas.filter(Q(asignado_a_id=user_id) | Q(asignados__id=user_id)).distinct()
+        tareas = tareas.asignadas_a(user_id)
     if sprint_id:
         tareas = tareas.filter(sprint_id=sprint_id)
     if proyecto_id:
         tareas = tareas.filter(epica__proyecto_id=proyecto_id)
 
-    subtareas = Subtarea.objects.annotate(estado_u=Upper("estado"))
+    subtareas = Subtarea.objects.all()
     if user_id:
         subtareas = subtareas.filter(responsable_id=user_id)
     if sprint_id:
@@ -2520,9 +2905,15 @@ def kpi_esfuerzo_page(request):
     if proyecto_id:
         subtareas = subtareas.filter(bloque__tarea__epica__proyecto_id=proyecto_id)
 
-    planned_macro = tareas.aggregate(v=Coalesce(Sum("esfuerzo_sp"), 0))["v"] or 0
-    done_by_sub   = subtareas.filter(estado_u__in=["ENTREGADA","COMPLETADO","CERRADA"])\
-                             .aggregate(v=Coalesce(Sum("esfuerzo_sp"), 0))["v"] or 0
+    snap = None
+    if sprint_id and not (user_id or proyecto_id):
+        snap = snapshot_si_cerrado(Sprint.objects.filter(id=sprint_id).first())
+    if snap:
+        planned_macro, done_by_sub = snap.sp_planificados, snap.sp_subtareas_terminadas
+    else:
+        planned_macro = tareas.aggregate(v=Coalesce(Sum("esfuerzo_sp"), 0))["v"] or 0
+        done_by_sub   = subtareas.filter(_q_done_subtarea())\
+                                 .aggregate(v=Coalesce(Sum("esfuerzo_sp"), 0))["v"] or 0
 
     labels = ["Planned (macro)", "Done por Subtareas"]
     data   = [planned_macro, done_by_sub]
@@ -2548,3 +2939,55 @@ def kpi_esfuerzo_page(request):
         "done_by_sub": done_by_sub,
     }
     return render(request, "backlog/kpi/esfuerzo.html", ctx)
+
+
+# ==================================
+# CAPACIDAD DEL SPRINT (caché versionada por sprint, ver capacidad.py)
+# ==================================
+from .capacidad import UMBRAL_LIMITE, capacidad_sprint
+
+
+def _puede_ver_capacidad(request):
+    ctx = contexto_de(request)
+    return ctx.es_admin or ctx.es_visualizador
+
+
+def _sprint_capacidad(request):
+    """Sprint de ?sprint=<id>; por defecto el actual (o el más reciente). None si el id no existe."""
+    sid = request.GET.get("sprint")
+    if sid:
+        return Sprint.objects.filter(pk=sid).first() if sid.isdigit() else None
+    return _sprint_actual() or Sprint.objects.order_by("-inicio").first()
+
+
+@login_required
+def capacidad_sprint_page(request):
+    """Horas disponibles vs SP comprometidos por integrante (admins y visualizadores)."""
+    if not _puede_ver_capacidad(request):
+        return redirect("home")
+    sprint = _sprint_capacidad(request)
+    datos, origen = capacidad_sprint(sprint) if sprint else (None, None)
+    resp = render(request, "backlog/capacidad_sprint.html", {
+        "sprints": Sprint.objects.order_by("-inicio"),
+        "sprint": sprint,
+        "datos": datos,
+        "umbral_limite": UMBRAL_LIMITE,
+        "json_url": reverse("capacidad_sprint_json") + (f"?sprint={sprint.id}" if sprint else ""),
+    })
+    if origen:
+        resp["X-Neusi-Cache"] = origen
+    return resp
+
+
+@login_required
+@require_GET
+def capacidad_sprint_json(request):
+    if not _puede_ver_capacidad(request):
+        return JsonResponse({"error": "Solo administradores o visualizadores."}, status=403)
+    sprint = _sprint_capacidad(request)
+    if sprint is None:
+        return JsonResponse({"error": "Sprint no encontrado."}, status=404)
+    datos, origen = capacidad_sprint(sprint)
+    resp = JsonResponse(datos)
+    resp["X-Neusi-Cache"] = origen
+    return resp
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Índice de visibilidad: qué tareas ve cada integrante no-admin (TareaVisibilidad).
+
+Las filas se derivan de:
+- asignaciones (tabla puente de `asignados`) para todos los roles salvo visualizadores;
+- PermisoProyecto activo de un proyecto activo → tareas de las épicas de ese
+  proyecto, para Visualizador / Product Owner.
+
+Las señales llaman a `sincronizar_al_confirmar` con las tareas o integrantes
+afectados (asignación, épica de la tarea, proyecto de la épica, permisos, rol,
+proyecto activo/inactivo) y el índice se corrige una sola vez por transacción,
+al confirmar. `reconstruir()` (comando reconstruir_visibilidad) repara cualquier
+desvío comparando contra el cálculo completo.
+"""
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Integrante, PermisoProyecto, Tarea, TareaAsignacion, TareaVisibilidad
+
+LOTE = 1000
+
+_pendientes = threading.local()
+
+
+# ==============================
+# Cálculo y sincronización
+# ==============================
+def filas(integrante_ids=None, tarea_ids=None):
+    """Set de (integrante_id, tarea_id) que debería haber, acotado a esos integrantes y/o tareas."""
+    roles = Integrante.ROLES_VISUALIZADOR
+
+    asignaciones = TareaAsignacion.objects.exclude(integrante__rol__in=roles)
+    permisos = PermisoProyecto.objects.filter(activo=True, proyecto__activo=True, integrante__rol__in=roles)
+    if integrante_ids is not None:
+        asignaciones = asignaciones.filter(integrante_id__in=integrante_ids)
+        permisos = permisos.filter(integrante_id__in=integrante_ids)
+    if tarea_ids is not None:
+        asignaciones = asignaciones.filter(tarea_id__in=tarea_ids)
+    res = set(asignaciones.values_list("integrante_id", "tarea_id"))
+
+    por_proyecto = defaultdict(list)
+    for integrante_id, proyecto_id in permisos.values_list("integrante_id", "proyecto_id"):
+        por_proyecto[proyecto_id].append(integrante_id)
+    if por_proyecto:
+        tareas = Tarea.objects.filter(epica__proyecto_id__in=list(por_proyecto))
+        if tarea_ids is not None:
+            tareas = tareas.filter(pk__in=tarea_ids)
+        for tarea_id, proyecto_id in tareas.values_list("id", "epica__proyecto_id"):
+            res.update((i, tarea_id) for i in por_proyecto[proyecto_id])
+    return res
+
+
+def sincronizar(integrante_ids=None, tarea_ids=None):
+    """
+    Deja el índice igual a filas() dentro del alcance dado (None = todo).
+    Devuelve (agregadas, quitadas).
+    """
+    if integrante_ids is not None:
+        integrante_ids = list(integrante_ids)
+    if tarea_ids is not None:
+        tarea_ids = list(tarea_ids)
+
+    actuales = TareaVisibilidad.objects.all()
+    if integrante_ids is not None:
+        actuales = actuales.filter(integrante_id__in=integrante_ids)
+    if tarea_ids is not None:
+        actuales = actuales.filter(tarea_id__in=tarea_ids)
+    actuales = set(actuales.values_list("integrante_id", "tarea_id"))
+    deseadas = filas(integrante_ids, tarea_ids)
+
+    sobran = defaultdict(list)
+    for integrante_id, tarea_id in actuales - deseadas:
+        sobran[integrante_id].append(tarea_id)
+    for integrante_id, ids in sobran.items():
+        TareaVisibilidad.objects.filter(integrante_id=integrante_id, tarea_id__in=ids).delete()
+
+    faltan = deseadas - actuales
+    TareaVisibilidad.objects.bulk_create(
+        [TareaVisibilidad(integrante_id=i, tarea_id=t) for i, t in faltan],
+        batch_size=LOTE, ignore_conflicts=True,
+    )
+    return len(faltan), sum(len(ids) for ids in sobran.values())
+
+
+def reconstruir():
+    """Recalcula el índice completo (repara desvíos por escrituras sin señales)."""
+    with transaction.atomic():
+        return sincronizar()
+
+
+def _vaciar_pendientes():
+    integrantes = getattr(_pendientes, "integrantes", None)
+    tareas = getattr(_pendientes, "tareas", None)
+    _pendientes.integrantes, _pendientes.tareas = set(), set()
+    if integrantes:
+        sincronizar(integrante_ids=integrantes)
+    if tareas:
+        sincronizar(tarea_ids=tareas)
+
+
+def sincronizar_al_confirmar(integrantes=(), tareas=()):
+    """
+    Acumula integrantes/tareas afectados y sincroniza su parte del índice cuando
+    la transacción confirma (varios cambios en una petición = una sola pasada).
+    """
+    integrantes = {i for i in integrantes if i}
+    tareas = {t for t in tareas if t}
+    if not integrantes and not tareas:
+        return
+    if not hasattr(_pendientes, "integrantes"):
+        _pendientes.integrantes, _pendientes.tareas = set(), set()
+    _pendientes.integrantes |= integrantes
+    _pendientes.tareas |= tareas
+    transaction.on_commit(_vaciar_pendientes)
@@ -0,0 +1,155 @@
+"""
+Disponibilidad como mapa de bits de franjas de 30 minutos.
+
+Cada DisponibilidadDia guarda en `franjas` un entero de 48 bits: el bit k vale 1
+si la persona está disponible en [k*30 min, k*30 + 30 min) de ese día.
+- "Disponible todo el día" = los 48 bits.
+- "No disponible" = 0.
+- "Rango" = las franjas completas dentro de [hora_inicio, hora_fin).
+
+Así "¿cuándo están libres todos?" es un AND de enteros por día (microsegundos
+para cualquier tamaño de equipo) y las ventanas salen de recorrer los bits.
+"""
+from datetime import time, timedelta
+
+MINUTOS_FRANJA = 30
+FRANJAS_DIA = 24 * 60 // MINUTOS_FRANJA          # 48
+TODO_EL_DIA = (1 << FRANJAS_DIA) - 1
+
+# Horario por defecto en que se buscan huecos comunes
+HORARIO_DESDE = time(7, 0)
+HORARIO_HASTA = time(19, 0)
+
+
+def _minutos(t):
+    return t.hour * 60 + t.minute
+
+
+def franja_a_hora(k):
+    """Hora de inicio de la franja k (la franja 48 es el fin del día, 24:00 → 23:59)."""
+    if k >= FRANJAS_DIA:
+        return time(23, 59)
+    m = k * MINUTOS_FRANJA
+    return time(m // 60, m % 60)
+
+
+def mascara_rango(desde, hasta):
+    """Bits de las franjas completas dentro de [desde, hasta) (datetime.time)."""
+    if desde is None or hasta is None:
+        return 0
+    ini = -(-_minutos(desde) // MINUTOS_FRANJA)                 # primera franja que empieza ≥ desde
+    fin = _minutos(hasta) // MINUTOS_FRANJA                     # primera franja que no cabe
+    if hasta == time(23, 59):
+        fin = FRANJAS_DIA
+    if fin <= ini:
+        return 0
+    return ((1 << (fin - ini)) - 1) << ini
+
+
+def franjas_de(tipo, hora_inicio=None, hora_fin=None):
+    """Mapa de bits de un DisponibilidadDia a partir de tipo (D/N/R) y su rango."""
+    if tipo == "D":
+        return TODO_EL_DIA
+    if tipo == "R":
+        return mascara_rango(hora_inicio, hora_fin)
+    return 0
+
+
+def ventanas(bits, minimo=1):
+    """[(franja_inicio, franja_fin)] de los tramos de bits en 1 de al menos `minimo` franjas."""
+    res = []
+    k = 0
+    while bits:
+        # salta los ceros del inicio
+        ceros = (bits & -bits).bit_length() - 1
+        bits >>= ceros
+        k += ceros
+        # largo del tramo de unos
+        largo = (~bits & (bits + 1)).bit_length() - 1
+        if largo >= minimo:
+            res.append((k, k + largo))
+        bits >>= largo
+        k += largo
+    return res
+
+
+def interseccion(mapas):
+    """AND de una lista de mapas (vacía → 0: sin personas no hay hueco común)."""
+    res = None
+    for m in mapas:
+        res = m if res is None else res & m
+        if not res:
+            return 0
+    return res or 0
+
+
+def comunes_semana(semanas, horario=(HORARIO_DESDE, HORARIO_HASTA)):
+    """
+    `semanas`: una lista de 7 mapas por persona (lunes..domingo). Devuelve, por día,
+    [(inicio, fin)] (datetime.time) en que todas están disponibles dentro de `horario`.
+    """
+    semanas = list(semanas)
+    filtro = mascara_rango(*horario)
+    return [
+        [(franja_a_hora(a), franja_a_hora(b)) for a, b in ventanas(interseccion(s[i] for s in semanas) & filtro)]
+        for i in range(7)
+    ]
+
+
+# ==============================
+# Consultas
+# ==============================
+def mapas_por_dia(usuario_ids, desde, hasta):
+    """
+    {fecha: {usuario_id: bits}} entre `desde` y `hasta` (inclusive) con una sola consulta.
+    Los días sin fila no aparecen (cuentan como "No disponible").
+    """
+    from .models import DisponibilidadDia, lunes_de
+
+    res = {}
+    filas = (
+        DisponibilidadDia.objects
+        .filter(
+            disponibilidad__usuario_id__in=list(usuario_ids),
+            disponibilidad__semana_inicio__gte=lunes_de(desde),
+            disponibilidad__semana_inicio__lte=hasta,
+        )
+        .values_list("disponibilidad__usuario_id", "disponibilidad__semana_inicio", "dia_semana", "franjas")
+    )
+    for usuario_id, lunes, dia, bits in filas:
+        fecha = lunes + timedelta(days=dia)
+        if desde <= fecha <= hasta:
+            res.setdefault(fecha, {})[usuario_id] = bits
+    return res
+
+
+def huecos_comunes(usuario_ids, desde, hasta, duracion=30, horario=(HORARIO_DESDE, HORARIO_HASTA), limite=20):
+    """
+    Ventanas en que TODOS los usuarios están disponibles entre las fechas dadas,
+    dentro de `horario` y de al menos `duracion` minutos. Ordenadas de la más
+    larga a la más corta (y luego por fecha/hora): [{fecha, inicio, fin, minutos}].
+    """
+    usuario_ids = set(usuario_ids)
+    if not usuario_ids:
+        return []
+    filtro = mascara_rango(*horario)
+    minimo = max(1, -(-duracion // MINUTOS_FRANJA))
+
+    candidatas = []
+    for fecha, mapas in mapas_por_dia(usuario_ids, desde, hasta).items():
+        if len(mapas) < len(usuario_ids):
+            continue  # alguien sin registro ese día
+        comun = interseccion(mapas.values()) & filtro
+        for ini, fin in ventanas(comun, minimo):
+            candidatas.append((fecha, ini, fin))
+
+    candidatas.sort(key=lambda v: (-(v[2] - v[1]), v[0], v[1]))
+    return [
+        {
+            "fecha": fecha,
+            "inicio": franja_a_hora(ini),
+            "fin": franja_a_hora(fin),
+            "minutos": (fin - ini) * MINUTOS_FRANJA,
+        }
+        for fecha, ini, fin in candidatas[:limite]
+    ]
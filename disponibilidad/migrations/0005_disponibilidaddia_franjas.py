@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:30
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+from backlog.migrations._ddl import agregar_columna, quitar_columna
+
+# Copia de franjas.py a la fecha de esta migración (48 franjas de 30 min)
+_FRANJA = 30
+_TODO = (1 << 48) - 1
+
+
+def _bits(tipo, ini, fin):
+    if tipo == "D":
+        return _TODO
+    if tipo != "R" or ini is None or fin is None:
+        return 0
+    a = -(-(ini.hour * 60 + ini.minute) // _FRANJA)
+    b = 48 if (fin.hour, fin.minute) == (23, 59) else (fin.hour * 60 + fin.minute) // _FRANJA
+    return ((1 << (b - a)) - 1) << a if b > a else 0
+
+
+def agregar_franjas(apps, schema_editor):
+    # DisponibilidadDia es managed=False: la columna se agrega a mano
+    Dia = apps.get_model("disponibilidad", "DisponibilidadDia")
+    agregar_columna(schema_editor, Dia, "franjas", models.BigIntegerField(default=0))
+
+    # Backfill agrupado por valor: pocos UPDATE ... WHERE id IN (...)
+    por_valor = defaultdict(list)
+    for pk, tipo, ini, fin in Dia.objects.exclude(tipo="N").values_list("id", "tipo", "hora_inicio", "hora_fin"):
+        por_valor[_bits(tipo, ini, fin)].append(pk)
+    tabla = schema_editor.quote_name(Dia._meta.db_table)
+    for valor, ids in por_valor.items():
+        for i in range(0, len(ids), 500):
+            lote = ids[i:i + 500]
+            schema_editor.execute(
+                f"UPDATE {tabla} SET franjas = %s WHERE id IN ({', '.join(['%s'] * len(lote))})",
+                [valor, *lote],
+            )
+
+
+def quitar_franjas(apps, schema_editor):
+    quitar_columna(schema_editor, apps.get_model("disponibilidad", "DisponibilidadDia"), "franjas")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disponibilidad', '0004_alter_disponibilidaddia_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(agregar_franjas, reverse_code=quitar_franjas),
+    ]
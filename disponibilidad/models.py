@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta, date
 
+from backlog.cache_datos import invalidar
+
+from .franjas import franjas_de
+
 
 def lunes_de(fecha: date) -> date:
     return fecha - timedelta(days=fecha.weekday())
@@ -33,8 +37,12 @@ class DisponibilidadSemanal(models.Model):
     def ensure_dias(self):
         existentes = {d.dia_semana for d in self.dias.all()}
         faltantes = [i for i in range(7) if i not in existentes]
-        for i in faltantes:
-            DisponibilidadDia.objects.create(disponibilidad=self, dia_semana=i, tipo=DisponibilidadDia.Tipo.NO)
+        if faltantes:
+            # Un solo INSERT; ignore_conflicts por si otra petición los creó a la vez
+            DisponibilidadDia.objects.bulk_create(
+                [DisponibilidadDia(disponibilidad=self, dia_semana=i, tipo=DisponibilidadDia.Tipo.NO) for i in faltantes],
+                ignore_conflicts=True,
+            )
 
 
 class DisponibilidadDia(models.Model):
@@ -58,6 +66,8 @@ class DisponibilidadDia(models.Model):
     hora_inicio = models.TimeField(null=True, blank=True)
     hora_fin = models.TimeField(null=True, blank=True)
     notas = models.CharField(max_length=255, blank=True, default="")
+    # Mapa de bits de franjas de 30 min (ver franjas.py); se deriva de tipo + horas al guardar
+    franjas = models.BigIntegerField(default=0, editable=False)
 
     class Meta:
         unique_together = ("disponibilidad", "dia_semana")
@@ -73,6 +83,13 @@ class DisponibilidadDia(models.Model):
             self.hora_inicio = None
             self.hora_fin = None
 
+    def save(self, *args, **kwargs):
+        self.franjas = franjas_de(self.tipo, self.hora_inicio, self.hora_fin)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "franjas"}
+        super().save(*args, **kwargs)
+
     @property
     def display_corto(self):
         if self.tipo == self.Tipo.SI:
@@ -92,3 +109,94 @@ class DisponibilidadDia(models.Model):
         if self.hora_inicio and self.hora_fin:
             return f"Disponible de {self.hora_inicio.strftime('%H:%M')} a {self.hora_fin.strftime('%H:%M')}"
         return "Rango (sin horas)"
+
+
+# ===== Semana del equipo en bloque =====
+def materializar(pares):
+    """
+    Crea la semana y sus 7 días ("No disponible") para cada (usuario_id, semana_inicio)
+    que no los tenga: dos INSERT ... ON CONFLICT DO NOTHING y una lectura de ids,
+    sin importar cuántos pares sean. Devuelve {(usuario_id, semana_inicio): semana_id}.
+    """
+    pares = set(pares)
+    if not pares:
+        return {}
+    DisponibilidadSemanal.objects.bulk_create(
+        [DisponibilidadSemanal(usuario_id=u, semana_inicio=s) for u, s in pares],
+        ignore_conflicts=True,
+    )
+    semanas = {
+        (u, s): pk
+        for pk, u, s in DisponibilidadSemanal.objects.filter(
+            usuario_id__in={u for u, _ in pares}, semana_inicio__in={s for _, s in pares}
+        ).values_list("id", "usuario_id", "semana_inicio")
+        if (u, s) in pares
+    }
+    DisponibilidadDia.objects.bulk_create(
+        [DisponibilidadDia(disponibilidad_id=pk, dia_semana=i, tipo=DisponibilidadDia.Tipo.NO)
+         for pk in semanas.values() for i in range(7)],
+        ignore_conflicts=True,
+    )
+    return semanas
+
+
+def materializar_semanas(usuario_ids, semana_inicio):
+    """materializar() de una misma semana para varios usuarios."""
+    return materializar((u, semana_inicio) for u in usuario_ids)
+
+
+def dias_por_usuario(usuario_ids, semana_inicio):
+    """{usuario_id: [días de la semana en orden]} con una sola consulta."""
+    res = {}
+    dias = (
+        DisponibilidadDia.objects
+        .filter(disponibilidad__usuario_id__in=list(usuario_ids), disponibilidad__semana_inicio=semana_inicio)
+        .annotate(usuario_id=models.F("disponibilidad__usuario_id"))
+        .order_by("usuario_id", "dia_semana")
+    )
+    for d in dias:
+        res.setdefault(d.usuario_id, []).append(d)
+    return res
+
+
+def matriz_semana(usuario_ids, semana_inicio):
+    """
+    Matriz usuarios × 7 días de la semana: {usuario_id: [DisponibilidadDia × 7]}.
+    Una consulta cuando la semana ya existe para todos; si a alguien le falta,
+    se materializa en bloque (materializar_semanas) y se relee solo lo que faltaba.
+    """
+    usuario_ids = list(usuario_ids)
+    matriz = dias_por_usuario(usuario_ids, semana_inicio)
+    faltan = [u for u in usuario_ids if len(matriz.get(u, ())) < 7]
+    if faltan:
+        materializar_semanas(faltan, semana_inicio)
+        matriz.update(dias_por_usuario(faltan, semana_inicio))
+    return matriz
+
+
+CAMPOS_DIA = ("tipo", "hora_inicio", "hora_fin", "notas", "franjas")
+
+
+def copiar_semana(origen, pares):
+    """
+    Copia los 7 días de la semana `origen` (DisponibilidadSemanal) a cada
+    (usuario_id, semana_inicio) de `pares`, creando lo que falte. Todo en una
+    transacción y con escrituras en bloque (bulk_create + bulk_update): el costo
+    no crece con la cantidad de semanas/usuarios destino. Devuelve cuántas semanas escribió.
+    """
+    pares = {p for p in pares if p != (origen.usuario_id, origen.semana_inicio)}
+    if not pares:
+        return 0
+    modelo = {d.dia_semana: d for d in origen.dias.all()}
+    with transaction.atomic():
+        semanas = materializar(pares)
+        dias = list(DisponibilidadDia.objects.filter(disponibilidad_id__in=list(semanas.values())))
+        for d in dias:
+            fuente = modelo.get(d.dia_semana)
+            for campo in CAMPOS_DIA:
+                setattr(d, campo, getattr(fuente, campo) if fuente else DisponibilidadDia._meta.get_field(campo).get_default())
+        DisponibilidadDia.objects.bulk_update(dias, CAMPOS_DIA, batch_size=500)
+        DisponibilidadSemanal.objects.filter(pk__in=list(semanas.values())).update(actualizado=timezone.now())
+        # bulk_update/update no disparan señales (ver signals.py)
+        invalidar(*{f"disponibilidad:{semana.isoformat()}" for _, semana in semanas})
+    return len(semanas)
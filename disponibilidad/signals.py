@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Señales de disponibilidad.
+
+- Incrementan la versión "disponibilidad:<lunes>" de la caché versionada
+  (backlog/cache_datos.py) cuando cambia una semana o uno de sus días, para que
+  la capacidad de los sprints que la tocan se recalcule (backlog/capacidad.py).
+  Las escrituras en bloque (bulk_update) no disparan señales: el guardado del
+  formulario semanal termina con semana.save() y copiar_semana invalida por su cuenta.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from backlog.cache_datos import invalidar
+
+from .models import DisponibilidadDia, DisponibilidadSemanal
+
+
+def alcance_semana(semana_inicio):
+    return f"disponibilidad:{semana_inicio.isoformat()}"
+
+
+@receiver(post_save, sender=DisponibilidadSemanal)
+@receiver(post_delete, sender=DisponibilidadSemanal)
+def _semana_invalidar(sender, instance, **kwargs):
+    invalidar(alcance_semana(instance.semana_inicio))
+
+
+@receiver(post_save, sender=DisponibilidadDia)
+@receiver(post_delete, sender=DisponibilidadDia)
+def _dia_invalidar(sender, instance, origin=None, **kwargs):
+    # Borrado en cascada desde la semana: ya invalidó _semana_invalidar
+    if isinstance(origin, DisponibilidadSemanal):
+        return
+    semana_inicio = (
+        DisponibilidadSemanal.objects.filter(pk=instance.disponibilidad_id)
+        .values_list("semana_inicio", flat=True).first()
+    )
+    if semana_inicio:
+        invalidar(alcance_semana(semana_inicio))
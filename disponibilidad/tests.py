@@ -1,3 +1,113 @@
+from datetime import date, time
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+
+from .franjas import TODO_EL_DIA, franjas_de, huecos_comunes, mascara_rango, ventanas
+from .models import DisponibilidadDia, DisponibilidadSemanal, copiar_semana, matriz_semana
+
+LUNES = date(2025, 1, 6)
+
+
+# ==============================
+# Semana del equipo en bloque (user-020)
+# ==============================
+class MatrizSemanaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuarios = [User.objects.create(username=f"u{i}") for i in range(5)]
+        # uno ya tiene su semana con un día cargado
+        semana = DisponibilidadSemanal.objects.create(usuario=cls.usuarios[0], semana_inicio=LUNES)
+        semana.ensure_dias()
+        semana.dias.filter(dia_semana=2).update(tipo="D")
+
+    def test_materializa_lo_que_falta(self):
+        ids = [u.pk for u in self.usuarios]
+        matriz = matriz_semana(ids, LUNES)
+        self.assertEqual(set(matriz), set(ids))
+        self.assertTrue(all([d.dia_semana for d in dias] == list(range(7)) for dias in matriz.values()))
+        self.assertEqual(matriz[ids[0]][2].tipo, "D")
+        self.assertEqual(DisponibilidadDia.objects.count(), 7 * len(ids))
+
+    def test_semana_existente_una_consulta(self):
+        ids = [u.pk for u in self.usuarios]
+        matriz_semana(ids, LUNES)
+        with self.assertNumQueries(1):
+            matriz_semana(ids, LUNES)
+
+
+# ==============================
+# Guardado y copia de la semana (user-021)
+# ==============================
+class GuardarSemanaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create(username="ana")
+        cls.beto = User.objects.create(username="beto")
+
+    def dias(self, usuario, semana=LUNES):
+        return {
+            d.dia_semana: (d.tipo, d.hora_inicio, d.hora_fin, d.franjas)
+            for d in DisponibilidadDia.objects.filter(
+                disponibilidad__usuario=usuario, disponibilidad__semana_inicio=semana
+            )
+        }
+
+    def test_formulario_todo_o_nada(self):
+        self.client.force_login(self.ana)
+        url = reverse("disponibilidad:mi_disponibilidad") + f"?semana={LUNES.isoformat()}"
+        self.client.post(url, {"estado_0": "D", "estado_1": "R", "ini_1": "10:00", "fin_1": "09:00"})
+        self.assertEqual({d[0] for d in self.dias(self.ana).values()}, {"N"})
+
+        self.client.post(url, {"estado_0": "D", "estado_1": "R", "ini_1": "08:00", "fin_1": "12:00"})
+        dias = self.dias(self.ana)
+        self.assertEqual(dias[0][0], "D")
+        self.assertEqual(dias[1], ("R", time(8, 0), time(12, 0), franjas_de("R", time(8, 0), time(12, 0))))
+
+    def test_copiar_semana_a_varios_destinos(self):
+        origen = DisponibilidadSemanal.objects.create(usuario=self.ana, semana_inicio=LUNES)
+        origen.ensure_dias()
+        dia = origen.dias.get(dia_semana=3)
+        dia.tipo, dia.hora_inicio, dia.hora_fin = "R", time(14, 0), time(16, 0)
+        dia.save()
+
+        siguiente = date(2025, 1, 13)
+        pares = [(self.ana.pk, LUNES), (self.ana.pk, siguiente), (self.beto.pk, LUNES), (self.beto.pk, siguiente)]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(copiar_semana(origen, pares), 3)  # la de origen no cuenta
+        esperado = self.dias(self.ana)
+        for usuario, semana in pares[1:]:
+            self.assertEqual(self.dias(User.objects.get(pk=usuario), semana), esperado)
+
+
+# ==============================
+# Franjas de 30 minutos (user-022)
+# ==============================
+class FranjasTests(TestCase):
+    def test_mascaras(self):
+        self.assertEqual(franjas_de("D"), TODO_EL_DIA)
+        self.assertEqual(franjas_de("N"), 0)
+        self.assertEqual(mascara_rango(time(8, 0), time(9, 0)), 0b11 << 16)
+        self.assertEqual(mascara_rango(time(8, 10), time(9, 40)), 0b11 << 17)  # solo franjas completas
+        self.assertEqual(mascara_rango(time(23, 0), time(23, 59)), 0b11 << 46)
+        self.assertEqual(mascara_rango(time(9, 0), time(9, 20)), 0)
+        self.assertEqual(ventanas(0b1110011 << 10), [(10, 12), (14, 17)])
+        self.assertEqual(ventanas(0b1110011 << 10, minimo=3), [(14, 17)])
+
+    def test_huecos_comunes(self):
+        ana, beto = User.objects.create(username="ana"), User.objects.create(username="beto")
+        for usuario, (ini, fin) in ((ana, (time(8, 0), time(12, 0))), (beto, (time(10, 0), time(15, 0)))):
+            semana = DisponibilidadSemanal.objects.create(usuario=usuario, semana_inicio=LUNES)
+            semana.ensure_dias()
+            for dia in semana.dias.filter(dia_semana__in=[0, 1]):
+                dia.tipo, dia.hora_inicio, dia.hora_fin = "R", ini, fin
+                dia.save()
+        semana.dias.filter(dia_semana=1).update(franjas=TODO_EL_DIA)  # beto libre todo el martes
 
-# Create your tests here.
+        huecos = huecos_comunes([ana.pk, beto.pk], LUNES, date(2025, 1, 12), duracion=60)
+        self.assertEqual(
+            [(h["fecha"], h["inicio"], h["fin"], h["minutos"]) for h in huecos],
+            [(date(2025, 1, 7), time(8, 0), time(12, 0), 240), (LUNES, time(10, 0), time(12, 0), 120)],
+        )
+        self.assertEqual(huecos_comunes([ana.pk, beto.pk], LUNES, LUNES, duracion=150), [])
@@ -6,4 +6,6 @@ app_name = 'disponibilidad'
 urlpatterns = [
     path('', views.mi_disponibilidad, name='mi_disponibilidad'),
     path('equipo/', views.ver_disponibilidad_equipo, name='equipo_disponibilidad'),
+    path('copiar/', views.copiar_mi_semana, name='copiar_mi_semana'),
+    path('comun/', views.huecos_comunes_json, name='huecos_comunes'),
 ]
@@ -1,13 +1,16 @@
 from datetime import datetime, timedelta
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.views.decorators.http import require_GET, require_POST
 from django.contrib.auth.models import User, Group
 from django.shortcuts import render, redirect
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, JsonResponse
 from django.contrib import messages
 from django.utils import timezone
 from django.urls import reverse
 
-from .models import DisponibilidadSemanal, DisponibilidadDia
+from .franjas import HORARIO_DESDE, HORARIO_HASTA, comunes_semana, franjas_de, huecos_comunes
+from .models import DisponibilidadSemanal, DisponibilidadDia, copiar_semana, matriz_semana
 
 # ⬅️ AJUSTA este import a dónde tengas Integrante
 from backlog.models import Integrante  # cambia la ruta si tu modelo está en otro app
@@ -35,9 +38,41 @@ def _get_semana_inicio(request):
             pass
     return DisponibilidadSemanal.actual_lunes()
 
+# Tope de "copiar a las próximas N semanas" (un trimestre)
+SEMANAS_COPIA_MAX = 13
+
 def _prev_next(semana_inicio):
     return semana_inicio - timedelta(days=7), semana_inicio + timedelta(days=7)
 
+def _leer_semana_post(post):
+    """
+    Valida los 7 días del formulario antes de tocar la BD.
+    Devuelve ({dia_semana: (tipo, hora_inicio, hora_fin)}, [errores]).
+    """
+    valores, errores = {}, []
+    for i, nombre in DisponibilidadDia.Dia.choices:
+        estado = post.get(f"estado_{i}")
+        if estado not in ("D", "N", "R"):
+            continue
+        if estado != "R":
+            valores[i] = (estado, None, None)
+            continue
+        ini, fin = post.get(f"ini_{i}"), post.get(f"fin_{i}")
+        if not ini or not fin:
+            errores.append(f"Debes poner horas para {nombre} (rango).")
+            continue
+        try:
+            h_ini = datetime.strptime(ini, "%H:%M").time()
+            h_fin = datetime.strptime(fin, "%H:%M").time()
+        except ValueError:
+            errores.append(f"Horas inválidas en {nombre}.")
+            continue
+        if h_ini >= h_fin:
+            errores.append(f"Hora inicio ≥ fin en {nombre}.")
+            continue
+        valores[i] = (estado, h_ini, h_fin)
+    return valores, errores
+
 # ===== Mi disponibilidad (usuario) =====
 @login_required
 def mi_disponibilidad(request):
@@ -49,37 +84,25 @@ def mi_disponibilidad(request):
     semana.ensure_dias()
 
     if request.method == "POST":
-        cambios = 0
-        for i in range(7):
-            estado = request.POST.get(f"estado_{i}")
-            if estado not in ("D", "N", "R"):
-                continue
-            dia = semana.dias.get(dia_semana=i)
-            dia.tipo = estado
-            if estado == "R":
-                ini = request.POST.get(f"ini_{i}")
-                fin = request.POST.get(f"fin_{i}")
-                if not ini or not fin:
-                    messages.error(request, f"Debes poner horas para {dia.get_dia_semana_display()} (rango).")
-                    continue
-                try:
-                    h_ini = datetime.strptime(ini, "%H:%M").time()
-                    h_fin = datetime.strptime(fin, "%H:%M").time()
-                except ValueError:
-                    messages.error(request, f"Horas inválidas en {dia.get_dia_semana_display()}.")
-                    continue
-                if h_ini >= h_fin:
-                    messages.error(request, f"Hora inicio ≥ fin en {dia.get_dia_semana_display()}.")
-                    continue
-                dia.hora_inicio = h_ini
-                dia.hora_fin = h_fin
-            else:
-                dia.hora_inicio = None
-                dia.hora_fin = None
-            dia.save()
-            cambios += 1
-
-        if cambios:
+        valores, errores = _leer_semana_post(request.POST)
+        if errores:
+            # Todo o nada: con un error no se guarda ningún día
+            for e in errores:
+                messages.error(request, e)
+            messages.warning(request, "⚠️ No se guardó la semana; corrige los días marcados.")
+        elif valores:
+            with transaction.atomic():
+                dias = list(semana.dias.select_for_update().filter(dia_semana__in=list(valores)))
+                cambiados = []
+                for dia in dias:
+                    nuevo = valores[dia.dia_semana]
+                    if (dia.tipo, dia.hora_inicio, dia.hora_fin) != nuevo:
+                        dia.tipo, dia.hora_inicio, dia.hora_fin = nuevo
+                        dia.franjas = franjas_de(*nuevo)
+                        cambiados.append(dia)
+                if cambiados:
+                    DisponibilidadDia.objects.bulk_update(cambiados, ["tipo", "hora_inicio", "hora_fin", "franjas"])
+                    semana.save(update_fields=["actualizado"])
             messages.success(request, "✅ Disponibilidad semanal actualizada.")
         return redirect(f"{request.path}?semana={semana_inicio.isoformat()}")
 
@@ -94,6 +117,13 @@ def mi_disponibilidad(request):
         "home_url": "/",
         "equipo_url": reverse("disponibilidad:equipo_disponibilidad") + f"?semana={semana_inicio.isoformat()}",
         "puede_ver_equipo": _es_admin(request.user) or _es_visualizador(request.user),
+        # copiar semana
+        "copiar_url": reverse("disponibilidad:copiar_mi_semana") + f"?semana={semana_inicio.isoformat()}",
+        "semanas_copia_max": SEMANAS_COPIA_MAX,
+        "usuarios_copia": (
+            User.objects.filter(is_active=True).exclude(pk=request.user.pk).order_by("first_name", "last_name")
+            if _es_admin(request.user) else []
+        ),
     }
     return render(request, "disponibilidad/mi_disponibilidad.html", context)
 
@@ -114,17 +144,21 @@ def ver_disponibilidad_equipo(request):
         except (ValueError, Group.DoesNotExist):
             messages.error(request, "Grupo inválido.")
 
-    # En lugar de pasar un dict y usar get_item, preparamos filas {user, sem}
-    rows = []
-    for u in usuarios:
-        sem, _ = DisponibilidadSemanal.objects.get_or_create(usuario=u, semana_inicio=semana_inicio)
-        sem.ensure_dias()
-        rows.append({"user": u, "sem": sem})
+    # Filas {user, dias}: la semana de todo el equipo sale de una consulta
+    # (las semanas/días que falten se crean en bloque, ver matriz_semana)
+    usuarios = list(usuarios)
+    matriz = matriz_semana([u.pk for u in usuarios], semana_inicio)
+    rows = [{"user": u, "dias": matriz[u.pk]} for u in usuarios]
+    # Huecos en que todos los listados están libres (AND de los mapas de franjas)
+    comunes = comunes_semana([d.franjas for d in r["dias"]] for r in rows) if rows else []
 
     prev_w, next_w = _prev_next(semana_inicio)
 
     context = {
         "rows": rows,                              # 👈 ahora el template recorre rows
+        "comunes": comunes,
+        "horario_comun": (HORARIO_DESDE, HORARIO_HASTA),
+        "comun_url": reverse("disponibilidad:huecos_comunes"),
         "semana_inicio": semana_inicio,
         "prev_w": prev_w, "next_w": next_w,
         "grupos": Group.objects.all().order_by("name"),
@@ -133,3 +167,93 @@ def ver_disponibilidad_equipo(request):
         "mi_url": reverse("disponibilidad:mi_disponibilidad") + f"?semana={semana_inicio.isoformat()}",
     }
     return render(request, "disponibilidad/equipo_disponibilidad.html", context)
+
+# ===== Copiar semana =====
+@login_required
+@require_POST
+def copiar_mi_semana(request):
+    """
+    Copia la semana guardada del usuario a las N semanas siguientes y, si es
+    admin, también a los usuarios elegidos (misma semana y siguientes).
+    Todas las filas destino se escriben en bloque (ver models.copiar_semana).
+    """
+    semana_inicio = _get_semana_inicio(request)
+    volver = reverse("disponibilidad:mi_disponibilidad") + f"?semana={semana_inicio.isoformat()}"
+
+    try:
+        n = int(request.POST.get("semanas") or 0)
+    except ValueError:
+        n = -1
+    if not 0 <= n <= SEMANAS_COPIA_MAX:
+        messages.error(request, f"Número de semanas inválido (0 a {SEMANAS_COPIA_MAX}).")
+        return redirect(volver)
+
+    destinos = {request.user.pk}
+    elegidos = request.POST.getlist("usuarios")
+    if elegidos:
+        if not _es_admin(request.user):
+            return HttpResponseForbidden("Solo administradores pueden copiar a otros usuarios.")
+        try:
+            elegidos = {int(u) for u in elegidos}
+        except ValueError:
+            elegidos = set()
+        destinos |= set(User.objects.filter(pk__in=elegidos).values_list("pk", flat=True))
+
+    origen = DisponibilidadSemanal.objects.filter(usuario=request.user, semana_inicio=semana_inicio).first()
+    if origen is None:
+        messages.error(request, "No hay disponibilidad guardada en esta semana para copiar.")
+        return redirect(volver)
+
+    semanas = [semana_inicio + timedelta(days=7 * k) for k in range(n + 1)]
+    escritas = copiar_semana(origen, [(u, s) for u in destinos for s in semanas])
+    if escritas:
+        messages.success(request, f"✅ Semana copiada a {escritas} semana(s) de {len(destinos)} usuario(s).")
+    else:
+        messages.info(request, "ℹ️ No había semanas destino: elige semanas siguientes o usuarios.")
+    return redirect(volver)
+
+# ===== Huecos comunes (JSON) =====
+def _hora(valor, por_defecto):
+    try:
+        return datetime.strptime(valor, "%H:%M").time() if valor else por_defecto
+    except ValueError:
+        return por_defecto
+
+@login_required
+@require_GET
+def huecos_comunes_json(request):
+    """
+    Ventanas en que todos los `usuarios` están disponibles.
+    GET: usuarios (repetible o separado por comas), semana (lunes; por defecto la actual),
+    semanas (1..13), duracion (min), desde/hasta (HH:MM, horario a considerar).
+    """
+    if not (_es_admin(request.user) or _es_visualizador(request.user)):
+        return JsonResponse({"error": "Solo administradores/visualizadores."}, status=403)
+
+    try:
+        ids = {int(x) for v in request.GET.getlist("usuarios") for x in v.split(",") if x.strip()}
+        semanas = min(max(int(request.GET.get("semanas") or 1), 1), SEMANAS_COPIA_MAX)
+        duracion = max(int(request.GET.get("duracion") or 30), 1)
+    except ValueError:
+        return JsonResponse({"error": "Parámetros inválidos."}, status=400)
+    if not ids:
+        return JsonResponse({"error": "Indica al menos un usuario."}, status=400)
+
+    desde = _get_semana_inicio(request)
+    hasta = desde + timedelta(days=7 * semanas - 1)
+    horario = (_hora(request.GET.get("desde"), HORARIO_DESDE), _hora(request.GET.get("hasta"), HORARIO_HASTA))
+    ventanas = huecos_comunes(ids, desde, hasta, duracion=duracion, horario=horario)
+    return JsonResponse({
+        "usuarios": sorted(ids),
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "ventanas": [
+            {
+                "fecha": v["fecha"].isoformat(),
+                "inicio": v["inicio"].strftime("%H:%M"),
+                "fin": v["fin"].strftime("%H:%M"),
+                "minutos": v["minutos"],
+            }
+            for v in ventanas
+        ],
+    })
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -44,6 +45,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'backlog.autorizacion.ContextoAutorizacionMiddleware',  # request.autorizacion (roles y proyectos)
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -83,13 +85,37 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'neusi_tasks.wsgi.application'
 
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "neusi-local-cache",
-        "TIMEOUT": 300,  # fallback (seg.)
+# Caché compartida entre workers (dashboard/KPIs usan versiones por datos: backlog/cache_datos.py)
+# - NEUSI_REDIS_URL=redis://host:6379/1  -> Redis (requiere el paquete `redis`)
+# - sin Redis: archivos en NEUSI_CACHE_DIR (compartido por los workers de la misma máquina)
+if os.getenv("NEUSI_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("NEUSI_REDIS_URL"),
+            "TIMEOUT": 300,  # fallback (seg.)
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("NEUSI_CACHE_DIR", os.path.join(tempfile.gettempdir(), "neusi-cache")),
+            "TIMEOUT": 300,  # fallback (seg.)
+            "OPTIONS": {"MAX_ENTRIES": 5000},
+        }
     }
-}   
+
+# Avisos en vivo de tableros (SSE en /eventos/stream/, ver backlog/eventos_vivo.py)
+# - sin Redis: broker en memoria, un solo proceso ASGI (uvicorn neusi_tasks.asgi:application)
+# - con NEUSI_REDIS_URL: Redis pub/sub reparte los avisos entre workers
+NEUSI_BROKER_VIVO = os.getenv("NEUSI_BROKER_VIVO") or (
+    "backlog.eventos_vivo.BrokerRedis" if os.getenv("NEUSI_REDIS_URL") else "backlog.eventos_vivo.BrokerLocal"
+)
+
+# Capacidad del sprint (backlog/capacidad.py): horas de trabajo por SP y tope de horas por día
+NEUSI_HORAS_POR_SP = float(os.getenv("NEUSI_HORAS_POR_SP", "4"))
+NEUSI_HORAS_JORNADA = float(os.getenv("NEUSI_HORAS_JORNADA", "8"))
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -110,6 +136,17 @@ DATABASES = {
         "PORT": os.getenv("DB_PORT"),
     }
 }
+# Pruebas sin PostgreSQL a mano: NEUSI_DB_SQLITE=1 python manage.py test
+if os.getenv("NEUSI_DB_SQLITE"):
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+        }
+    }
+
+# manage.py test crea las tablas de los modelos managed=False (ver neusi_tasks/test_runner.py)
+TEST_RUNNER = "neusi_tasks.test_runner.RunnerModelosNoGestionados"
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
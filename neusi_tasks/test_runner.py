@@ -0,0 +1,42 @@
+from django.apps import apps
+from django.db import connections
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class RunnerModelosNoGestionados(DiscoverRunner):
+    """
+    Runner de `manage.py test`.
+
+    Los modelos de backlog y disponibilidad son managed=False (las tablas y sus
+    índices los crean los SQL de las migraciones, pensados para PostgreSQL).
+    Para la BD de pruebas se marcan como gestionados y se crean directo desde
+    los modelos, sin correr migraciones. La caché es en memoria para no leer ni
+    ensuciar la compartida de los workers.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache = override_settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        )
+        self._cache.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        self._no_gestionados = [
+            m for m in apps.get_models(include_auto_created=True) if not m._meta.managed
+        ]
+        for modelo in self._no_gestionados:
+            modelo._meta.managed = True
+        for alias in connections:
+            connections[alias].settings_dict.setdefault("TEST", {})["MIGRATE"] = False
+        return super().setup_databases(**kwargs)
+
+    def teardown_databases(self, old_config, **kwargs):
+        super().teardown_databases(old_config, **kwargs)
+        for modelo in self._no_gestionados:
+            modelo._meta.managed = False
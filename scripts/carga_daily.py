@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga del envío de Daily (ráfaga de la ventana 5:00–9:00).
+
+Crea N usuarios temporales (carga_daily_###) con su Integrante, opcionalmente
+precrea sus dailies de hoy (como manage.py precrear_dailies, pero solo para
+ellos: no toca los del resto del equipo) y lanza los POST a
+/daily/ desde varios hilos a la vez con el cliente de pruebas de Django (pasa por
+middleware, autenticación y la vista real, contra la BD configurada). Informa
+latencias p50/p95/máx, consultas SQL por envío y throughput. Al terminar borra
+los usuarios temporales (y en cascada sus integrantes y dailies).
+
+Uso (desde la raíz del proyecto, contra una BD de pruebas/staging):
+    python scripts/carga_daily.py --usuarios 200 --concurrencia 20
+    python scripts/carga_daily.py --usuarios 200 --concurrencia 20 --sin-precrear
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "neusi_tasks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from backlog.models import Daily, Integrante, precrear_dailies  # noqa: E402
+
+PREFIJO = "carga_daily_"
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))]
+
+
+def preparar(n):
+    User.objects.filter(username__startswith=PREFIJO).delete()
+    User.objects.bulk_create([User(username=f"{PREFIJO}{i:04d}", first_name="Carga") for i in range(n)])
+    usuarios = list(User.objects.filter(username__startswith=PREFIJO).order_by("id"))
+    Integrante.objects.bulk_create([Integrante(user=u, rol=Integrante.ROL_MIEMBRO) for u in usuarios])
+    return usuarios
+
+
+def enviar(usuario, reenvios):
+    """POST /daily/ (más `reenvios` reenvíos) para un usuario. Devuelve [(seg, consultas, status)]."""
+    cliente = Client()
+    cliente.force_login(usuario)
+    consultas = [0]
+
+    def contar(execute, sql, params, many, context):
+        consultas[0] += 1
+        return execute(sql, params, many, context)
+
+    res = []
+    try:
+        for k in range(1 + reenvios):
+            consultas[0] = 0
+            datos = {"que_hizo_ayer": f"ayer {k}", "que_hara_hoy": f"hoy {k}", "impedimentos": ""}
+            with connection.execute_wrapper(contar):
+                t0 = time.perf_counter()
+                r = cliente.post("/daily/", datos)
+                res.append((time.perf_counter() - t0, consultas[0], r.status_code))
+    finally:
+        connections.close_all()  # conexiones de este hilo
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=100)
+    parser.add_argument("--concurrencia", type=int, default=10)
+    parser.add_argument("--reenvios", type=int, default=0, help="Reenvíos por usuario después del primero")
+    parser.add_argument("--sin-precrear", action="store_true", help="No precrear: mide el camino get_or_create")
+    parser.add_argument("--conservar", action="store_true", help="No borrar los usuarios temporales al final")
+    args = parser.parse_args()
+
+    usuarios = preparar(args.usuarios)
+    hoy = timezone.localdate()
+    try:
+        if not args.sin_precrear:
+            t0 = time.perf_counter()
+            ids = Integrante.objects.filter(user__in=usuarios).values_list("id", flat=True)
+            creados = precrear_dailies(hoy, integrante_ids=list(ids))
+            print(f"Precreados {creados} dailies en {1000 * (time.perf_counter() - t0):.1f} ms")
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+            resultados = [r for lote in pool.map(lambda u: enviar(u, args.reenvios), usuarios) for r in lote]
+        total = time.perf_counter() - inicio
+
+        latencias = [1000 * r[0] for r in resultados]
+        errores = [r for r in resultados if r[2] != 302]
+        print(f"Envíos: {len(resultados)} ({args.concurrencia} hilos, precreados: {not args.sin_precrear})")
+        print(f"Latencia ms  p50={_percentil(latencias, 50):.1f}  p95={_percentil(latencias, 95):.1f}  "
+              f"máx={max(latencias):.1f}  media={statistics.mean(latencias):.1f}")
+        print(f"Consultas por envío: media={statistics.mean(r[1] for r in resultados):.1f}  "
+              f"máx={max(r[1] for r in resultados)}")
+        print(f"Throughput: {len(resultados) / total:.1f} envíos/s  |  errores: {len(errores)}")
+        registrados = Daily.objects.filter(integrante__user__in=usuarios, fecha=hoy, registrado=True).count()
+        print(f"Dailies registrados: {registrados}/{len(usuarios)}")
+    finally:
+        if not args.conservar:
+            User.objects.filter(username__startswith=PREFIJO).delete()
+
+
+if __name__ == "__main__":
+    main()